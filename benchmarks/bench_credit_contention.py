@@ -0,0 +1,68 @@
+"""Throughput of concurrent debits to the same user: --clients concurrent clients subtract 1 from the credit of
+one user --ops times each.
+
+The user starts with half the credit the clients ask for. The script checks that the final credit equals the
+initial credit minus the successful debits. Run from the repository root against either database:
+
+    DATABASE_TYPE=postgres python -m benchmarks.bench_credit_contention
+    DATABASE_TYPE=scylla SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_credit_contention
+"""
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from time import perf_counter
+
+from benchmarks.timing import report, report_throughput
+from users_service.connector import ConnectorFactory
+
+
+def client(connector, user_id, ops):
+    outcomes = Counter()
+    latencies = []
+    for _ in range(ops):
+        start = perf_counter()
+        try:
+            connector.subtract_amount(user_id, Decimal(1))
+            outcomes['debited'] += 1
+        except AssertionError:
+            outcomes['insufficient'] += 1
+        except Exception as error:
+            outcomes[type(error).__name__] += 1
+        latencies.append((perf_counter() - start) * 1000)
+    return outcomes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--ops', type=int, default=20)
+    args = parser.parse_args()
+
+    connector = ConnectorFactory().get_connector()
+    user_id = connector.create()
+    initial = Decimal(args.clients * args.ops // 2)
+    connector.add_amount(user_id, initial)
+
+    outcomes = Counter()
+    latencies = []
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        for client_outcomes, client_latencies in pool.map(lambda _: client(connector, user_id, args.ops),
+                                                          range(args.clients)):
+            outcomes.update(client_outcomes)
+            latencies.extend(client_latencies)
+    seconds = perf_counter() - start
+
+    label = f"{os.getenv('DATABASE_TYPE')} {args.clients} clients"
+    report_throughput(label, len(latencies), seconds)
+    report(label, latencies)
+    final = connector.get_user(user_id).credit
+    print(f"outcomes: {dict(outcomes)}")
+    print(f"initial={initial} final={final} expected={initial - outcomes['debited']} "
+          f"{'ok' if final == initial - outcomes['debited'] and final >= 0 else 'LOST UPDATES'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""Import time and memory of the database code a worker loads, per service and database type.
+
+Every measurement runs in a fresh interpreter that imports the service connector and the backend module that
+ConnectorFactory.get_connector imports for the database type, without connecting. "both" imports the two backend
+modules, which is what every worker loaded before the backends were split. Run from the repository root:
+
+    python -m benchmarks.bench_imports
+
+With --importtime the slowest modules of each import are printed as well, from python -X importtime.
+"""
+import argparse
+import subprocess
+import sys
+
+from benchmarks.timing import report
+
+SERVICES = ['order', 'stock', 'users', 'payment']
+BACKENDS = {
+    'postgres': ['postgres_connector'],
+    'scylla': ['scylla_connector'],
+    'both': ['postgres_connector', 'scylla_connector'],
+}
+PROBE = """
+import importlib, resource, sys
+from time import perf_counter
+start = perf_counter()
+for module in sys.argv[1:]:
+    importlib.import_module(module)
+print((perf_counter() - start) * 1000, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def probe(modules, importtime=False):
+    """Imports the modules in a fresh interpreter.
+
+    :return: the import time in milliseconds, the peak RSS in KiB and the -X importtime output
+    """
+    flags = ['-X', 'importtime'] if importtime else []
+    result = subprocess.run([sys.executable] + flags + ['-c', PROBE] + modules, check=True,
+                            capture_output=True, text=True)
+    milliseconds, rss = result.stdout.split()
+    return float(milliseconds), int(rss), result.stderr
+
+
+def slowest_imports(importtime_output, count=5):
+    """Returns the count modules with the highest cumulative import time from -X importtime output."""
+    rows = []
+    for line in importtime_output.splitlines()[1:]:
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, module = line.split('|')
+        rows.append((int(cumulative), module.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true')
+    args = parser.parse_args()
+
+    for service in SERVICES:
+        for backend, backend_modules in BACKENDS.items():
+            modules = [f"{service}_service.connector"] + [f"{service}_service.{m}" for m in backend_modules]
+            runs = [probe(modules) for _ in range(args.repeat)]
+            label = f"{service} {backend}"
+            report(f"{label} import", [milliseconds for milliseconds, _, _ in runs])
+            print(f"{label:<40} peak rss={max(rss for _, rss, _ in runs) / 1024:8.1f}MiB")
+            if args.importtime:
+                for cumulative, module in slowest_imports(probe(modules, importtime=True)[2]):
+                    print(f"    {cumulative / 1000:8.1f}ms {module}")
+
+
+if __name__ == '__main__':
+    main()
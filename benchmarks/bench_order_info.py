@@ -0,0 +1,56 @@
+"""Latency of PostgresConnector.get_order_info for orders with 1, 10 and 100 distinct items.
+
+Compares the single-query summary against the previous two-query ORM implementation.
+Run from the repository root against a running PostgreSQL instance:
+
+    DATABASE_TYPE=postgres python -m benchmarks.bench_order_info
+"""
+import argparse
+import uuid
+from decimal import Decimal
+
+from benchmarks.timing import measure, report
+from order_service.connector import ConnectorFactory
+from order_service.postgres_order import PostgresOrder
+from order_service.postgres_order_item import PostgresOrderItem
+
+
+def orm_order_info(connector, order_id):
+    """The previous implementation: two ORM queries and aggregation in Python."""
+    session = connector.db_session()
+    try:
+        order = session.query(PostgresOrder).filter_by(order_id=order_id).one()
+        items = session.query(PostgresOrderItem).filter_by(order_id=order_id).all()
+        total_cost = 0
+        item_list = []
+        for item in items:
+            total_cost += item.item_num * item.price
+            item_list.extend([str(item.item_id)] * item.item_num)
+        return order.paid, item_list, order.user_id, total_cost
+    finally:
+        session.close()
+
+
+def create_order(connector, distinct_items):
+    order_id = connector.create_order(uuid.uuid4())
+    for _ in range(distinct_items):
+        connector.create_order_item(order_id, uuid.uuid4(), Decimal('2.5'), 3)
+    return order_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    connector = ConnectorFactory().get_connector()
+    for distinct_items in (1, 10, 100):
+        order_id = create_order(connector, distinct_items)
+        report(f"orm, {distinct_items} items",
+               measure(lambda: orm_order_info(connector, order_id), args.repeat))
+        report(f"summary query, {distinct_items} items",
+               measure(lambda: connector.get_order_info(order_id), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
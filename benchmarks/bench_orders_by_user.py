@@ -0,0 +1,46 @@
+"""Latency of looking up the orders of a user on Scylla: ALLOW FILTERING over scylla_order versus a single
+partition read of orders_by_user.
+
+Loads --orders orders (1M by default) for random users first. Run from the repository root:
+
+    DATABASE_TYPE=scylla SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_orders_by_user
+"""
+import argparse
+import os
+import uuid
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from benchmarks.timing import measure, report
+from order_service.scylla_connector import ScyllaConnector
+from order_service.scylla_order import ScyllaOrder
+
+
+def load_orders(connector, orders, users):
+    user_ids = [uuid.uuid4() for _ in range(users)]
+    rows = [(uuid.uuid4(), user_ids[i % users]) for i in range(orders)]
+    execute_concurrent_with_args(connector.session, connector.insert_order, rows, concurrency=200)
+    execute_concurrent_with_args(connector.session, connector.insert_user_order,
+                                 [(user_id, order_id) for order_id, user_id in rows], concurrency=200)
+    return user_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    connector = ScyllaConnector(os.getenv('SCYLLA_NODES', '127.0.0.1').split(' '))
+    user_ids = load_orders(connector, args.orders, args.users)
+    user_id = user_ids[0]
+
+    report(f"allow filtering, {args.orders} orders",
+           measure(lambda: list(ScyllaOrder.objects.allow_filtering().filter(user_id=user_id).all()), args.repeat))
+    report(f"orders_by_user, {args.orders} orders",
+           measure(lambda: connector.get_order_ids_by_user(user_id), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Latency of the payment status lookup on Scylla: the secondary index on order_id of the payments table versus
+a single partition read of payments_by_order.
+
+Loads --payments payments into the payments table and copies them with the migration tool first. Run from the
+repository root:
+
+    SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_payment_status
+"""
+import argparse
+import os
+import random
+import uuid
+from decimal import Decimal
+
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.cqlengine.management import sync_table
+
+from benchmarks.timing import measure, report
+from payment_service.scylla_connector import ScyllaConnector
+from payment_service.migrate_payments_by_order import migrate
+from payment_service.scylla_payment_item import Payments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--payments', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    connector = ScyllaConnector(os.getenv('SCYLLA_NODES', '127.0.0.1').split(' '))
+    sync_table(Payments)
+    insert = connector.session.prepare(
+        "INSERT INTO wdm.payments (id, user_id, order_id, status, amount) VALUES (?, ?, ?, true, ?)")
+    order_ids = [uuid.uuid4() for _ in range(args.payments)]
+    execute_concurrent_with_args(connector.session, insert,
+                                 [(uuid.uuid4(), uuid.uuid4(), order_id, Decimal(1)) for order_id in order_ids],
+                                 concurrency=200)
+    migrate(connector)
+
+    select_by_index = connector.session.prepare("SELECT status FROM wdm.payments WHERE order_id = ?")
+    report(f"index on order_id, {args.payments} payments",
+           measure(lambda: connector.session.execute(select_by_index, (random.choice(order_ids),)).one(),
+                   args.repeat))
+    report(f"payments_by_order, {args.payments} payments",
+           measure(lambda: connector.status(random.choice(order_ids)), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Per-request latency of the two Scylla order models: order + order_item tables versus order_document.
+
+Run from the repository root against a running ScyllaDB cluster:
+
+    DATABASE_TYPE=scylla SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_scylla_order_model
+"""
+import argparse
+import os
+import uuid
+from decimal import Decimal
+
+from benchmarks.timing import measure, report
+from order_service.scylla_connector import ScyllaConnector, ScyllaDocumentConnector
+
+
+def bench(label, connector, distinct_items, repeat):
+    order_id = connector.create_order(uuid.uuid4())
+    item_ids = [uuid.uuid4() for _ in range(distinct_items)]
+    for item_id in item_ids:
+        connector.add_item(order_id=order_id, item_id=item_id, item_price=Decimal('2.5'))
+
+    report(f"{label} find, {distinct_items} items",
+           measure(lambda: connector.get_order_info(order_id), repeat))
+
+    def add_and_remove():
+        connector.add_item(order_id=order_id, item_id=item_ids[0], item_price=Decimal('2.5'))
+        connector.remove_item(order_id, item_ids[0])
+
+    report(f"{label} add+remove, {distinct_items} items", measure(add_and_remove, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+
+    nodes = os.getenv('SCYLLA_NODES', '127.0.0.1').split(' ')
+    tables = ScyllaConnector(nodes)
+    document = ScyllaDocumentConnector(nodes)
+    for distinct_items in (1, 10, 100):
+        bench('tables', tables, distinct_items, args.repeat)
+        bench('document', document, distinct_items, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Operations per second of single-row reads and writes on every Scylla table: cqlengine models versus the
+prepared statements of the connectors.
+
+Creates one row per table and reads or updates it --repeat times per variant. Run from the repository root:
+
+    SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_scylla_prepared
+"""
+import argparse
+import os
+import uuid
+from decimal import Decimal
+
+from benchmarks.timing import measure, report_throughput
+from order_service.scylla_connector import ScyllaConnector as OrderConnector
+from order_service.scylla_order import ScyllaOrder
+from payment_service.scylla_connector import ScyllaConnector as PaymentConnector
+from payment_service.scylla_payment_by_order import ScyllaPaymentByOrder
+from stock_service.scylla_connector import ScyllaConnector as StockConnector
+from stock_service.scylla_stock_item import ScyllaStockItem
+from users_service.scylla_connector import ScyllaConnector as UsersConnector
+from users_service.scylla_user import ScyllaUser
+
+
+def compare(table, operation, cqlengine_call, prepared_call, repeat):
+    for variant, func in (('cqlengine', cqlengine_call), ('prepared', prepared_call)):
+        latencies = measure(func, repeat)
+        report_throughput(f"{table} {operation} {variant}", repeat, sum(latencies) / 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5000)
+    args = parser.parse_args()
+    nodes = os.getenv('SCYLLA_NODES', '127.0.0.1').split(' ')
+
+    stock = StockConnector(nodes)
+    item_id = stock.create_item(Decimal(10))
+    compare('stock_item', 'get', lambda: ScyllaStockItem.get(id=item_id),
+            lambda: stock.get_item(item_id), args.repeat)
+    # The connectors update counts with LWTs, so plain prepared updates are compared with cqlengine.
+    update_in_stock = stock.session.prepare("UPDATE wdm.scylla_stock_item SET in_stock = ? WHERE id = ?")
+    compare('stock_item', 'update', lambda: ScyllaStockItem.objects(id=item_id).update(in_stock=1),
+            lambda: stock.session.execute(update_in_stock, (1, item_id)), args.repeat)
+
+    users = UsersConnector(nodes)
+    user_id = users.create()
+    compare('user', 'get', lambda: ScyllaUser.get(id=user_id),
+            lambda: users.get_user(user_id), args.repeat)
+    update_credit = users.session.prepare("UPDATE wdm.scylla_user SET credit = ? WHERE id = ?")
+    compare('user', 'update', lambda: ScyllaUser.objects(id=user_id).update(credit=Decimal(1)),
+            lambda: users.session.execute(update_credit, (Decimal(1), user_id)), args.repeat)
+
+    payment = PaymentConnector(nodes)
+    order_id = uuid.uuid4()
+    payment.session.execute(payment.insert_payment, (order_id, user_id, Decimal(1)))
+    compare('payments_by_order', 'get', lambda: ScyllaPaymentByOrder.get(order_id=order_id),
+            lambda: payment.get_payment(order_id), args.repeat)
+    compare('payments_by_order', 'update',
+            lambda: ScyllaPaymentByOrder.objects(order_id=order_id).update(status=True),
+            lambda: payment.session.execute(payment.update_payment, (True, Decimal(1), order_id)), args.repeat)
+
+    orders = OrderConnector(nodes)
+    order_id = orders.create_order(user_id)
+    compare('order', 'get', lambda: ScyllaOrder.get(order_id=order_id),
+            lambda: orders.get_order(order_id), args.repeat)
+    compare('order', 'update', lambda: ScyllaOrder.objects(order_id=order_id, user_id=user_id).update(paid=False),
+            lambda: orders.session.execute(orders.update_order_paid, (order_id, user_id)), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
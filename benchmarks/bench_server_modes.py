@@ -0,0 +1,144 @@
+"""Requests per second per core of a service in the gevent and the ASGI server mode.
+
+Both modes run in turn as a local gunicorn with --workers processes and the shared configuration, against the
+database of the environment. Load generator processes keep --concurrency requests in flight each for --seconds
+and count the answered requests. The CPU time of the gunicorn master and workers during the load is read from
+/proc, so "per core" is the number of requests served per second of server CPU time, which does not depend on
+how many cores the machine has or how busy the load generators keep them. Run from the repository root:
+
+    DATABASE_TYPE=postgres python -m benchmarks.bench_server_modes --service stock
+    DATABASE_TYPE=scylla SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_server_modes --service users
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+from multiprocessing import Pool
+from time import perf_counter, sleep
+
+import aiohttp
+import requests
+
+from benchmarks.timing import report, report_throughput
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+MODES = ['gevent', 'asgi']
+
+
+def setup_stock(url):
+    item_id = requests.post(f"{url}/stock/item/create/1").json()['item_id']
+    requests.post(f"{url}/stock/add/{item_id}/1000000000").raise_for_status()
+    return [('GET', f"{url}/stock/find/{item_id}"), ('POST', f"{url}/stock/add/{item_id}/1")]
+
+
+def setup_users(url):
+    user_id = requests.post(f"{url}/users/create").json()['user_id']
+    return [('GET', f"{url}/users/find/{user_id}"), ('POST', f"{url}/users/credit/add/{user_id}/1")]
+
+
+# The services that can run without the other services, and the requests the load is made of, alternating.
+SCENARIOS = {'stock': setup_stock, 'users': setup_users}
+
+
+def start_server(service, mode, port, workers):
+    """Starts gunicorn for a service in the given mode and waits until it answers.
+
+    :return: the subprocess.Popen of the gunicorn master
+    """
+    env = dict(os.environ, SERVER_MODE=mode, GUNICORN_WORKERS=str(workers))
+    server = subprocess.Popen(['gunicorn', '--config', f"{ROOT}/common/gunicorn_config.py",
+                               '--bind', f"127.0.0.1:{port}"],
+                              cwd=f"{ROOT}/{service}_service", env=env)
+    for _ in range(300):
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/{service}/metrics").ok:
+                return server
+        except requests.ConnectionError:
+            pass
+        sleep(0.1)
+    server.terminate()
+    raise RuntimeError(f"{service} did not start in {mode} mode")
+
+
+def cpu_seconds(master_pid):
+    """Returns the CPU time in seconds used so far by a process and its child processes that are running."""
+    pids = [master_pid]
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as children:
+        pids += [int(pid) for pid in children.read().split()]
+    ticks = 0
+    for pid in pids:
+        with open(f"/proc/{pid}/stat") as stat:
+            # utime and stime, counted after the command name, which may contain spaces.
+            fields = stat.read().rsplit(')', 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])
+    return ticks / os.sysconf('SC_CLK_TCK')
+
+
+async def generate_load(calls, concurrency, seconds):
+    """Sends the calls round robin with concurrency requests in flight until seconds have passed.
+
+    :return: the number of answered requests, of failed requests and the latencies in milliseconds
+    """
+    stop_at = perf_counter() + seconds
+    latencies = []
+    failures = 0
+
+    async def client(session, offset):
+        nonlocal failures
+        index = offset
+        while perf_counter() < stop_at:
+            method, url = calls[index % len(calls)]
+            index += 1
+            start = perf_counter()
+            async with session.request(method, url) as response:
+                await response.read()
+                if response.status != 200:
+                    failures += 1
+            latencies.append((perf_counter() - start) * 1000)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*[client(session, offset) for offset in range(concurrency)])
+    return len(latencies), failures, latencies
+
+
+def load_process(args):
+    return asyncio.get_event_loop().run_until_complete(generate_load(*args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--service', choices=sorted(SCENARIOS), default='stock')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--load-processes', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--port', type=int, default=8081)
+    args = parser.parse_args()
+
+    for mode in MODES:
+        server = start_server(args.service, mode, args.port, args.workers)
+        try:
+            calls = SCENARIOS[args.service](f"http://127.0.0.1:{args.port}")
+            with Pool(args.load_processes) as pool:
+                # A short warm up, so the workers have their connections open.
+                pool.map(load_process, [(calls, args.concurrency, 1)] * args.load_processes)
+                cpu_start = cpu_seconds(server.pid)
+                start = perf_counter()
+                results = pool.map(load_process, [(calls, args.concurrency, args.seconds)] * args.load_processes)
+                elapsed = perf_counter() - start
+                cpu = cpu_seconds(server.pid) - cpu_start
+        finally:
+            server.terminate()
+            server.wait()
+
+        answered = sum(count for count, _, _ in results)
+        failures = sum(failed for _, failed, _ in results)
+        label = f"{args.service} {mode} {args.workers} worker(s)"
+        report_throughput(label, answered, elapsed)
+        report(f"{label} latency", [latency for _, _, latencies in results for latency in latencies])
+        print(f"{label:<40} failed={failures:<6} server cpu={cpu:8.3f}s requests/cpu-second={answered / cpu:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Time a worker of a service needs before it can serve requests: importing the service connector, connecting to
+the database and checking the schema.
+
+A cold start runs in a fresh interpreter, as a new gunicorn worker does. A warm start creates another connector
+in a process that has already imported the modules and connected, so it only pays for the schema check and the
+prepared statements. The init command is timed first, which also makes sure the schema is up to date. Run from
+the repository root against either database:
+
+    DATABASE_TYPE=postgres python -m benchmarks.bench_startup --service stock
+    DATABASE_TYPE=scylla SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_startup --service stock
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+from benchmarks.timing import measure, report
+
+WORKER_START = "from {service}_service.connector import ConnectorFactory; ConnectorFactory().get_connector()"
+
+
+def run_timed(args):
+    start = perf_counter()
+    subprocess.run([sys.executable] + args, check=True, stdout=subprocess.DEVNULL)
+    return (perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--service', choices=['order', 'stock', 'users', 'payment'], default='stock')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    label = f"{os.getenv('DATABASE_TYPE')} {args.service}"
+    report(f"{label} init command", [run_timed([f"{args.service}_service/init.py"])])
+    os.environ['SCHEMA_AUTO_MIGRATE'] = 'false'
+    report(f"{label} cold start", [run_timed(['-c', WORKER_START.format(service=args.service)])
+                                   for _ in range(args.repeat)])
+    factory = importlib.import_module(f"{args.service}_service.connector").ConnectorFactory()
+    report(f"{label} warm start", measure(factory.get_connector, args.repeat, warmup=1))
+
+
+if __name__ == '__main__':
+    main()
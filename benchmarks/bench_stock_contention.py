@@ -0,0 +1,68 @@
+"""Contention on a single hot item: --clients concurrent clients subtract 1 from the same item --ops times each.
+
+The item starts with half the stock the clients ask for, so subtractions start failing halfway through. The
+script checks that the final stock equals the initial stock minus the successful subtractions, i.e. that no
+update was lost and the stock never went negative. Run from the repository root against either database:
+
+    DATABASE_TYPE=postgres python -m benchmarks.bench_stock_contention
+    DATABASE_TYPE=scylla SCYLLA_NODES="127.0.0.1" python -m benchmarks.bench_stock_contention
+"""
+import argparse
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from time import perf_counter
+
+from benchmarks.timing import report, report_throughput
+from stock_service.connector import ConnectorFactory
+
+
+def client(connector, item_id, ops):
+    outcomes = Counter()
+    latencies = []
+    for _ in range(ops):
+        start = perf_counter()
+        try:
+            connector.subtract_amount(item_id, 1)
+            outcomes['subtracted'] += 1
+        except AssertionError:
+            outcomes['insufficient'] += 1
+        except Exception as error:
+            outcomes[type(error).__name__] += 1
+        latencies.append((perf_counter() - start) * 1000)
+    return outcomes, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--ops', type=int, default=20)
+    args = parser.parse_args()
+
+    connector = ConnectorFactory().get_connector()
+    item_id = connector.create_item(Decimal(1))
+    initial = args.clients * args.ops // 2
+    connector.add_amount(item_id, initial)
+
+    outcomes = Counter()
+    latencies = []
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        for client_outcomes, client_latencies in pool.map(lambda _: client(connector, item_id, args.ops),
+                                                          range(args.clients)):
+            outcomes.update(client_outcomes)
+            latencies.extend(client_latencies)
+    seconds = perf_counter() - start
+
+    label = f"{os.getenv('DATABASE_TYPE')} {args.clients} clients"
+    report_throughput(label, len(latencies), seconds)
+    report(label, latencies)
+    final = connector.get_item(item_id).in_stock
+    print(f"outcomes: {dict(outcomes)}")
+    print(f"initial={initial} final={final} expected={initial - outcomes['subtracted']} "
+          f"{'ok' if final == initial - outcomes['subtracted'] and final >= 0 else 'LOST UPDATES'}")
+
+
+if __name__ == '__main__':
+    main()
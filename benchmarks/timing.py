@@ -0,0 +1,38 @@
+import statistics
+from time import perf_counter
+
+
+def measure(func, repeat, warmup=5):
+    """Calls func repeatedly and records the latency of every call.
+
+    :param func: a callable without arguments
+    :param repeat: the number of measured calls
+    :param warmup: the number of calls made before measuring
+    :return: the list of latencies in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+    latencies = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        latencies.append((perf_counter() - start) * 1000)
+    return latencies
+
+
+def percentile(latencies, pct):
+    """Returns the pct-th percentile of the given latencies."""
+    ordered = sorted(latencies)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label, latencies):
+    """Prints a one line latency summary."""
+    print(f"{label:<40} n={len(latencies):<6} mean={statistics.mean(latencies):8.3f}ms "
+          f"p50={percentile(latencies, 50):8.3f}ms p99={percentile(latencies, 99):8.3f}ms")
+
+
+def report_throughput(label, operations, seconds):
+    """Prints a one line throughput summary."""
+    print(f"{label:<40} ops={operations:<8} time={seconds:8.3f}s ops/sec={operations / seconds:10.1f}")
@@ -0,0 +1,46 @@
+import asyncio
+
+
+def wrap_future(response_future):
+    """Wraps a response future of the Scylla driver in an asyncio future, so a coroutine can wait for a
+    statement without blocking the event loop. The driver completes the future on its own IO thread.
+
+    :param response_future: the cassandra.cluster.ResponseFuture returned by session.execute_async
+    :return: an asyncio future resolved with the ResultSet, which has was_applied for conditional writes
+    """
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def resolve(_):
+        # The driver calls back once the response is complete, so result() does not block here.
+        loop.call_soon_threadsafe(set_result, response_future.result())
+
+    def reject(error):
+        loop.call_soon_threadsafe(set_exception, error)
+
+    def set_result(result):
+        if not future.done():
+            future.set_result(result)
+
+    def set_exception(error):
+        if not future.done():
+            future.set_exception(error)
+
+    response_future.add_callbacks(resolve, reject)
+    return future
+
+
+async def gather_limited(limit, coroutines):
+    """Runs coroutines concurrently, at most limit at a time.
+
+    :param limit: the maximum number of coroutines running at the same time
+    :param coroutines: the coroutines to run
+    :return: the list of results, in the order of coroutines
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+
+    return await asyncio.gather(*[run(coroutine) for coroutine in coroutines])
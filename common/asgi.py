@@ -0,0 +1,42 @@
+import functools
+from decimal import Decimal
+
+from quart import Quart, abort, jsonify
+from quart.json import JSONEncoder
+
+from common.handlers import HttpError, response_parts
+
+
+class DecimalJSONEncoder(JSONEncoder):
+    """Encodes Decimal values as numbers, as the Flask applications do with simplejson."""
+
+    def default(self, object_):
+        if isinstance(object_, Decimal):
+            return float(object_)
+        return super().default(object_)
+
+
+def create_app(import_name):
+    """Creates the Quart application of a service for the ASGI deployment mode.
+
+    :param import_name: the name of the module of the application
+    :return: the quart.Quart application
+    """
+    app = Quart(import_name)
+    app.json_encoder = DecimalJSONEncoder
+    return app
+
+
+def handler(func):
+    """Binds a route of the Quart application to a handler shared with the Flask application (common.handlers).
+
+    :param func: coroutine function that calls the handler with the route parameters and returns its result
+    :return: the route function
+    """
+    @functools.wraps(func)
+    async def route(*args, **kwargs):
+        try:
+            return response_parts(await func(*args, **kwargs), jsonify)
+        except HttpError as error:
+            abort(error.status, error.description)
+    return route
@@ -0,0 +1,122 @@
+import asyncio
+import os
+
+import aiohttp
+
+from common.aio import gather_limited
+from common.handlers import CallError, Reply
+
+
+class AsyncHttpClient:
+    def __init__(self):
+        """Initializes an HTTP client for calls between the services of the ASGI applications, with the
+        parameters of common.http_client.HttpClient. The aiohttp session is created on the event loop of the
+        worker by start.
+        """
+        self.pool_hosts = int(os.getenv('HTTP_POOL_HOSTS', '10'))
+        self.pool_size = int(os.getenv('HTTP_POOL_SIZE', '50'))
+        self.timeout = aiohttp.ClientTimeout(sock_connect=float(os.getenv('HTTP_CONNECT_TIMEOUT', '1')),
+                                             sock_read=float(os.getenv('HTTP_READ_TIMEOUT', '10')))
+        self.counters = {'checkouts': 0, 'pool_misses': 0, 'new_connections': 0}
+        self.session = None
+
+    async def start(self):
+        """Creates the session, whose connections are kept alive in a pool per host and reused by later
+        calls.
+        """
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self.count('checkouts'))
+        trace.on_connection_create_start.append(self.count('pool_misses'))
+        trace.on_connection_create_end.append(self.count('new_connections'))
+        connector = aiohttp.TCPConnector(limit=self.pool_hosts * self.pool_size, limit_per_host=self.pool_size)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, trace_configs=[trace])
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def count(self, counter):
+        async def on_event(session, context, params):
+            self.counters[counter] += 1
+        return on_event
+
+    async def request(self, method, url, **kwargs):
+        """Sends a request using a pooled connection and reads the response body.
+
+        :param method: the HTTP method
+        :param url: the url of the request
+        :return: the aiohttp.ClientResponse, whose body has been read, so its json() can be awaited
+        """
+        async with self.session.request(method, url, **kwargs) as response:
+            await response.read()
+            return response
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        """Returns the connection pool counters, as HttpClient.stats does.
+
+        :return: dict with the number of requests, the requests that got an idle pooled connection (hits) or had
+        to open one (misses), and the number of TCP connections opened
+        """
+        stats = dict(self.counters)
+        stats['pool_hits'] = stats['checkouts'] - stats['pool_misses']
+        return stats
+
+
+class HandlerClient:
+    def __init__(self, client):
+        """Makes the calls of the handlers shared with the Flask application (common.handlers) through an
+        AsyncHttpClient.
+
+        :param client: the AsyncHttpClient
+        """
+        self.client = client
+
+    async def request(self, method, url, **kwargs):
+        """Sends a request to another service.
+
+        :raises CallError: if the service could not be reached or did not answer in time
+        :return: the common.handlers.Reply
+        """
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            raise CallError(str(error)) from error
+        return Reply(response.status, await response.read())
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request('DELETE', url, **kwargs)
+
+    @staticmethod
+    async def sleep(seconds):
+        await asyncio.sleep(seconds)
+
+    @staticmethod
+    async def run_blocking(func, *args):
+        """Runs a blocking function in a thread of the default executor."""
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    @staticmethod
+    async def map(limit, func, calls):
+        """Runs the coroutine function func for every argument tuple in calls, at most limit at a time.
+
+        :return: the list of results, in the order of calls
+        """
+        return await gather_limited(limit, [func(*args) for args in calls])
+
+
+http_client = AsyncHttpClient()
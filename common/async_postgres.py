@@ -0,0 +1,74 @@
+import json
+import os
+import re
+from types import SimpleNamespace
+
+import asyncpg
+
+from common.backoff import retry_with_backoff_async
+from common.migrations import SCHEMA_VERSION, VERSION_TABLE_EXISTS_QUERY, SELECT_VERSION_QUERY
+
+# The pool of a worker is sized like the SQLAlchemy pool of a gunicorn worker.
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+NAMED_PARAMETER = re.compile(r'(?<![:\w]):(\w+)')
+
+
+class Query:
+    def __init__(self, query):
+        """A query with named parameters, as used with SQLAlchemy, converted to the numbered parameters of
+        asyncpg, so the async connectors run the same SQL as the synchronous ones.
+
+        :param query: the SQL, or a sqlalchemy.text clause, with :name parameters
+        """
+        self.names = []
+
+        def number(match):
+            if match.group(1) not in self.names:
+                self.names.append(match.group(1))
+            return f"${self.names.index(match.group(1)) + 1}"
+
+        self.sql = NAMED_PARAMETER.sub(number, getattr(query, 'text', query))
+
+    def values(self, **params):
+        """Returns the arguments in the order of their numbers."""
+        return tuple(params[name] for name in self.names)
+
+    def args(self, **params):
+        """Returns the query followed by its arguments, to be passed to the query methods of asyncpg."""
+        return (self.sql, *self.values(**params))
+
+
+async def init_connection(conn):
+    # json_object_agg results are decoded like psycopg2 does.
+    await conn.set_type_codec('json', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+async def create_pool(db_user, db_password, db_host, db_port, db_name):
+    """Creates the connection pool of a worker, connecting with exponential backoff until DB_CONNECT_DEADLINE_S,
+    and checks that the database has the current schema. Migrations are not applied here; an older schema
+    is migrated by the synchronous connectors or the init command of the services.
+
+    :raises RuntimeError: if the schema version differs from the one of this code
+    :return: the asyncpg.Pool
+    """
+    async def connect():
+        return await asyncpg.create_pool(user=db_user, password=db_password, host=db_host, port=int(db_port),
+                                         database=db_name, min_size=POOL_SIZE, max_size=POOL_SIZE + MAX_OVERFLOW,
+                                         init=init_connection)
+
+    pool = await retry_with_backoff_async(connect, 'connect to Postgres')
+    async with pool.acquire() as conn:
+        version = 0
+        if await conn.fetchval(VERSION_TABLE_EXISTS_QUERY.text):
+            version = await conn.fetchval(SELECT_VERSION_QUERY.text)
+    if version != SCHEMA_VERSION:
+        await pool.close()
+        raise RuntimeError(f"Database schema version {version} is not {SCHEMA_VERSION}, run the init command")
+    return pool
+
+
+def to_row(record):
+    """Returns an asyncpg record with attribute access, like the rows of the synchronous connectors, or None."""
+    return None if record is None else SimpleNamespace(**record)
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import os
+import random
+from time import monotonic, sleep
+
+logger = logging.getLogger(__name__)
+
+CONNECT_DEADLINE = float(os.getenv('DB_CONNECT_DEADLINE_S', '60'))
+INITIAL_BACKOFF = 0.1
+MAX_BACKOFF = 5.0
+
+
+def retry_with_backoff(func, what, deadline=CONNECT_DEADLINE):
+    """Calls func until it succeeds, sleeping between attempts for a randomized time that doubles every attempt
+    up to MAX_BACKOFF seconds, so workers that start together do not retry in lockstep.
+
+    :param func: a callable without arguments
+    :param what: what func does, used in the log and error messages
+    :param deadline: the number of seconds after which to stop retrying
+    :raises RuntimeError: if func still fails when the deadline has passed
+    :return: what func returned
+    """
+    give_up_at = monotonic() + deadline
+    backoff = INITIAL_BACKOFF
+    while True:
+        try:
+            return func()
+        except Exception as error:
+            sleep(next_delay(give_up_at, backoff, what, deadline, error))
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+async def retry_with_backoff_async(func, what, deadline=CONNECT_DEADLINE, wait=asyncio.sleep):
+    """Like retry_with_backoff, for a coroutine function, without blocking the event loop between attempts.
+
+    :param func: a coroutine function without arguments
+    :param what: what func does, used in the log and error messages
+    :param deadline: the number of seconds after which to stop retrying
+    :param wait: the coroutine function that waits between attempts
+    :raises RuntimeError: if func still fails when the deadline has passed
+    :return: what func returned
+    """
+    give_up_at = monotonic() + deadline
+    backoff = INITIAL_BACKOFF
+    while True:
+        try:
+            return await func()
+        except Exception as error:
+            await wait(next_delay(give_up_at, backoff, what, deadline, error))
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+
+def next_delay(give_up_at, backoff, what, deadline, error):
+    """Returns the randomized time to wait after a failed attempt.
+
+    :raises RuntimeError: if the deadline has passed
+    """
+    remaining = give_up_at - monotonic()
+    if remaining <= 0:
+        raise RuntimeError(f"Could not {what} within {deadline}s") from error
+    delay = min(random.uniform(backoff / 2, backoff), remaining)
+    logger.warning("Could not %s (%s), retrying in %.2fs", what, error, delay)
+    return delay
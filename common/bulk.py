@@ -0,0 +1,61 @@
+import csv
+import io
+import os
+from decimal import Decimal, InvalidOperation
+
+# Rows written per COPY or per round of concurrent inserts when creating many rows.
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', '10000'))
+# Inserts in flight on Scylla when creating many rows.
+BULK_CONCURRENCY = int(os.getenv('BULK_CONCURRENCY', '200'))
+# Maximum number of rows a single bulk create request may ask for.
+BULK_CREATE_LIMIT = int(os.getenv('BULK_CREATE_LIMIT', '100000'))
+
+
+def parse_bulk_request(count, value):
+    """Checks the number of rows and parses the amount of a bulk create request.
+
+    :param count: the number of rows asked for
+    :param value: the credit or price of every row
+    :raises ValueError: if the count is not between 1 and BULK_CREATE_LIMIT, or the value is not a non-negative
+    number
+    :return: the value as a Decimal
+    """
+    try:
+        value = Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{value} is not a number")
+    if not value.is_finite() or value < 0:
+        raise ValueError(f"{value} is not a valid amount")
+    if not 0 < count <= BULK_CREATE_LIMIT:
+        raise ValueError(f"Between 1 and {BULK_CREATE_LIMIT} rows can be created at once")
+    return value
+
+
+def chunk_sizes(count, chunk_size=BULK_CHUNK_SIZE):
+    """Splits a number of rows into chunks of at most chunk_size rows.
+
+    :return: generator of the chunk sizes
+    """
+    for start in range(0, count, chunk_size):
+        yield min(chunk_size, count - start)
+
+
+def copy_rows(engine, table, columns, rows):
+    """Writes rows to a Postgres table with a single COPY in a transaction of its own.
+
+    :param engine: the SQLAlchemy engine of the database
+    :param table: the name of the table
+    :param columns: the names of the columns the rows have values for
+    :param rows: list of tuples of the values
+    """
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        connection.commit()
+    finally:
+        connection.close()
+
@@ -0,0 +1,69 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+# Returned by LRUCache.get for a key that is not cached, as None may be a cached value.
+MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        """A mapping bounded to max_size entries that evicts the least recently used entry when it is full.
+        Entries may be given a time to live. Keeps counters of hits, misses and evictions, and can be used by
+        several threads or greenlets.
+
+        :param max_size: the maximum number of entries, 0 to cache nothing
+        """
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key):
+        """Returns the cached value of a key and marks it as most recently used.
+
+        :param key: the key
+        :return: the value, or MISSING if the key is not cached or its entry expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= monotonic():
+                del self.entries[key]
+                self.counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry[0]
+
+    def set(self, key, value, ttl=None):
+        """Caches the value of a key, evicting the least recently used entry if the cache is full.
+
+        :param key: the key
+        :param value: the value
+        :param ttl: the time in seconds after which the entry expires, None to keep it until it is evicted
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = None if ttl is None else monotonic() + ttl
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.counters['evictions'] += 1
+
+    def pop(self, key):
+        """Removes the entry of a key if it is cached."""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        """Returns the counters, the hit ratio and the number of cached entries."""
+        with self.lock:
+            stats = dict(self.counters, size=len(self.entries), max_size=self.max_size)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0
+        return stats
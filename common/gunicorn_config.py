@@ -0,0 +1,54 @@
+"""Gunicorn configuration shared by the services:
+
+    gunicorn --config /common/gunicorn_config.py
+
+The application is preloaded in the master so workers share its memory copy-on-write and start by forking, and
+every worker opens its own database connections after the fork. Environment variables:
+
+    SERVER_MODE                   "gevent" (the default) serves the Flask application in service.py with gevent
+                                  workers; "asgi" serves the Quart application in asgi.py with uvicorn workers,
+                                  which use asyncpg, aiohttp and the async API of the Scylla driver
+    GUNICORN_WORKERS              worker processes, by default one per CPU
+    GUNICORN_WORKER_CONNECTIONS   concurrent requests per gevent worker; by default DB_POOL_SIZE + DB_MAX_OVERFLOW
+                                  on Postgres, so requests do not queue for a database connection, and
+                                  SCYLLA_WORKER_CONNECTIONS (100) on ScyllaDB, whose driver multiplexes requests
+    GUNICORN_PRELOAD              "false" to import the application in every worker instead
+"""
+import multiprocessing
+import os
+import sys
+
+SERVER_MODE = os.getenv('SERVER_MODE', 'gevent')
+
+if SERVER_MODE == 'gevent':
+    from gevent import monkey
+
+    # The preloaded application creates locks and sockets before gunicorn would patch them in the workers.
+    monkey.patch_all()
+elif SERVER_MODE != 'asgi':
+    raise ValueError(f"Invalid SERVER_MODE {SERVER_MODE}")
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+
+def default_worker_connections():
+    if os.getenv('DATABASE_TYPE', 'postgres') == 'postgres':
+        return int(os.getenv('DB_POOL_SIZE', '5')) + int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    return int(os.getenv('SCYLLA_WORKER_CONNECTIONS', '100'))
+
+
+bind = '0.0.0.0:80'
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'asgi:app'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'service:app'
+    worker_class = 'gevent'
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', default_worker_connections()))
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() != 'false'
+
+
+def post_worker_init(worker):
+    from common.worker import start_worker
+    start_worker()
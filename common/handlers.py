@@ -0,0 +1,105 @@
+"""Support for the request handling that the Flask application in service.py and the Quart application in asgi.py
+of a service share.
+
+The handlers of a service are coroutine functions in its handlers.py, which take the connector and a client for
+the calls to other services. asgi.py awaits them with the asynchronous connector and
+common.async_http_client.HandlerClient. service.py wraps its connector in AwaitableCalls and runs them with
+run_sync and common.http_client.HandlerClient, whose calls block (the gevent worker) and never suspend the
+coroutine.
+"""
+import functools
+import inspect
+import json
+
+
+class HttpError(Exception):
+    def __init__(self, status, description=None):
+        """Ends a request with an HTTP error. The handler decorators of common.wsgi and common.asgi turn it into
+        the abort of their framework.
+
+        :param status: the HTTP status code
+        :param description: the description of the error, the default one of the status if None
+        """
+        super().__init__(status, description)
+        self.status = status
+        self.description = description
+
+
+class CallError(Exception):
+    """A call to another service that failed without an answer, because the service could not be reached or did
+    not answer in time."""
+
+
+class Reply:
+    def __init__(self, status, body):
+        """The answer of another service to a call made through a HandlerClient.
+
+        :param status: the HTTP status code
+        :param body: the body as bytes
+        """
+        self.status = status
+        self.body = body
+
+    @property
+    def ok(self):
+        return self.status < 400
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class AwaitableCalls:
+    def __init__(self, target):
+        """Makes the methods of a blocking object, such as a connector of the Flask application, awaitable, so
+        handlers call it as they call the asynchronous connector. Generator functions, such as the bulk creates,
+        are left as they are and their results collected with flatten.
+
+        :param target: the object whose methods to wrap
+        """
+        self.target = target
+
+    def __getattr__(self, name):
+        method = getattr(self.target, name)
+        if inspect.isgeneratorfunction(method):
+            return method
+
+        @functools.wraps(method)
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+
+def run_sync(coroutine):
+    """Runs a coroutine that never suspends, a handler whose calls all block, to its end.
+
+    :param coroutine: the coroutine to run
+    :raises RuntimeError: if the coroutine suspends
+    :return: what the coroutine returned
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("A handler run synchronously waited for an asynchronous call")
+
+
+async def flatten(chunks):
+    """Collects the items of chunks from a plain or an asynchronous iterator of lists, as the bulk creates of
+    the connectors return them.
+
+    :return: the list of all items
+    """
+    if hasattr(chunks, '__aiter__'):
+        return [item async for chunk in chunks for item in chunk]
+    return [item for chunk in chunks for item in chunk]
+
+
+def response_parts(result, jsonify):
+    """Returns the body and status of the response to what a handler returned: a body, or a (body, status)
+    pair. Dicts and lists are encoded as JSON with the jsonify of the framework.
+    """
+    body, status = result if isinstance(result, tuple) else (result, 200)
+    if isinstance(body, (dict, list)):
+        body = jsonify(body)
+    return body, status
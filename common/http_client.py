@@ -0,0 +1,146 @@
+import os
+from time import sleep
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool, HTTPSConnectionPool
+
+from common.handlers import CallError, Reply, run_sync
+
+
+def counting_pool_class(base, stats):
+    """Creates a connection pool class that counts connection checkouts, checkouts that found no idle
+    connection in the pool and TCP connections opened.
+
+    :param base: the urllib3 connection pool class to extend
+    :param stats: dict with the counters to update
+    :return: the connection pool class
+    """
+    class CountingConnection(base.ConnectionCls):
+        def connect(self):
+            stats['new_connections'] += 1
+            return super().connect()
+
+    class CountingConnectionPool(base):
+        ConnectionCls = CountingConnection
+
+        def _get_conn(self, timeout=None):
+            stats['checkouts'] += 1
+            return super()._get_conn(timeout)
+
+        def _new_conn(self):
+            stats['pool_misses'] += 1
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class CountingHTTPAdapter(HTTPAdapter):
+    def __init__(self, *args, **kwargs):
+        """Transport adapter that keeps counters of the connection pool usage."""
+        self.stats = {'checkouts': 0, 'pool_misses': 0, 'new_connections': 0}
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': counting_pool_class(HTTPConnectionPool, self.stats),
+            'https': counting_pool_class(HTTPSConnectionPool, self.stats),
+        }
+
+
+class HttpClient:
+    def __init__(self):
+        """Initializes an HTTP client for calls between the services with parameters set by the environment
+        variables. Connections are kept alive in a pool per host and reused by later calls.
+        """
+        self.pool_hosts = int(os.getenv('HTTP_POOL_HOSTS', '10'))
+        self.pool_size = int(os.getenv('HTTP_POOL_SIZE', '50'))
+        self.timeout = (float(os.getenv('HTTP_CONNECT_TIMEOUT', '1')), float(os.getenv('HTTP_READ_TIMEOUT', '10')))
+        self.adapter = CountingHTTPAdapter(pool_connections=self.pool_hosts, pool_maxsize=self.pool_size)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def request(self, method, url, **kwargs):
+        """Sends a request using a pooled connection.
+
+        :param method: the HTTP method
+        :param url: the url of the request
+        :return: the requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+    def stats(self):
+        """Returns the connection pool counters.
+
+        :return: dict with the number of connection checkouts, the checkouts that got an idle pooled connection
+        (hits) or had to create one (misses), and the number of TCP connections opened, which includes
+        reconnects of pooled connections the server closed
+        """
+        stats = dict(self.adapter.stats)
+        stats['pool_hits'] = stats['checkouts'] - stats['pool_misses']
+        return stats
+
+
+class HandlerClient:
+    def __init__(self, client):
+        """Makes the calls of the handlers shared with the ASGI application (common.handlers) through an
+        HttpClient. The calls block, so handlers using this client are run with common.handlers.run_sync.
+
+        :param client: the HttpClient
+        """
+        self.client = client
+
+    async def request(self, method, url, **kwargs):
+        """Sends a request to another service.
+
+        :raises CallError: if the service could not be reached or did not answer in time
+        :return: the common.handlers.Reply
+        """
+        try:
+            response = self.client.request(method, url, **kwargs)
+        except requests.RequestException as error:
+            raise CallError(str(error)) from error
+        return Reply(response.status_code, response.content)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url, **kwargs):
+        return await self.request('POST', url, **kwargs)
+
+    async def delete(self, url, **kwargs):
+        return await self.request('DELETE', url, **kwargs)
+
+    @staticmethod
+    async def sleep(seconds):
+        sleep(seconds)
+
+    @staticmethod
+    async def run_blocking(func, *args):
+        return func(*args)
+
+    @staticmethod
+    async def map(limit, func, calls):
+        """Runs the coroutine function func for every argument tuple in calls, at most limit at a time.
+
+        :return: the list of results, in the order of calls
+        """
+        # Imported here, as the connectors that call other services import this module without needing gevent.
+        from gevent.pool import Pool
+
+        return Pool(limit).map(lambda args: run_sync(func(*args)), calls)
+
+
+http_client = HttpClient()
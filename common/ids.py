@@ -0,0 +1,15 @@
+import uuid
+
+
+def to_uuid(value, kind):
+    """Parses a UUID for binding it to a prepared statement or a query parameter.
+
+    :param value: the id as a string or UUID
+    :param kind: what the id identifies, used in the error message
+    :raises ValueError: if value is not a valid UUID
+    :return: the id as a UUID
+    """
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"{kind} id {value} is not a valid id")
@@ -0,0 +1,152 @@
+import os
+
+from sqlalchemy import create_engine, text
+
+from common.backoff import retry_with_backoff
+
+# Key of the advisory lock that serializes migrations of service processes starting at the same time.
+MIGRATION_LOCK_KEY = 20210601
+
+CREATE_VERSION_TABLE_QUERY = text("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version integer PRIMARY KEY,
+        description text NOT NULL,
+        applied_at timestamptz NOT NULL DEFAULT now()
+    )
+""")
+VERSION_TABLE_EXISTS_QUERY = text("SELECT to_regclass('schema_version') IS NOT NULL")
+SELECT_VERSION_QUERY = text("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+INSERT_VERSION_QUERY = text("INSERT INTO schema_version (version, description) VALUES (:version, :description)")
+LOCK_QUERY = text("SELECT pg_advisory_xact_lock(:key)")
+
+# The schema of all services, as (version, description, statements). Migrations are only ever appended; the
+# first ones use IF NOT EXISTS so they also apply to databases created before migrations existed.
+MIGRATIONS = [
+    (1, 'tables of all services', [
+        """CREATE TABLE IF NOT EXISTS webshopuser (
+               id uuid PRIMARY KEY,
+               credit numeric NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS stock_item (
+               id uuid PRIMARY KEY,
+               price numeric NOT NULL,
+               in_stock bigint NOT NULL
+           )""",
+        """CREATE TABLE IF NOT EXISTS "order" (
+               order_id uuid NOT NULL,
+               user_id uuid NOT NULL,
+               paid boolean NOT NULL,
+               PRIMARY KEY (order_id, user_id)
+           )""",
+        """CREATE TABLE IF NOT EXISTS order_item (
+               order_id uuid NOT NULL,
+               item_id uuid NOT NULL,
+               price numeric NOT NULL,
+               item_num bigint NOT NULL,
+               PRIMARY KEY (order_id, item_id)
+           )""",
+        """CREATE TABLE IF NOT EXISTS payments (
+               id uuid PRIMARY KEY,
+               user_id uuid NOT NULL,
+               order_id uuid NOT NULL,
+               status boolean,
+               amount numeric
+           )""",
+    ]),
+    (2, 'sharded stock', [
+        "ALTER TABLE stock_item ADD COLUMN IF NOT EXISTS shards integer NOT NULL DEFAULT 1",
+        """CREATE TABLE IF NOT EXISTS stock_item_shard (
+               item_id uuid NOT NULL,
+               shard integer NOT NULL,
+               in_stock bigint NOT NULL,
+               PRIMARY KEY (item_id, shard)
+           )""",
+    ]),
+    (3, 'pending payment states', [
+        "ALTER TABLE payments ADD COLUMN IF NOT EXISTS state text",
+        "UPDATE payments SET state = CASE WHEN status THEN 'paid' ELSE 'cancelled' END WHERE state IS NULL",
+    ]),
+    (4, 'indexes for the connector queries and order items referencing their order', [
+        # Order ids are unique on their own; the index serves lookups by order id and the foreign key below.
+        'CREATE UNIQUE INDEX IF NOT EXISTS order_order_id_key ON "order" (order_id)',
+        'CREATE INDEX IF NOT EXISTS order_user_id_idx ON "order" (user_id)',
+        # Serves the lookups by (order_id, user_id) of pay and cancel and by order_id of status.
+        'CREATE INDEX IF NOT EXISTS payments_order_id_user_id_idx ON payments (order_id, user_id)',
+        'DELETE FROM order_item oi WHERE NOT EXISTS (SELECT 1 FROM "order" o WHERE o.order_id = oi.order_id)',
+        """ALTER TABLE order_item ADD CONSTRAINT order_item_order_id_fkey
+               FOREIGN KEY (order_id) REFERENCES "order" (order_id) ON DELETE CASCADE""",
+    ]),
+    (5, 'time a payment entered its pending state', [
+        "ALTER TABLE payments ADD COLUMN IF NOT EXISTS pending_since timestamptz",
+        # Payments left pending before this version can be taken over once the timeout has passed.
+        "UPDATE payments SET pending_since = now() WHERE state IN ('pending_payment', 'pending_cancel')",
+    ]),
+    (6, 'index of the sharded stock items', [
+        "CREATE INDEX IF NOT EXISTS stock_item_sharded_idx ON stock_item (id) WHERE shards > 1",
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Returns the version of the schema, 0 if no migration has been applied."""
+    if not conn.execute(VERSION_TABLE_EXISTS_QUERY).scalar():
+        return 0
+    return conn.execute(SELECT_VERSION_QUERY).scalar()
+
+
+def migrate(engine):
+    """Applies the migrations the database does not have yet, each in its own transaction.
+
+    :param engine: the SQLAlchemy engine of the database
+    :return: the versions that were applied
+    """
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        with engine.begin() as conn:
+            conn.execute(LOCK_QUERY, key=MIGRATION_LOCK_KEY)
+            conn.execute(CREATE_VERSION_TABLE_QUERY)
+            if current_version(conn) >= version:
+                continue
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(INSERT_VERSION_QUERY, version=version, description=description)
+            applied.append(version)
+    return applied
+
+
+def ensure_schema(engine):
+    """Checks at service start that the database has the schema this code expects.
+
+    The database is connected to with exponential backoff until DB_CONNECT_DEADLINE_S. An up to date database
+    costs a single query. An older one is migrated, unless SCHEMA_AUTO_MIGRATE is "false", in which case the
+    migrations are left to the init command of the services.
+
+    :param engine: the SQLAlchemy engine of the database
+    :raises RuntimeError: if the schema is older and may not be migrated here, or newer than this code
+    """
+    def read_version():
+        with engine.connect() as conn:
+            return current_version(conn)
+
+    version = retry_with_backoff(read_version, 'connect to Postgres')
+    if version == SCHEMA_VERSION:
+        return
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than {SCHEMA_VERSION}")
+    if os.getenv('SCHEMA_AUTO_MIGRATE', 'true').lower() == 'false':
+        raise RuntimeError(f"Database schema version {version} is older than {SCHEMA_VERSION}")
+    migrate(engine)
+
+
+def init_postgres(url):
+    """Creates or migrates the schema of a database, waiting for it to accept connections first. This is the
+    Postgres part of the init command of the services.
+
+    :param url: the SQLAlchemy URL of the database
+    :return: the versions that were applied
+    """
+    engine = create_engine(url)
+    retry_with_backoff(lambda: engine.connect().close(), 'connect to Postgres')
+    return migrate(engine)
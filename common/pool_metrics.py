@@ -0,0 +1,49 @@
+import threading
+from time import perf_counter
+
+from sqlalchemy import event
+
+
+class PoolMetrics:
+    def __init__(self, engine):
+        """Keeps counters of how many connections of the pool of an SQLAlchemy engine are checked out and for
+        how long they are held.
+        """
+        self.engine = engine
+        self.lock = threading.Lock()
+        self.counters = {'checkouts': 0, 'peak_checked_out': 0, 'hold_ms': 0.0, 'max_hold_ms': 0.0}
+        event.listen(engine, 'checkout', self.on_checkout)
+        event.listen(engine, 'checkin', self.on_checkin)
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = perf_counter()
+        with self.lock:
+            self.counters['checkouts'] += 1
+            self.counters['peak_checked_out'] = max(self.counters['peak_checked_out'],
+                                                    self.engine.pool.checkedout())
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop('checked_out_at', None)
+        if checked_out_at is None:
+            return
+        hold_ms = (perf_counter() - checked_out_at) * 1000
+        with self.lock:
+            self.counters['hold_ms'] += hold_ms
+            self.counters['max_hold_ms'] = max(self.counters['max_hold_ms'], hold_ms)
+
+    def stats(self):
+        """Returns the pool size, the connections checked out now and at most, and the mean and maximum time a
+        connection was held.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        pool = self.engine.pool
+        return {
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'checkouts': counters['checkouts'],
+            'peak_checked_out': counters['peak_checked_out'],
+            'mean_hold_ms': counters['hold_ms'] / counters['checkouts'] if counters['checkouts'] else 0,
+            'max_hold_ms': counters['max_hold_ms'],
+        }
@@ -0,0 +1,150 @@
+import hashlib
+import os
+
+from cassandra import ConsistencyLevel
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.cqlengine import connection, models
+from cassandra.cqlengine.management import sync_table
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import named_tuple_factory
+
+from common.backoff import retry_with_backoff
+
+KEYSPACE = 'wdm'
+CONNECTOR_PROFILE = 'connector'
+SCHEMA_TABLE = 'schema_version'
+
+_session = None
+
+
+def build_cluster(nodes):
+    """Creates a cluster with parameters set by the environment variables. Requests are routed to a replica
+    of their partition in the local datacenter. Statements marked as idempotent are sent to another replica
+    as well when the first one has not answered within the speculative execution delay.
+
+    :param nodes: the contact points
+    :return: the cassandra.cluster.Cluster
+    """
+    request_timeout = float(os.getenv('SCYLLA_REQUEST_TIMEOUT', '10'))
+    load_balancing = TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=os.getenv('SCYLLA_LOCAL_DC')))
+    speculative_execution = ConstantSpeculativeExecutionPolicy(
+        delay=float(os.getenv('SCYLLA_SPECULATIVE_DELAY_MS', '20')) / 1000,
+        max_attempts=int(os.getenv('SCYLLA_SPECULATIVE_ATTEMPTS', '2')))
+    profiles = {
+        EXEC_PROFILE_DEFAULT: ExecutionProfile(load_balancing_policy=load_balancing,
+                                               consistency_level=ConsistencyLevel.QUORUM,
+                                               request_timeout=request_timeout),
+        CONNECTOR_PROFILE: ExecutionProfile(load_balancing_policy=load_balancing,
+                                            consistency_level=ConsistencyLevel.QUORUM,
+                                            request_timeout=request_timeout,
+                                            speculative_execution_policy=speculative_execution,
+                                            row_factory=named_tuple_factory),
+    }
+    return Cluster(contact_points=nodes, execution_profiles=profiles,
+                   connect_timeout=float(os.getenv('SCYLLA_CONNECT_TIMEOUT', '5')))
+
+
+class ProfileSession:
+    def __init__(self, session, profile):
+        """Wraps a session so that statements are executed with the given execution profile unless another
+        one is passed.
+        """
+        self.session = session
+        self.profile = profile
+
+    def execute(self, query, parameters=None, **kwargs):
+        kwargs.setdefault('execution_profile', self.profile)
+        return self.session.execute(query, parameters, **kwargs)
+
+    def execute_async(self, query, parameters=None, **kwargs):
+        kwargs.setdefault('execution_profile', self.profile)
+        return self.session.execute_async(query, parameters, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+
+def get_session(nodes):
+    """Returns the Scylla session of this process, connecting to the cluster on the first call with exponential
+    backoff until DB_CONNECT_DEADLINE_S. cqlengine is set up on the same session, so the models can sync their
+    tables without opening connections of their own.
+
+    cqlengine switches the default execution profile to dict rows, so the returned session executes with
+    a profile that returns named tuples.
+
+    :param nodes: the contact points
+    :return: the session wrapped in a ProfileSession
+    """
+    global _session
+    if _session is None:
+        session = retry_with_backoff(lambda: build_cluster(nodes).connect(), 'connect to Scylla')
+        connection.register_connection('default', session=session, default=True)
+        models.DEFAULT_KEYSPACE = KEYSPACE
+        _session = ProfileSession(session, CONNECTOR_PROFILE)
+    return _session
+
+
+def schema_fingerprint(tables):
+    """Returns a hash of the names, columns and keys of the tables of the given cqlengine models."""
+    description = []
+    for model in sorted(tables, key=lambda m: m.column_family_name()):
+        description.append(model.column_family_name(include_keyspace=False))
+        for column in model._columns.values():
+            description.append(f"{column.db_field_name} {column.db_type} {column.partition_key} "
+                               f"{column.primary_key} {column.clustering_order} {column.index}")
+    return hashlib.sha1('\n'.join(description).encode()).hexdigest()
+
+
+def create_tables(session, service, tables):
+    """Creates the "wdm" keyspace if it does not exist, creates or updates the tables of a service and records
+    their fingerprint. Nothing is changed when the recorded fingerprint already matches.
+
+    :param session: the session returned by get_session
+    :param service: the name of the service
+    :param tables: the cqlengine models of the service
+    :return: whether the tables were created or updated
+    """
+    fingerprint = schema_fingerprint(tables)
+    if recorded_fingerprint(session, service) == fingerprint:
+        return False
+    session.execute(f"""
+        CREATE KEYSPACE IF NOT EXISTS {KEYSPACE}
+        WITH replication = {{ 'class': 'SimpleStrategy', 'replication_factor': '3' }}
+        """)
+    session.execute(f"""
+        CREATE TABLE IF NOT EXISTS {KEYSPACE}.{SCHEMA_TABLE} (service text PRIMARY KEY, fingerprint text)
+        """)
+    for model in tables:
+        sync_table(model)
+    session.execute(f"INSERT INTO {KEYSPACE}.{SCHEMA_TABLE} (service, fingerprint) VALUES (%s, %s)",
+                    (service, fingerprint))
+    return True
+
+
+def recorded_fingerprint(session, service):
+    """Returns the fingerprint recorded for a service, None if its tables were never created."""
+    keyspace = session.cluster.metadata.keyspaces.get(KEYSPACE)
+    if keyspace is None or SCHEMA_TABLE not in keyspace.tables:
+        return None
+    row = session.execute(f"SELECT fingerprint FROM {KEYSPACE}.{SCHEMA_TABLE} WHERE service = %s",
+                          (service,)).one()
+    return row.fingerprint if row else None
+
+
+def ensure_tables(session, service, tables):
+    """Checks at service start that the tables of a service match its models, with a single read.
+
+    Tables that do not match are created or updated, unless SCHEMA_AUTO_MIGRATE is "false", in which case
+    that is left to the init command of the service.
+
+    :param session: the session returned by get_session
+    :param service: the name of the service
+    :param tables: the cqlengine models of the service
+    :raises RuntimeError: if the tables do not match and may not be updated here
+    """
+    if recorded_fingerprint(session, service) == schema_fingerprint(tables):
+        return
+    if os.getenv('SCHEMA_AUTO_MIGRATE', 'true').lower() == 'false':
+        raise RuntimeError(f"The Scylla tables of the {service} service do not match its models, "
+                           f"run its init command")
+    create_tables(session, service, tables)
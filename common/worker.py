@@ -0,0 +1,55 @@
+import os
+import threading
+
+_initializers = []
+_started_pid = None
+_start_lock = threading.Lock()
+
+
+def on_worker_start(func):
+    """Registers func to be called once in every worker process before it serves requests, for work that must
+    not happen before gunicorn forks the worker, such as opening database connections or starting threads.
+
+    :param func: a callable without arguments
+    :return: func
+    """
+    _initializers.append(func)
+    return func
+
+
+def start_worker():
+    """Calls the registered functions, once per process. The gunicorn configuration calls this after forking a
+    worker; services also call it before their first request for servers without that hook.
+    """
+    global _started_pid
+    with _start_lock:
+        if _started_pid == os.getpid():
+            return
+        _started_pid = os.getpid()
+        for func in _initializers:
+            func()
+
+
+class LazyConnector:
+    def __init__(self, create):
+        """Stands in for a database connector that is only created in the worker process, so that a preloaded
+        application does not share database sockets between forked workers. The connector is created when the
+        worker starts, or on first use if that comes first.
+
+        :param create: a callable without arguments that returns the connector
+        """
+        self._create = create
+        self._connector = None
+        self._lock = threading.Lock()
+        on_worker_start(self.get)
+
+    def get(self):
+        """Returns the connector, creating it on the first call."""
+        if self._connector is None:
+            with self._lock:
+                if self._connector is None:
+                    self._connector = self._create()
+        return self._connector
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,21 @@
+import functools
+
+from flask import abort, jsonify
+
+from common.handlers import HttpError, response_parts, run_sync
+
+
+def handler(func):
+    """Binds a route of the Flask application to a handler shared with the Quart application (common.handlers).
+
+    :param func: function that calls the handler with the route parameters and returns its coroutine, which is
+    run synchronously
+    :return: the route function
+    """
+    @functools.wraps(func)
+    def route(*args, **kwargs):
+        try:
+            return response_parts(run_sync(func(*args, **kwargs)), jsonify)
+        except HttpError as error:
+            abort(error.status, error.description)
+    return route
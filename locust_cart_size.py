@@ -0,0 +1,32 @@
+import random
+from locust import HttpUser, task, between
+
+# Checkout latency per cart size. Compare the p99 of the "/orders/checkout/[order_id] (N items)" rows.
+CART_SIZES = (1, 5, 10, 25, 50)
+
+
+class CartSizeUser(HttpUser):
+    wait_time = between(1, 3)
+
+    def on_start(self):
+        self.item_ids = []
+        for _ in range(max(CART_SIZES)):
+            item = self.client.post("/stock/item/create/1", name="/stock/item/create/[price]")
+            item_id = item.json()["item_id"]
+            self.client.post(f"/stock/add/{item_id}/1000000", name="/stock/add/[item_id]/[number]")
+            self.item_ids.append(item_id)
+
+        user = self.client.post("/users/create", name="/users/create/")
+        self.user_id = user.json()["user_id"]
+        self.client.post(f"/users/credit/add/{self.user_id}/100000000", name="/users/credit/add/[user_id]/[amount]")
+
+    @task
+    def checkout_cart(self):
+        cart_size = random.choice(CART_SIZES)
+        order = self.client.post(f"/orders/create/{self.user_id}", name="/orders/create/[user_id]")
+        order_id = order.json()["order_id"]
+
+        for item_id in random.sample(self.item_ids, cart_size):
+            self.client.post(f"/orders/addItem/{order_id}/{item_id}", name="/orders/addItem/[order_id]/[item_id]")
+
+        self.client.post(f"/orders/checkout/{order_id}", name=f"/orders/checkout/[order_id] ({cart_size} items)")
@@ -0,0 +1,82 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from quart import jsonify
+from common.asgi import create_app, handler
+from common.async_http_client import HandlerClient, http_client
+from order_service import handlers
+from order_service.connector import ConnectorFactory
+from order_service.price_cache import price_cache
+from order_service.user_cache import user_cache
+
+app = create_app(__name__)
+connector = None
+client = HandlerClient(http_client)
+
+
+@app.before_serving
+async def start():
+    global connector
+    connector = await ConnectorFactory().get_async_connector()
+    await http_client.start()
+
+
+@app.after_serving
+async def stop():
+    await http_client.close()
+
+
+@app.route('/orders/metrics', methods=['GET'])
+async def metrics():
+    return jsonify({"http_client": http_client.stats(), "price_cache": price_cache.stats(),
+                    "user_cache": user_cache.stats()})
+
+
+@app.route('/orders/create/<user_id>', methods=['POST'])
+@handler
+async def create_order(user_id):
+    return await handlers.create_order(connector, client, user_id)
+
+
+@app.route('/orders/remove/<order_id>', methods=['DELETE'])
+@handler
+async def delete_order(order_id):
+    return await handlers.delete_order(connector, order_id)
+
+
+@app.route('/orders/find/<order_id>', methods=['GET'])
+@handler
+async def retrieve_order(order_id):
+    return await handlers.retrieve_order(connector, order_id)
+
+
+@app.route('/orders/findByUser/<user_id>', methods=['GET'])
+@handler
+async def retrieve_order_by_user(user_id):
+    return await handlers.retrieve_order_by_user(connector, user_id)
+
+
+@app.route('/orders/deleteByUser/<user_id>', methods=['DELETE'])
+@handler
+async def delete_order_by_user(user_id):
+    return await handlers.delete_order_by_user(connector, user_id)
+
+
+@app.route('/orders/addItem/<order_id>/<item_id>', methods=['POST'])
+@handler
+async def add_item(order_id, item_id):
+    return await handlers.add_item(connector, client, order_id, item_id)
+
+
+@app.route('/orders/removeItem/<order_id>/<item_id>', methods=['DELETE'])
+@handler
+async def remove_item(order_id, item_id):
+    return await handlers.remove_item(connector, order_id, item_id)
+
+
+@app.route('/orders/checkout/<order_id>', methods=['POST'])
+@handler
+async def checkout(order_id):
+    return await handlers.checkout(connector, client, order_id)
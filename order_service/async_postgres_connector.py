@@ -0,0 +1,125 @@
+import uuid
+
+from common.async_postgres import Query
+from common.ids import to_uuid
+from order_service import postgres_connector
+from order_service.connector import expand_item_counts
+
+# The statements of the synchronous connector.
+ORDER_SUMMARY_QUERY = Query(postgres_connector.ORDER_SUMMARY_QUERY)
+ADD_ITEM_QUERY = Query(postgres_connector.ADD_ITEM_QUERY)
+DELETE_ORDER_QUERY = Query(postgres_connector.DELETE_ORDER_QUERY)
+DELETE_USER_ORDERS_QUERY = Query(postgres_connector.DELETE_USER_ORDERS_QUERY)
+REMOVE_ITEM_QUERY = Query(postgres_connector.REMOVE_ITEM_QUERY)
+
+INSERT_ORDER_QUERY = Query('INSERT INTO "order" (order_id, user_id, paid) VALUES (:order_id, :user_id, false)')
+SELECT_USER_ORDERS_QUERY = Query('SELECT order_id FROM "order" WHERE user_id = :user_id')
+SET_PAID_QUERY = Query('UPDATE "order" SET paid = true WHERE order_id = :order_id RETURNING order_id')
+
+
+class AsyncPostgresConnector:
+    def __init__(self, pool):
+        """Runs the queries of PostgresConnector with asyncpg, for the ASGI application.
+
+        :param pool: the asyncpg pool returned by common.async_postgres.create_pool
+        """
+        self.pool = pool
+
+    async def create_order(self, user_id):
+        """creates an order for the given user, and returns an order_id
+
+        :param user_id: the user id
+        :return: the id of the order
+        """
+        order_id = uuid.uuid4()
+        await self.pool.execute(*INSERT_ORDER_QUERY.args(order_id=order_id, user_id=to_uuid(user_id, 'User')))
+        return order_id
+
+    async def delete_order(self, order_id):
+        """Deletes an order by ID
+
+        :param order_id: the id of the order to delete
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        """
+        if await self.pool.fetchval(*DELETE_ORDER_QUERY.args(order_id=to_uuid(order_id, 'Order'))) == 0:
+            raise ValueError(f"Order with id {order_id} not found")
+        return True
+
+    async def delete_orders_for_user(self, user_id):
+        """Deletes all orders of a user and their items with a single set-based statement
+
+        :param user_id: the id of the user
+        :raises ValueError: if the format of the user_id is invalid
+        :return: the number of deleted orders
+        """
+        return await self.pool.fetchval(*DELETE_USER_ORDERS_QUERY.args(user_id=to_uuid(user_id, 'User')))
+
+    async def add_item(self, item_id, order_id, item_price):
+        """Adds a given item in the order given with a single atomic upsert
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :param item_price: price of the item, only used when the item is not in the order yet
+        :raises ValueError: if the order does not exist or is already paid
+        :return: the number of the item in the order
+        """
+        if item_price < 0:
+            raise ValueError(f"Item price {item_price} is not valid")
+        item_num = await self.pool.fetchval(*ADD_ITEM_QUERY.args(
+            order_id=to_uuid(order_id, 'Order'), item_id=to_uuid(item_id, 'Item'), price=item_price))
+        if item_num is None:
+            raise ValueError(f"Order with id {order_id} not found or already completed")
+        return item_num
+
+    async def remove_item(self, order_id, item_id):
+        """Removes the given item from the given order with a single atomic statement
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist, is already paid or does not contain the item
+        :return: the number of the item left in the order
+        """
+        item_num = await self.pool.fetchval(*REMOVE_ITEM_QUERY.args(
+            order_id=to_uuid(order_id, 'Order'), item_id=to_uuid(item_id, 'Item')))
+        if item_num is None:
+            raise ValueError(f"Order {order_id} does not contain item {item_id} or is already completed")
+        return item_num
+
+    async def get_order_summary(self, order_id):
+        """
+        Get the order header and its aggregated items in a single round trip
+
+        :param order_id: id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: order summary (paid, user_id, total_cost, item_counts) where item_counts maps item ids to amounts
+        """
+        row = await self.pool.fetchrow(*ORDER_SUMMARY_QUERY.args(order_id=to_uuid(order_id, 'Order')))
+        if row is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return row['paid'], row['user_id'], row['total_cost'], row['item_counts']
+
+    async def get_order_info(self, order_id):
+        """
+        Get order information
+
+        :param order_id: id of the order
+        :return: order information (paid, items, user_id, total_cost)
+        """
+        paid, user_id, total_cost, item_counts = await self.get_order_summary(order_id)
+        return paid, expand_item_counts(item_counts), user_id, total_cost
+
+    async def get_order_ids_by_user(self, user_id):
+        rows = await self.pool.fetch(*SELECT_USER_ORDERS_QUERY.args(user_id=to_uuid(user_id, 'User')))
+        return [row['order_id'] for row in rows]
+
+    async def set_paid(self, order_id):
+        """
+        Set paid boolean of order
+
+        :param order_id: id of order to adjust
+        :raises ValueError: if the order does not exist
+        :return: True if success.
+        """
+        if await self.pool.fetchval(*SET_PAID_QUERY.args(order_id=to_uuid(order_id, 'Order'))) is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return True
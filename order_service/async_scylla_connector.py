@@ -0,0 +1,282 @@
+import uuid
+
+from cassandra.query import BatchStatement, BatchType
+
+from common.aio import gather_limited, wrap_future
+from common.ids import to_uuid
+from order_service.connector import expand_item_counts
+from order_service.scylla_connector import DELETE_CONCURRENCY, MAX_ITEM_UPDATE_ATTEMPTS, ScyllaConnector, \
+    ScyllaDocumentConnector
+
+
+class AsyncScyllaConnector:
+    SYNC_CONNECTOR = ScyllaConnector
+
+    def __init__(self, nodes):
+        """Runs the statements of ScyllaConnector with execute_async, for the ASGI application. Connecting and
+        preparing the statements is done by the connector in SYNC_CONNECTOR.
+        """
+        self.sync = self.SYNC_CONNECTOR(nodes)
+        self.session = self.sync.session
+
+    async def execute(self, statement, parameters=None):
+        return await wrap_future(self.session.execute_async(statement, parameters))
+
+    async def create_order(self, user_id):
+        """creates an order for the given user, and returns an order_id
+
+        :param user_id: the user id
+        :return: the id of the order
+        """
+        order_id = uuid.uuid4()
+        user_id = to_uuid(user_id, 'User')
+        batch = BatchStatement()
+        batch.add(self.sync.insert_order, (order_id, user_id))
+        batch.add(self.sync.insert_items_paid, (order_id, False))
+        batch.add(self.sync.insert_user_order, (user_id, order_id))
+        await self.execute(batch)
+        return order_id
+
+    async def delete_order(self, order_id):
+        """
+         deletes an order by ID
+        :param order_id: id of order to be deleted
+        """
+        order = await self.get_order(order_id)
+        batch = BatchStatement()
+        for statement, parameters in self.sync.order_deletes(order.order_id):
+            batch.add(statement, parameters)
+        batch.add(self.sync.delete_user_order, (order.user_id, order.order_id))
+        await self.execute(batch)
+
+    async def delete_orders_for_user(self, user_id):
+        """Deletes all orders of a user and their items like ScyllaConnector.delete_orders_for_user, with at most
+        DELETE_CONCURRENCY batches running at a time.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the format of the user_id is invalid
+        :return: the number of deleted orders
+        """
+        user_id = to_uuid(user_id, 'User')
+        batches = []
+        for row in await self.execute(self.sync.select_user_orders, (user_id,)):
+            batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+            for statement, parameters in self.sync.order_deletes(row.order_id):
+                batch.add(statement, parameters)
+            batches.append(batch)
+        await gather_limited(DELETE_CONCURRENCY, [self.execute(batch) for batch in batches])
+        await self.execute(self.sync.delete_user_orders, (user_id,))
+        return len(batches)
+
+    async def get_order(self, order_id):
+        """Retrieves the order from the database by its id.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
+        :return: the order row with order_id, user_id and paid
+        """
+        order = (await self.execute(self.sync.select_order, (to_uuid(order_id, 'Order'),))).one()
+        if order is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return order
+
+    async def add_item(self, order_id, item_id, item_price):
+        """Adds a given item in the order given like ScyllaConnector.add_item.
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :param item_price: the price of the item, only used when the item is not in the order yet
+        :raises ValueError: if the order does not exist or is already paid
+        :return: the number of the item in the order
+        """
+        if item_price < 0:
+            raise ValueError(f"Item price {item_price} is not valid")
+        order_id = to_uuid(order_id, 'Order')
+        item_id = to_uuid(item_id, 'Item')
+        item_num = None
+        for _ in range(MAX_ITEM_UPDATE_ATTEMPTS):
+            if item_num is None:
+                result = await self.execute(self.sync.insert_item, (item_price, order_id, item_id))
+            else:
+                result = await self.execute(self.sync.update_item_num, (item_num + 1, order_id, item_id, item_num))
+            if result.was_applied:
+                return (item_num or 0) + 1
+            item_num = self.sync.conflicting_item_num(order_id, result)
+        raise ValueError(f"Order {order_id} is being modified concurrently")
+
+    async def remove_item(self, order_id, item_id):
+        """Removes the given item from the given order like ScyllaConnector.remove_item.
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist, is already paid or does not contain the item
+        :return: the number of the item left in the order
+        """
+        order_id = to_uuid(order_id, 'Order')
+        item_id = to_uuid(item_id, 'Item')
+        item_num = 1
+        for _ in range(MAX_ITEM_UPDATE_ATTEMPTS):
+            if item_num is None:
+                raise ValueError(f"Order {order_id} does not contain item {item_id}")
+            if item_num == 1:
+                result = await self.execute(self.sync.delete_item, (order_id, item_id, item_num))
+            else:
+                result = await self.execute(self.sync.update_item_num, (item_num - 1, order_id, item_id, item_num))
+            if result.was_applied:
+                return item_num - 1
+            item_num = self.sync.conflicting_item_num(order_id, result)
+        raise ValueError(f"Order {order_id} is being modified concurrently")
+
+    async def get_order_summary(self, order_id):
+        """Get the order header and its aggregated items. The order and its items are read concurrently.
+
+        :param order_id: id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: order summary (paid, user_id, total_cost, item_counts) where item_counts maps item ids to amounts
+        """
+        order_id = to_uuid(order_id, 'Order')
+        items_future = wrap_future(self.session.execute_async(self.sync.select_items, (order_id,)))
+        order = (await self.execute(self.sync.select_order, (order_id,))).one()
+        items = await items_future
+        if order is None:
+            raise ValueError("Order with id not found")
+
+        total_cost = 0
+        item_counts = {}
+        for item in items:
+            if item.item_id is None:
+                # The static paid column of an order without items.
+                continue
+            total_cost += item.item_num * item.price
+            item_counts[str(item.item_id)] = item.item_num
+        return order.paid, order.user_id, total_cost, item_counts
+
+    async def get_order_info(self, order_id):
+        paid, user_id, total_cost, item_counts = await self.get_order_summary(order_id)
+        return paid, expand_item_counts(item_counts), user_id, total_cost
+
+    async def get_order_ids_by_user(self, user_id):
+        """Retrieves the ids of the orders of a user with a single partition read of orders_by_user.
+
+        :param user_id: the id of the user
+        :return: the list of order ids
+        """
+        rows = await self.execute(self.sync.select_user_orders, (to_uuid(user_id, 'User'),))
+        return [row.order_id for row in rows]
+
+    async def set_paid(self, order_id):
+        """Marks the order as paid in the static paid column of its items and then in the order itself, like
+        ScyllaConnector.set_paid.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: True
+        """
+        order = await self.get_order(order_id)
+        await self.execute(self.sync.update_items_paid, (order.order_id,))
+        await self.execute(self.sync.update_order_paid, (order.order_id, order.user_id))
+        return True
+
+
+class AsyncScyllaDocumentConnector(AsyncScyllaConnector):
+    """Runs the statements of ScyllaDocumentConnector, which stores every order as a single order_document row,
+    with execute_async.
+    """
+    SYNC_CONNECTOR = ScyllaDocumentConnector
+
+    async def get_document(self, order_id):
+        """Retrieves the order document with a single partition read.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: the order document row
+        """
+        document = (await self.execute(self.sync.select_document, (to_uuid(order_id, 'Order'),))).one()
+        if document is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return document
+
+    async def create_order(self, user_id):
+        """creates an order for the given user, and returns an order_id
+
+        :param user_id: the user id
+        :return: the id of the order
+        """
+        order_id = uuid.uuid4()
+        user_id = to_uuid(user_id, 'User')
+        batch = BatchStatement()
+        batch.add(self.sync.insert_document, (order_id, user_id))
+        batch.add(self.sync.insert_user_order, (user_id, order_id))
+        await self.execute(batch)
+        return order_id
+
+    async def get_order(self, order_id):
+        return await self.get_document(order_id)
+
+    async def add_item(self, order_id, item_id, item_price):
+        """Adds a given item in the order given
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :param item_price: the price of the item, only used when the item is not in the order yet
+        :return: the number of the item in the order
+        """
+        if item_price < 0:
+            raise ValueError(f"Item price {item_price} is not valid")
+        return await self.update_item(order_id, item_id, 1, item_price)
+
+    async def remove_item(self, order_id, item_id):
+        """Removes the given item from the given order
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :raises ValueError: if the item is not in the order
+        :return: the number of the item left in the order
+        """
+        return await self.update_item(order_id, item_id, -1)
+
+    async def update_item(self, order_id, item_id, delta, item_price=None):
+        """Changes the amount of an item in the order like ScyllaDocumentConnector.update_item.
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :param delta: the change of the item amount
+        :param item_price: the price of the item, only used when the item is not in the order yet
+        :raises ValueError: if the order is paid, does not contain the item or keeps changing concurrently
+        :return: the number of the item in the order
+        """
+        order_id = to_uuid(order_id, 'Order')
+        item_id = to_uuid(item_id, 'Item')
+        for _ in range(MAX_ITEM_UPDATE_ATTEMPTS):
+            document = await self.get_document(order_id)
+            if document.paid:
+                raise ValueError('Order already completed')
+            item_num = (document.items or {}).get(item_id)
+            if item_num is None and delta < 0:
+                raise ValueError(f"Order {order_id} does not contain item {item_id}")
+            price = item_price if item_num is None else document.prices[item_id]
+            new_item_num = (item_num or 0) + delta
+            if new_item_num > 0:
+                result = await self.execute(self.sync.set_item, (item_id, new_item_num, item_id, price,
+                                                                 order_id, item_id, item_num))
+            else:
+                result = await self.execute(self.sync.drop_item, ({item_id}, {item_id}, order_id, item_id, item_num))
+            if result.was_applied:
+                return new_item_num
+        raise ValueError(f"Order {order_id} is being modified concurrently")
+
+    async def get_order_summary(self, order_id):
+        """Get the order header and its aggregated items with a single partition read.
+
+        :param order_id: id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: order summary (paid, user_id, total_cost, item_counts) where item_counts maps item ids to amounts
+        """
+        document = await self.get_document(order_id)
+        item_counts = {str(item_id): item_num for item_id, item_num in (document.items or {}).items()}
+        return document.paid, document.user_id, self.sync.total_cost(document), item_counts
+
+    async def set_paid(self, order_id):
+        if not (await self.execute(self.sync.update_paid, (to_uuid(order_id, 'Order'),))).was_applied:
+            raise ValueError(f"Order with id {order_id} not found")
+        return True
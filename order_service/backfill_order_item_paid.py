@@ -0,0 +1,34 @@
+"""Fills the static paid column of the scylla_order_item table from the orders that existed before it was
+introduced. Until it has run, items cannot be added to or removed from these orders.
+
+Drain the order service (scale it to zero replicas) before running this, so no order is paid while it is copied,
+then redeploy the order service. Rerunning it is harmless. Inside the order service image:
+
+    DATABASE_TYPE=scylla SCYLLA_NODES="..." python backfill_order_item_paid.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from order_service.scylla_connector import ScyllaConnector
+
+
+def backfill(connector, concurrency=100):
+    """Copies the paid column of every order to the static paid column of its items.
+
+    :param connector: a ScyllaConnector
+    :param concurrency: the number of writes in flight
+    :return: the number of orders
+    """
+    rows = connector.session.execute("SELECT order_id, paid FROM wdm.scylla_order")
+    results = execute_concurrent_with_args(connector.session, connector.insert_items_paid,
+                                           ((row.order_id, bool(row.paid)) for row in rows),
+                                           concurrency=concurrency, raise_on_first_error=True)
+    return len(results)
+
+
+if __name__ == '__main__':
+    print(f"Backfilled {backfill(ScyllaConnector(os.getenv('SCYLLA_NODES').split(' ')))} orders")
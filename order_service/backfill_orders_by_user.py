@@ -0,0 +1,35 @@
+"""Fills the orders_by_user lookup table from the orders that existed before it was introduced.
+
+The order service maintains orders_by_user for every order it creates or deletes, so this only has to run
+once after deploying it. Rerunning it is harmless. Inside the order service image:
+
+    DATABASE_TYPE=scylla SCYLLA_NODES="..." python backfill_orders_by_user.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from order_service.connector import ConnectorFactory
+from order_service.scylla_connector import ScyllaDocumentConnector
+
+
+def backfill(connector, concurrency=100):
+    """Inserts a lookup row for every order of the order model the connector uses.
+
+    :param connector: a ScyllaConnector or ScyllaDocumentConnector
+    :param concurrency: the number of inserts in flight
+    :return: the number of orders
+    """
+    table = 'order_document' if isinstance(connector, ScyllaDocumentConnector) else 'scylla_order'
+    rows = connector.session.execute(f"SELECT order_id, user_id FROM wdm.{table}")
+    results = execute_concurrent_with_args(connector.session, connector.insert_user_order,
+                                           ((row.user_id, row.order_id) for row in rows),
+                                           concurrency=concurrency, raise_on_first_error=True)
+    return len(results)
+
+
+if __name__ == '__main__':
+    print(f"Backfilled {backfill(ConnectorFactory().get_connector())} orders")
@@ -1,20 +1,16 @@
 import os
-from time import sleep
 
-from cassandra import ConsistencyLevel
-from cassandra.cluster import Cluster
-from cassandra.cqlengine import connection, ValidationError
-from cassandra.cqlengine.management import sync_table
-from cassandra.cqlengine.query import QueryException
-from sqlalchemy import create_engine
-from sqlalchemy.exc import DataError
-from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy.orm.exc import NoResultFound
 
-from order_service.scylla_order_item import ScyllaOrderItem
-from order_service.scylla_order import ScyllaOrder
-from order_service.postgres_order_item import Base_order_item, PostgresOrderItem
-from order_service.postgres_order import PostgresOrder, Base_order
+def expand_item_counts(item_counts):
+    """Expands a mapping of item ids to amounts into a list with every item id repeated amount times.
+
+    :param item_counts: dict mapping item ids to the amount of that item
+    :return: the list of item ids
+    """
+    item_list = []
+    for item_id, item_num in item_counts.items():
+        item_list.extend([str(item_id)] * item_num)
+    return item_list
 
 
 class ConnectorFactory:
@@ -26,6 +22,7 @@ class ConnectorFactory:
         self.postgres_password = os.getenv('POSTGRES_PASSWORD', 'mysecretpassword')
         self.postgres_port = os.getenv('POSTGRES_PORT', '5432')
         self.postgres_name = os.getenv('POSTGRES_DB', 'postgres')
+        self.scylla_order_model = os.getenv('SCYLLA_ORDER_MODEL', 'tables')
         if os.getenv('SCYLLA_NODES'):
             self.scylla_nodes = os.getenv('SCYLLA_NODES').split(" ")
 
@@ -34,420 +31,60 @@ class ConnectorFactory:
         Returns the connector specified by the DATABASE_TYPE environment variable.
         :raises ValueError: if DATABASE_TYPE is not a valid database option
         :return: a PostgresConnector if DATABASE_TYPE is set to postgres,
-        or a ScyllaConnector if DATABASE_TYPE is set to scylla
+        or a ScyllaConnector if DATABASE_TYPE is set to scylla. With SCYLLA_ORDER_MODEL set to document
+        a ScyllaDocumentConnector is returned instead
         """
         if self.db_type == 'postgres':
+            from order_service.postgres_connector import PostgresConnector
             return PostgresConnector(self.postgres_user, self.postgres_password, self.db_host, self.postgres_port,
                                      self.postgres_name)
+        elif self.db_type == 'scylla' and self.scylla_order_model == 'document':
+            from order_service.scylla_connector import ScyllaDocumentConnector
+            return ScyllaDocumentConnector(self.scylla_nodes)
         elif self.db_type == 'scylla':
+            from order_service.scylla_connector import ScyllaConnector
             return ScyllaConnector(self.scylla_nodes)
         else:
             raise ValueError("Invalid database")
 
-
-class ScyllaConnector:
-    def __init__(self, nodes):
-        """Establishes a connection to the ScyllaDB database, creates the "wdm" keyspace if it does not exist
-        and creates or updates the stock_item table.
-        """
-        while True:
-            try:
-                session = Cluster(contact_points=nodes).connect()
-                break
-            except Exception:
-                sleep(1)
-        session.execute("""
-            CREATE KEYSPACE IF NOT EXISTS wdm
-            WITH replication = { 'class': 'SimpleStrategy', 'replication_factor': '3' }
-            """)
-        session.default_consistency_level = ConsistencyLevel.QUORUM
-
-        connection.setup(nodes, "wdm")
-        sync_table(ScyllaOrderItem)
-        sync_table(ScyllaOrder)
-        # Also sync the order table, retrieve everything.
-
-    @staticmethod
-    def create_order(user_id):
-        """creates an order for the given user, and returns an order_id
-
-        :param user_id: the user id
-        :return: the id of the order
-        """
-        order = ScyllaOrder.create(user_id=user_id, paid=False)
-        return order.order_id
-
-    @staticmethod
-    def delete_order(order_id):
-        """
-         deletes an order by ID
-        :param order_id: id of order to be deleted
-        """
-        try:
-            ScyllaOrder.get(order_id=order_id).delete()
-        except QueryException:
-            raise ValueError(f"Order with id {order_id} not found")
-
-    @staticmethod
-    def get_order(order_id):
-        """Retrieves the order from the database by its id.
-
-        :param order_id: the id of the order
-        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
-        :return: the order with id order_id
-        """
-        try:
-            order = ScyllaOrder.get(order_id=order_id)
-        except QueryException:
-            raise ValueError(f"Order with id {order_id} not found")
-        except ValidationError:
-            raise ValueError(f"Order id {order_id} is not a valid id")
-
-        return order
-
-    @staticmethod
-    def add_item(order_id, item_id, item_price):
-        """Adds a given item in the order given
-
-
-        :param order_id: the id of the order
-        :param item_id: the id of the item
-        :param item_price: the price of the item
-        :return: the list of item in order
-        """
-        if item_price < 0:
-            raise ValueError(f"Item price {item_price} is not valid")
-        try:
-            item = ScyllaOrderItem.get(item_id=item_id, order_id=order_id)
-            item.item_num += 1
-            ScyllaOrderItem.update(item)
-        except QueryException:
-            item = ScyllaOrderItem.create(item_id=item_id, order_id=order_id,
-                                          price=item_price, item_num=1)
-            ScyllaOrderItem.update(item)
-        return item.item_num
-
-    @staticmethod
-    def remove_item(order_id, item_id):
-        """Removes the given item from the given order
-
-        :param item_id: the id of the item
-        :param order_id: the id of the order
-        :raises AssertionError: if the item is not in the order
-        :return: the number of the item in stock
-        """
-        try:
-            item = ScyllaOrderItem.get(item_id=item_id, order_id=order_id)
-            item.item_num -= 1
-            ScyllaOrderItem.update(item)
-        except QueryException:
-            raise ValueError(f"Order {order_id} does not contain item {item_id}")
-        tmp = item.item_num
-        if item.item_num == 0:
-            ScyllaOrderItem.get(item_id=item_id, order_id=order_id).delete()
-        return tmp
-
-    @staticmethod
-    def get_order_info(order_id):
-        try:
-            order = ScyllaOrder.get(order_id=order_id)
-        except QueryException:
-            raise ValueError("Order with id not found")
-        except ValidationError:
-            raise ValueError("Invalid id provided")
-
-        try:
-            items = ScyllaOrderItem.objects.filter(order_id=order_id).all()
-            items = items[:]
-            total_cost = 0
-            item_list = []
-            for item in items:
-                total_cost += item.item_num * item.price
-                item_list.extend([str(item.item_id)] * item.item_num)
-        except QueryException:
-            # When there's no item in the order
-            item_list = []
-            total_cost = 0
-        return order.paid, item_list, order.user_id, total_cost
-
-    @staticmethod
-    def get_order_ids_by_user(user_id):
-        try:
-            orders = ScyllaOrder.objects.allow_filtering().filter(user_id=user_id).all()
-            order_ids = []
-            for order in list(orders):
-                order_ids.append(order.order_id)
-        except QueryException:
-            raise ValueError("No orders for user")
-        return order_ids
-
-    @staticmethod
-    def find_item(order_id, item_id):
-        try:
-            item = ScyllaOrderItem.get(item_id=item_id, order_id=order_id)
-            return True, item.price
-        except QueryException:
-            return False, None
-        except ValidationError:
-            raise ValueError("Not a valid UUID")
-
-    @staticmethod
-    def get_item_num(order_id, item_id):
-        try:
-            item = ScyllaOrderItem.get(item_id=item_id, order_id=order_id)
-            return item.item_num
-        except QueryException:
-            raise ValueError(f"Order {order_id} does not contain item {item_id}")
-
-    def set_paid(self, order_id):
-        order = self.get_order(order_id)
-        order.paid = True
-        ScyllaOrder.update(order)
-        return True
-
-
-class PostgresConnector:
-    def __init__(self, db_user, db_password, db_host, db_port, db_name):
-        """Establishes a connection to the PostgreSQL database, and creates or updates the order_item and order table.
-        """
-        self.engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}',
-                                    convert_unicode=True, pool_timeout=3)
-        self.db_session = scoped_session(sessionmaker(bind=self.engine))
-        Base_order.query = self.db_session.query_property()
-        Base_order.metadata.create_all(bind=self.engine)
-        Base_order_item.query = self.db_session.query_property()
-        Base_order_item.metadata.create_all(bind=self.engine)
-        PostgresOrder.metadata.create_all(bind=self.engine)
-        PostgresOrder.metadata.query = self.db_session.query_property()
-        PostgresOrderItem.metadata.create_all(bind=self.engine)
-        PostgresOrderItem.metadata.query = self.db_session.query_property()
-
-    def create_order(self, user_id):
-        """creates an order for the given user, and returns an order_id
-
-        :param user_id: the user id
-        :return: the id of the order
-        """
-        session = self.db_session()
-        try:
-            order = PostgresOrder(user_id=user_id)
-            session.add(order)
-            session.commit()
-            return order.order_id
-        finally:
-            session.close()
-
-    def create_order_item(self, order_id, item_id, price, item_num):
-        """creates an order for the given user, and returns an order_id
-
-        :param order_id: id of the order
-        :param item_id: id of the item
-        :param price: the user id
-        :param item_num: amount of items
-        :return: the id of the order
-        """
-        session = self.db_session()
-        try:
-            order_item = PostgresOrderItem(order_id, item_id, price, item_num)
-            session.add(order_item)
-            session.commit()
-            return order_item.order_id
-        finally:
-            session.close()
-
-    def get_order(self, order_id):
-        """Retrieves the order from the database by its id.
-
-        :param order_id: the id of the order
-        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
-        :return: the order with id order_id
+    async def get_async_connector(self):
         """
-        session = self.db_session()
-        try:
-            return session.query(PostgresOrder).filter_by(order_id=order_id).one()
-        except NoResultFound:
-            raise ValueError(f"Order with id {order_id} not found")
-        except DataError:
-            raise ValueError(f"Order id {order_id} is not a valid id")
-        finally:
-            session.close()
-
-    def get_order_item(self, order_id, item_id):
-        """Retrieves the order item from the database by its order_id and item_id
-
-        :param order_id: the id of the order
-        :param item_id: the id of the item
-        :return: the order item with ids order_id and item_id
-
-        """
-        session = self.db_session()
-        try:
-            return session.query(PostgresOrderItem) \
-                .filter_by(order_id=order_id, item_id=item_id).one()
-        except DataError:
-            raise ValueError(f"Item {item_id} in order {order_id} is not a valid id")
-        except NoResultFound:
-            raise ValueError(f"Item {item_id} in order {order_id} not found")
-        except ValidationError:
-            raise ValueError("Unknown exception (validation error)")
-        finally:
-            session.close()
-
-    def delete_order(self, order_id):
-        """Deletes an order by ID
-
-        :param order_id: the id of the order to delete
-        """
-        session = self.db_session()
-        try:
-            order = session.query(PostgresOrder).filter_by(order_id=order_id).one()
-            session.delete(order)
-            session.commit()
-            return True
-        except ValueError or QueryException:
-            raise ValueError(f"Order with id {order_id} not found")
-        finally:
-            session.close()
-
-    def add_item(self, item_id, order_id, item_price):
-        """Adds a given item in the order given
-
-
-        :param item_id: the id of the item
-        :param order_id: the id of the order
-        :param item_price: price of the item
-        :return: the list of item in order
-        """
-        if item_price < 0:
-            raise ValueError(f"Item price {item_price} is not valid")
-        session = self.db_session()
-        try:
-            item = session.query(PostgresOrderItem) \
-                .filter_by(order_id=order_id, item_id=item_id).one()
-            item.item_num += 1
-            session.commit()
-            return item.item_num
-        except NoResultFound:
-            order_item = PostgresOrderItem(order_id, item_id, item_price, 1)
-            session.add(order_item)
-            session.commit()
-            return order_item.item_num
-        finally:
-            session.close()
-
-    def remove_item(self, order_id, item_id):
-        """Removes the given item from the given order
-
-        :param item_id: the id of the item
-        :param order_id: the id of the order
-        :raises AssertionError: if the item is not in the order
-        :return: the list of the item in stock
-        """
-        session = self.db_session()
-        try:
-            item = session.query(PostgresOrderItem) \
-                .filter_by(order_id=order_id, item_id=item_id).one()
-            item.item_num -= 1
-            tmp = item.item_num
-            if item.item_num == 0:
-                session.delete(item)
-            session.commit()
-            return tmp
-        except ValueError:
-            raise ValueError(f"Order {order_id} does not contain item {item_id}")
-        finally:
-            session.close()
-
-    def get_order_info(self, order_id):
-        """
-        Get order information
-
-        :param order_id: id of the order
-        :return: order information (paid, items, user_id, total_cost)
-        """
-        session = self.db_session()
-        try:
-            order = session.query(PostgresOrder).filter_by(order_id=order_id).one()
-            items = session.query(PostgresOrderItem) \
-                .filter_by(order_id=order_id).all()
-            total_cost = 0
-            item_list = []
-            for item in items:
-                total_cost += item.item_num * item.price
-                item_list.extend([str(item.item_id)] * item.item_num)
-            return order.paid, item_list, order.user_id, total_cost
-        except Exception:
-            raise
-        finally:
-            session.close()
-
-    def get_order_ids_by_user(self, user_id):
-        session = self.db_session()
-        try:
-            orders = session.query(PostgresOrder).filter_by(user_id=user_id).all()
-            order_ids = []
-            for order in list(orders):
-                order_ids.append(order.order_id)
-            return order_ids
-        except QueryException:
-            raise ValueError("No orders for user")
-        finally:
-            session.close()
-            
-    def find_item(self, order_id, item_id):
-        """
-        Check whether an item is present in the order
-
-        :param order_id: id of order to look in
-        :param item_id: id of item to look for
-        :return: Boolean indicating whether item was found, price if found
-        """
-        session = self.db_session()
-        try:
-            item = session.query(PostgresOrderItem) \
-                .filter_by(order_id=order_id, item_id=item_id).one()
-            if item is None:
-                return False, None
-            return True, item.price
-        except NoResultFound:
-            return False, None
-        except DataError:
-            raise ValueError("Not legal item id")
-        finally:
-            session.close()
-
-    def get_item_num(self, order_id, item_id):
-        """
-        Get the amount of item with item_id in order with order_id
-
-        :param order_id: id of order to look in
-        :param item_id: id of item to count
-        :return: amount of occurrences of item with item_id in order with order_id
-        """
-        session = self.db_session()
-        try:
-            item = session.query(PostgresOrderItem) \
-                .filter_by(order_id=order_id, item_id=item_id).one()
-            return item.item_num
-        except NoResultFound:
-            raise ValueError(f"Order {order_id} does not contain item {item_id}")
-        finally:
-            session.close()
-
-    def set_paid(self, order_id):
+        Returns the connector of the ASGI application for the DATABASE_TYPE environment variable, which has the
+        methods of the connector returned by get_connector as coroutines.
+        :raises ValueError: if DATABASE_TYPE is not a valid database option
+        :return: an AsyncPostgresConnector if DATABASE_TYPE is set to postgres,
+        or an AsyncScyllaConnector if DATABASE_TYPE is set to scylla. With SCYLLA_ORDER_MODEL set to document
+        an AsyncScyllaDocumentConnector is returned instead
         """
-        Set paid boolean of order
+        if self.db_type == 'postgres':
+            from common.async_postgres import create_pool
+            from order_service.async_postgres_connector import AsyncPostgresConnector
+            return AsyncPostgresConnector(await create_pool(self.postgres_user, self.postgres_password, self.db_host,
+                                                            self.postgres_port, self.postgres_name))
+        elif self.db_type == 'scylla' and self.scylla_order_model == 'document':
+            from order_service.async_scylla_connector import AsyncScyllaDocumentConnector
+            return AsyncScyllaDocumentConnector(self.scylla_nodes)
+        elif self.db_type == 'scylla':
+            from order_service.async_scylla_connector import AsyncScyllaConnector
+            return AsyncScyllaConnector(self.scylla_nodes)
+        else:
+            raise ValueError("Invalid database")
 
-        :param order_id: id of order to adjust
-        :return: True if success.
+    def init_schema(self):
+        """Creates or migrates the schema of the database specified by the DATABASE_TYPE environment variable.
+        This is run once per deployment by init.py, before the workers start.
+        :raises ValueError: if DATABASE_TYPE is not a valid database option
+        :return: a description of the changes
         """
-        session = self.db_session()
-        try:
-            order = session.query(PostgresOrder).filter_by(order_id=order_id).one()
-            order.paid = True
-            session.commit()
-            return True
-        except Exception:
-            raise
-        finally:
-            session.close()
+        if self.db_type == 'postgres':
+            from order_service.postgres_connector import PostgresConnector
+            return PostgresConnector.init_schema(self.postgres_user, self.postgres_password, self.db_host,
+                                                 self.postgres_port, self.postgres_name)
+        elif self.db_type == 'scylla' and self.scylla_order_model == 'document':
+            from order_service.scylla_connector import ScyllaDocumentConnector
+            return ScyllaDocumentConnector.init_schema(self.scylla_nodes)
+        elif self.db_type == 'scylla':
+            from order_service.scylla_connector import ScyllaConnector
+            return ScyllaConnector.init_schema(self.scylla_nodes)
+        else:
+            raise ValueError("Invalid database")
@@ -0,0 +1,259 @@
+import logging
+import os
+from decimal import Decimal
+
+from markupsafe import escape
+
+from common.backoff import retry_with_backoff_async
+from common.handlers import CallError, HttpError
+from order_service.price_cache import price_cache
+from order_service.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+user_host = os.getenv('USERS_SERVICE', '127.0.0.1:8080')
+stock_host = os.getenv('STOCK_SERVICE', '127.0.0.1:8080')
+payment_host = os.getenv('PAYMENT_SERVICE', '127.0.0.1:8080')
+# Maximum number of concurrent requests to the stock service made by a single checkout.
+stock_concurrency = int(os.getenv('STOCK_CONCURRENCY', '16'))
+# Seconds a rollback keeps retrying a payment that is being changed or a service that fails. Longer than
+# PAYMENT_PENDING_TIMEOUT_S of the payment service, so a payment left pending settles within it.
+rollback_deadline = float(os.getenv('ROLLBACK_DEADLINE_S', '90'))
+
+
+async def create_order(connector, client, user_id):
+    """
+    creates an order for the given user, and returns an order_id
+    :param user_id: id of user to create order for
+    :return: the order’s id
+    """
+    try:
+        if not await user_cache.exists_async(user_id, lambda checked_id: user_exists(client, checked_id)):
+            raise HttpError(404)
+    except ValueError:
+        raise HttpError(404)
+    return {"order_id": await connector.create_order(user_id)}
+
+
+async def user_exists(client, user_id):
+    """Asks the users service whether a user exists.
+
+    :param user_id: id of the user
+    :return: whether the user exists
+    """
+    return (await client.get(f"http://{user_host}/users/find/{user_id}")).ok
+
+
+async def delete_order(connector, order_id):
+    """
+    deletes an order by ID
+
+    :param order_id: id of order to be deleted
+    """
+    try:
+        await connector.delete_order(escape(order_id))
+    except ValueError:
+        raise HttpError(404)
+    return {"success": True}
+
+
+async def retrieve_order(connector, order_id):
+    try:
+        order_paid, order_items, order_userid, total_cost = await connector.get_order_info(escape(order_id))
+    except ValueError:
+        raise HttpError(404)
+    return {
+        "order_id": order_id,
+        "paid": str(order_paid),
+        "items": order_items,
+        "user_id": order_userid,
+        "total_cost": str(total_cost)
+    }
+
+
+async def retrieve_order_by_user(connector, user_id):
+    try:
+        return {'order_ids': await connector.get_order_ids_by_user(user_id)}
+    except ValueError:
+        raise HttpError(404)
+
+
+async def delete_order_by_user(connector, user_id):
+    try:
+        await connector.delete_orders_for_user(escape(user_id))
+    except ValueError:
+        raise HttpError(404)
+    # Forgotten after the deletion, so a concurrent order creation cannot cache the user again before it.
+    user_cache.forget(user_id)
+    return {"success": True}
+
+
+async def add_item(connector, client, order_id, item_id):
+    try:
+        price = await get_item_price(client, item_id)
+        item_num = await connector.add_item(order_id=order_id, item_id=item_id, item_price=price)
+    except ValueError:
+        raise HttpError(404)
+    return {'item_amount': str(item_num)}
+
+
+async def remove_item(connector, order_id, item_id):
+    try:
+        item_num = await connector.remove_item(order_id, item_id)
+    except ValueError as error:
+        raise HttpError(404, error.args[0])
+    return {'item_amount': str(item_num)}
+
+
+async def get_item_price(client, item_id):
+    """Returns the price of an item from the price cache, which looks it up in the stock service on a miss.
+
+    :param item_id: id of the item
+    :raises ValueError: if the item does not exist
+    :return: the price of the item
+    """
+    return await price_cache.get_async(item_id, lambda loaded_id: load_item_price(client, loaded_id),
+                                       client.run_blocking)
+
+
+async def load_item_price(client, item_id):
+    """Looks up the price of an item in the stock service.
+
+    :param item_id: id of the item
+    :raises ValueError: if the stock service failed
+    :return: the price of the item, or None if the item does not exist
+    """
+    reply = await client.get(f"http://{stock_host}/stock/find/{item_id}")
+    if reply.status == 404:
+        return None
+    if not reply.ok:
+        raise ValueError(f"Price of item {item_id} not available")
+    return Decimal(str(reply.json()['price']))
+
+
+async def checkout(connector, client, order_id):
+    """
+    makes the payment (via calling the payment service), subtracts
+    the stock (via the stock service) and returns a status (success/
+    failure).
+
+    """
+    try:
+        order_paid, user_id, total_cost, item_counts = await connector.get_order_summary(escape(order_id))
+
+        if order_paid:
+            raise ValueError("Order already completed")
+
+        await pay_order(client, user_id, order_id, total_cost)
+        await reserve_items(client, order_id, user_id, item_counts)
+        try:
+            await connector.set_paid(order_id=order_id)
+        except Exception:
+            items_rolled_back = await rollback_items(client, item_counts)
+            await rollback_payment(client, user_id, order_id)
+            if not items_rolled_back:
+                raise RuntimeError("The stock of the order could not be added back")
+            raise
+
+        return {'status': 'success'}
+    except ValueError as error:
+        raise HttpError(400, error.args[0])
+    except RuntimeError as error:
+        raise HttpError(503, error.args[0])
+
+
+async def pay_order(client, user_id, order_id, amount):
+    """Pays the order through the payment service. If the payment service cannot be reached, does not answer
+    in time or fails, the payment may have been made all the same, so it is cancelled.
+
+    :raises ValueError: if the payment is refused or its outcome is unknown
+    :raises RuntimeError: if the payment of unknown outcome could not be cancelled
+    """
+    try:
+        reply = await client.post(f'http://{payment_host}/payment/pay/{user_id}/{order_id}/{amount}')
+    except CallError:
+        await rollback_payment(client, user_id, order_id)
+        raise ValueError("The payment service is unavailable")
+    if reply.status >= 500:
+        await rollback_payment(client, user_id, order_id)
+        raise ValueError("The payment service is unavailable")
+    if not reply.ok:
+        raise ValueError("Not enough credit")
+
+
+async def rollback_payment(client, user_id, order_id):
+    """Cancels the payment of the order. A payment that is still being changed (409) or a payment service that
+    fails or cannot be reached is retried with backoff until the cancellation is made or refused, as a payment
+    that was never made is (400).
+
+    :raises RuntimeError: if the cancellation did not settle within rollback_deadline seconds
+    :return: the final reply of the payment service
+    """
+    async def cancel():
+        reply = await client.post(f'http://{payment_host}/payment/cancel/{user_id}/{order_id}')
+        if reply.status == 409 or reply.status >= 500:
+            raise ValueError(f"the payment service answered {reply.status}")
+        return reply
+
+    try:
+        return await retry_with_backoff_async(cancel, f"cancel the payment of order {order_id}", rollback_deadline,
+                                              client.sleep)
+    except RuntimeError:
+        logger.exception("The payment of order %s was not cancelled", order_id)
+        raise RuntimeError("The payment could not be cancelled")
+
+
+async def reserve_items(client, order_id, user_id, item_counts):
+    """Subtracts the stock of all items in the order with a single all-or-nothing batch request.
+    If the batch fails or the stock service cannot be reached, the payment is rolled back.
+
+    :param order_id: id of the order
+    :param user_id: id of the user that paid for the order
+    :param item_counts: dict mapping item ids to the amount of that item in the order
+    :raises ValueError: if there is not enough stock for one of the items, or the stock service is unavailable
+    """
+    try:
+        reply = await client.post(f'http://{stock_host}/stock/subtract_batch',
+                                  json=[[item_id, number] for item_id, number in item_counts.items()])
+    except CallError:
+        await rollback_payment(client, user_id, order_id)
+        raise ValueError("The stock service is unavailable")
+    if not reply.ok:
+        await rollback_payment(client, user_id, order_id)
+        if reply.status >= 500:
+            logger.error("Subtracting the stock of order %s failed with %s", order_id, reply.status)
+            raise ValueError("The stock service is unavailable")
+        raise ValueError("Not enough stock")
+
+
+async def rollback_item(client, item_id, number):
+    """Adds an amount back to the stock of an item, retrying with backoff while the stock service fails or
+    cannot be reached.
+
+    :return: whether the stock was added back
+    """
+    async def add():
+        reply = await client.post(f'http://{stock_host}/stock/add/{item_id}/{number}')
+        if reply.status >= 500:
+            raise ValueError(f"the stock service answered {reply.status}")
+        return reply
+
+    try:
+        reply = await retry_with_backoff_async(add, f"add back {number} of item {item_id}", rollback_deadline,
+                                               client.sleep)
+    except RuntimeError:
+        logger.exception("Adding back %s of item %s failed", number, item_id)
+        return False
+    if not reply.ok:
+        logger.error("Adding back %s of item %s was refused with %s", number, item_id, reply.status)
+    return reply.ok
+
+
+async def rollback_items(client, item_counts):
+    """Adds the given amounts back to the stock of the items, at most stock_concurrency at a time.
+
+    :param item_counts: dict mapping item ids to the amount to add back
+    :return: whether the stock of all items was added back
+    """
+    return all(await client.map(stock_concurrency, lambda item_id, number: rollback_item(client, item_id, number),
+                                list(item_counts.items())))
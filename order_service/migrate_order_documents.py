@@ -0,0 +1,41 @@
+"""Copies orders from the order and order_item tables into the order_document table.
+
+Drain the order service (scale it to zero replicas) before running this, so no order changes while it is
+copied, then redeploy the order service with SCYLLA_ORDER_MODEL=document. Inside the order service image:
+
+    DATABASE_TYPE=scylla SCYLLA_NODES="..." python migrate_order_documents.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from order_service.scylla_connector import ScyllaDocumentConnector
+from order_service.scylla_order import ScyllaOrder
+from order_service.scylla_order_item import ScyllaOrderItem
+
+
+def migrate(connector):
+    """Writes one order document per order, overwriting documents that already exist.
+
+    :param connector: a ScyllaDocumentConnector
+    :return: the number of migrated orders
+    """
+    insert = connector.session.prepare(
+        "INSERT INTO wdm.order_document (order_id, user_id, paid, items, prices) VALUES (?, ?, ?, ?, ?)")
+    migrated = 0
+    for order in ScyllaOrder.objects.all():
+        items = {}
+        prices = {}
+        for item in ScyllaOrderItem.objects.filter(order_id=order.order_id).all():
+            if item.item_id is None:
+                continue
+            items[item.item_id] = item.item_num
+            prices[item.item_id] = item.price
+        connector.session.execute(insert, (order.order_id, order.user_id, bool(order.paid), items, prices))
+        migrated += 1
+    return migrated
+
+
+if __name__ == '__main__':
+    print(f"Migrated {migrate(ScyllaDocumentConnector(os.getenv('SCYLLA_NODES').split(' ')))} orders")
@@ -0,0 +1,340 @@
+import os
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm.exc import NoResultFound
+
+from common.migrations import ensure_schema, init_postgres
+from order_service.connector import expand_item_counts
+from order_service.postgres_order_item import Base_order_item, PostgresOrderItem
+from order_service.postgres_order import PostgresOrder, Base_order
+
+# Connections kept open per worker, and opened on top of those under load. The gunicorn configuration
+# sizes the concurrent requests per worker to match.
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+# Order header, total cost and per-item amounts in one round trip, aggregated by the database.
+ORDER_SUMMARY_QUERY = text("""
+    SELECT o.paid,
+           o.user_id,
+           COALESCE(SUM(oi.item_num * oi.price), 0) AS total_cost,
+           COALESCE(json_object_agg(oi.item_id, oi.item_num) FILTER (WHERE oi.item_id IS NOT NULL), '{}')
+               AS item_counts
+    FROM "order" o
+    LEFT OUTER JOIN order_item oi ON oi.order_id = o.order_id
+    WHERE o.order_id = :order_id
+    GROUP BY o.order_id, o.user_id, o.paid
+""")
+
+# Adds one of the item to the order if the order exists and is unpaid, inserting the order item if needed.
+ADD_ITEM_QUERY = text("""
+    INSERT INTO order_item (order_id, item_id, price, item_num)
+    SELECT o.order_id, CAST(:item_id AS uuid), CAST(:price AS numeric), 1
+    FROM "order" o
+    WHERE o.order_id = :order_id AND NOT o.paid
+    ON CONFLICT (order_id, item_id) DO UPDATE SET item_num = order_item.item_num + 1
+    RETURNING item_num
+""")
+
+# Deletes an order, returning the number of deleted orders. Its items are deleted by the ON DELETE CASCADE of
+# order_item_order_id_fkey.
+DELETE_ORDER_QUERY = text("""
+    WITH deleted AS (
+        DELETE FROM "order" WHERE order_id = :order_id RETURNING order_id
+    )
+    SELECT count(*) AS orders FROM deleted
+""")
+
+# Deletes all orders of a user, returning the number of deleted orders. Their items are deleted by the cascade.
+DELETE_USER_ORDERS_QUERY = text("""
+    WITH deleted AS (
+        DELETE FROM "order" WHERE user_id = :user_id RETURNING order_id
+    )
+    SELECT count(*) AS orders FROM deleted
+""")
+
+# Removes one of the item from the order if the order exists and is unpaid, deleting the last one.
+# The item row is locked first and its latest item_num decides between the delete and the update, so at most one
+# of them applies and a concurrent removal of the same item is waited for instead of making both miss the row.
+REMOVE_ITEM_QUERY = text("""
+    WITH unpaid AS (
+        SELECT 1 FROM "order" WHERE order_id = :order_id AND NOT paid
+    ), locked AS (
+        SELECT item_num FROM order_item
+        WHERE order_id = :order_id AND item_id = :item_id AND EXISTS (SELECT 1 FROM unpaid)
+        FOR UPDATE
+    ), deleted AS (
+        DELETE FROM order_item
+        WHERE order_id = :order_id AND item_id = :item_id AND (SELECT item_num FROM locked) <= 1
+        RETURNING 0 AS item_num
+    ), updated AS (
+        UPDATE order_item SET item_num = item_num - 1
+        WHERE order_id = :order_id AND item_id = :item_id AND (SELECT item_num FROM locked) > 1
+        RETURNING item_num
+    )
+    SELECT item_num FROM deleted UNION ALL SELECT item_num FROM updated
+""")
+
+
+class PostgresConnector:
+    def __init__(self, db_user, db_password, db_host, db_port, db_name):
+        """Establishes a connection to the PostgreSQL database, and checks that it has the current schema.
+        """
+        self.engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}',
+                                    convert_unicode=True, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                    pool_timeout=3)
+        self.db_session = scoped_session(sessionmaker(bind=self.engine))
+        Base_order.query = self.db_session.query_property()
+        Base_order_item.query = self.db_session.query_property()
+        PostgresOrder.metadata.query = self.db_session.query_property()
+        PostgresOrderItem.metadata.query = self.db_session.query_property()
+        ensure_schema(self.engine)
+
+    @staticmethod
+    def init_schema(db_user, db_password, db_host, db_port, db_name):
+        """Applies the migrations the PostgreSQL database does not have yet.
+
+        :return: a description of the changes
+        """
+        applied = init_postgres(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
+        return f"applied Postgres migrations {applied}"
+
+    def create_order(self, user_id):
+        """creates an order for the given user, and returns an order_id
+
+        :param user_id: the user id
+        :return: the id of the order
+        """
+        session = self.db_session()
+        try:
+            order = PostgresOrder(user_id=user_id)
+            session.add(order)
+            session.commit()
+            return order.order_id
+        finally:
+            session.close()
+
+    def create_order_item(self, order_id, item_id, price, item_num):
+        """creates an order for the given user, and returns an order_id
+
+        :param order_id: id of the order
+        :param item_id: id of the item
+        :param price: the user id
+        :param item_num: amount of items
+        :return: the id of the order
+        """
+        session = self.db_session()
+        try:
+            order_item = PostgresOrderItem(order_id, item_id, price, item_num)
+            session.add(order_item)
+            session.commit()
+            return order_item.order_id
+        finally:
+            session.close()
+
+    def get_order(self, order_id):
+        """Retrieves the order from the database by its id.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
+        :return: the order with id order_id
+        """
+        session = self.db_session()
+        try:
+            return session.query(PostgresOrder).filter_by(order_id=order_id).one()
+        except NoResultFound:
+            raise ValueError(f"Order with id {order_id} not found")
+        except DataError:
+            raise ValueError(f"Order id {order_id} is not a valid id")
+        finally:
+            session.close()
+
+    def get_order_item(self, order_id, item_id):
+        """Retrieves the order item from the database by its order_id and item_id
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :return: the order item with ids order_id and item_id
+
+        """
+        session = self.db_session()
+        try:
+            return session.query(PostgresOrderItem) \
+                .filter_by(order_id=order_id, item_id=item_id).one()
+        except DataError:
+            raise ValueError(f"Item {item_id} in order {order_id} is not a valid id")
+        except NoResultFound:
+            raise ValueError(f"Item {item_id} in order {order_id} not found")
+        finally:
+            session.close()
+
+    def delete_order(self, order_id):
+        """Deletes an order by ID
+
+        :param order_id: the id of the order to delete
+        """
+        try:
+            with self.engine.begin() as conn:
+                deleted = conn.execute(DELETE_ORDER_QUERY, order_id=order_id).scalar()
+        except DataError:
+            raise ValueError(f"Order id {order_id} is not a valid id")
+        if deleted == 0:
+            raise ValueError(f"Order with id {order_id} not found")
+        return True
+
+    def delete_orders_for_user(self, user_id):
+        """Deletes all orders of a user and their items with a single set-based statement
+
+        :param user_id: the id of the user
+        :raises ValueError: if the format of the user_id is invalid
+        :return: the number of deleted orders
+        """
+        try:
+            with self.engine.begin() as conn:
+                return conn.execute(DELETE_USER_ORDERS_QUERY, user_id=user_id).scalar()
+        except DataError:
+            raise ValueError(f"User id {user_id} is not a valid id")
+
+    def add_item(self, item_id, order_id, item_price):
+        """Adds a given item in the order given with a single atomic upsert
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :param item_price: price of the item, only used when the item is not in the order yet
+        :raises ValueError: if the order does not exist or is already paid
+        :return: the number of the item in the order
+        """
+        if item_price < 0:
+            raise ValueError(f"Item price {item_price} is not valid")
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(ADD_ITEM_QUERY, order_id=order_id, item_id=item_id, price=item_price).first()
+        except DataError:
+            raise ValueError(f"Item {item_id} in order {order_id} is not a valid id")
+        if row is None:
+            raise ValueError(f"Order with id {order_id} not found or already completed")
+        return row.item_num
+
+    def remove_item(self, order_id, item_id):
+        """Removes the given item from the given order with a single atomic statement
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist, is already paid or does not contain the item
+        :return: the number of the item left in the order
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(REMOVE_ITEM_QUERY, order_id=order_id, item_id=item_id).first()
+        except DataError:
+            raise ValueError(f"Item {item_id} in order {order_id} is not a valid id")
+        if row is None:
+            raise ValueError(f"Order {order_id} does not contain item {item_id} or is already completed")
+        return row.item_num
+
+    def get_order_summary(self, order_id):
+        """
+        Get the order header and its aggregated items in a single round trip
+
+        :param order_id: id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: order summary (paid, user_id, total_cost, item_counts) where item_counts maps item ids to amounts
+        """
+        try:
+            with self.engine.connect() as conn:
+                row = conn.execute(ORDER_SUMMARY_QUERY, order_id=order_id).first()
+        except DataError:
+            raise ValueError(f"Order id {order_id} is not a valid id")
+        if row is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return row.paid, row.user_id, row.total_cost, row.item_counts
+
+    def get_order_info(self, order_id):
+        """
+        Get order information
+
+        :param order_id: id of the order
+        :return: order information (paid, items, user_id, total_cost)
+        """
+        paid, user_id, total_cost, item_counts = self.get_order_summary(order_id)
+        return paid, expand_item_counts(item_counts), user_id, total_cost
+
+    def get_order_ids_by_user(self, user_id):
+        """Retrieves the ids of the orders of a user.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the format of the user_id is invalid
+        :return: the list of order ids
+        """
+        session = self.db_session()
+        try:
+            orders = session.query(PostgresOrder).filter_by(user_id=user_id).all()
+            order_ids = []
+            for order in list(orders):
+                order_ids.append(order.order_id)
+            return order_ids
+        except DataError:
+            raise ValueError(f"User id {user_id} is not a valid id")
+        finally:
+            session.close()
+            
+    def find_item(self, order_id, item_id):
+        """
+        Check whether an item is present in the order
+
+        :param order_id: id of order to look in
+        :param item_id: id of item to look for
+        :return: Boolean indicating whether item was found, price if found
+        """
+        session = self.db_session()
+        try:
+            item = session.query(PostgresOrderItem) \
+                .filter_by(order_id=order_id, item_id=item_id).one()
+            if item is None:
+                return False, None
+            return True, item.price
+        except NoResultFound:
+            return False, None
+        except DataError:
+            raise ValueError("Not legal item id")
+        finally:
+            session.close()
+
+    def get_item_num(self, order_id, item_id):
+        """
+        Get the amount of item with item_id in order with order_id
+
+        :param order_id: id of order to look in
+        :param item_id: id of item to count
+        :return: amount of occurrences of item with item_id in order with order_id
+        """
+        session = self.db_session()
+        try:
+            item = session.query(PostgresOrderItem) \
+                .filter_by(order_id=order_id, item_id=item_id).one()
+
+            return item.item_num
+        except NoResultFound:
+            raise ValueError(f"Order {order_id} does not contain item {item_id}")
+        finally:
+            session.close()
+
+    def set_paid(self, order_id):
+        """
+        Set paid boolean of order
+
+        :param order_id: id of order to adjust
+        :return: True if success.
+        """
+        session = self.db_session()
+        try:
+            order = session.query(PostgresOrder).filter_by(order_id=order_id).one()
+            order.paid = True
+            session.commit()
+            return True
+        except Exception:
+            raise
+        finally:
+            session.close()
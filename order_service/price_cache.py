@@ -0,0 +1,124 @@
+import asyncio
+import os
+import threading
+from decimal import Decimal
+
+from common.cache import MISSING, LRUCache
+from common.ids import to_uuid
+
+
+class PriceCache:
+    def __init__(self):
+        """Read-through cache of item prices, configured by the environment variables:
+
+            PRICE_CACHE_SIZE            the number of prices kept per worker, 0 disables the cache
+            PRICE_CACHE_NEGATIVE_TTL_S  seconds for which an item that does not exist is remembered
+            PRICE_CACHE_SERVER          host:port of a memcached server shared by the workers, none by default
+
+        The price of an item never changes after it is created, so prices stay cached until they are evicted.
+        Items that were not found are only kept locally and briefly, as they may be created in the meantime.
+        """
+        self.local = LRUCache(int(os.getenv('PRICE_CACHE_SIZE', '100000')))
+        self.negative_ttl = float(os.getenv('PRICE_CACHE_NEGATIVE_TTL_S', '1'))
+        self.lock = threading.Lock()
+        self.counters = {'negative_hits': 0, 'shared_hits': 0, 'shared_misses': 0, 'loads': 0}
+        self.shared = None
+        server = os.getenv('PRICE_CACHE_SERVER')
+        if server:
+            from pymemcache.client.base import PooledClient
+
+            # A cache server that is down or slow counts as a miss.
+            self.shared = PooledClient(server, connect_timeout=0.05, timeout=0.05, ignore_exc=True)
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def lookup_local(self, item_id):
+        price = self.local.get(item_id)
+        if price is None:
+            self.count('negative_hits')
+        return price
+
+    def lookup_shared(self, item_id):
+        """Reads a price from the shared cache server and caches it locally.
+
+        :return: the price, or MISSING if it is not cached
+        """
+        value = self.shared.get(f"price:{item_id}")
+        if value is None:
+            self.count('shared_misses')
+            return MISSING
+        self.count('shared_hits')
+        price = Decimal(value.decode())
+        self.local.set(item_id, price)
+        return price
+
+    def store(self, item_id, price):
+        """Caches the price loaded for an item locally, None if the item does not exist.
+
+        :return: whether the price should be stored on the shared cache server as well
+        """
+        self.count('loads')
+        self.local.set(item_id, price, ttl=self.negative_ttl if price is None else None)
+        return price is not None and self.shared is not None
+
+    def share(self, item_id, price):
+        self.shared.set(f"price:{item_id}", str(price).encode(), noreply=True)
+
+    @staticmethod
+    def result(item_id, price):
+        if price is None:
+            raise ValueError(f"Item {item_id} not found")
+        return price
+
+    def get(self, item_id, load):
+        """Returns the price of an item, loading it with load on a miss.
+
+        :param item_id: the id of the item
+        :param load: function that returns the price of an item, or None if the item does not exist
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :return: the price of the item
+        """
+        item_id = str(to_uuid(item_id, 'Item'))
+        price = self.lookup_local(item_id)
+        if price is MISSING and self.shared is not None:
+            price = self.lookup_shared(item_id)
+        if price is MISSING:
+            price = load(item_id)
+            if self.store(item_id, price):
+                self.share(item_id, price)
+        return self.result(item_id, price)
+
+    async def get_async(self, item_id, load, run_blocking=None):
+        """Returns the price of an item like get, for the request handlers. load is a coroutine function, and
+        the shared cache server is used through run_blocking.
+
+        :param run_blocking: coroutine function that calls a blocking function with the given arguments, by
+        default in a thread of the default executor
+        """
+        run_blocking = run_blocking or self.run_in_executor
+        item_id = str(to_uuid(item_id, 'Item'))
+        price = self.lookup_local(item_id)
+        if price is MISSING and self.shared is not None:
+            price = await run_blocking(self.lookup_shared, item_id)
+        if price is MISSING:
+            price = await load(item_id)
+            if self.store(item_id, price):
+                await run_blocking(self.share, item_id, price)
+        return self.result(item_id, price)
+
+    @staticmethod
+    async def run_in_executor(func, *args):
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    def stats(self):
+        """Returns the counters of the local cache, the items found missing, the shared cache server and the
+        prices loaded from the stock service.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        return dict(self.local.stats(), **counters, shared=self.shared is not None)
+
+
+price_cache = PriceCache()
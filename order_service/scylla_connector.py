@@ -0,0 +1,440 @@
+import uuid
+
+from cassandra.concurrent import execute_concurrent
+from cassandra.query import BatchStatement, BatchType
+
+from common.ids import to_uuid
+from common.scylla import create_tables, ensure_tables, get_session
+from order_service.connector import expand_item_counts
+from order_service.scylla_order_item import ScyllaOrderItem
+from order_service.scylla_order import ScyllaOrder
+from order_service.scylla_order_document import ScyllaOrderDocument
+from order_service.scylla_orders_by_user import ScyllaOrdersByUser
+
+
+# Attempts of a conditional item update on Scylla before giving up on a heavily contended order.
+MAX_ITEM_UPDATE_ATTEMPTS = 10
+# Orders deleted in parallel on Scylla when all orders of a user are deleted.
+DELETE_CONCURRENCY = 50
+
+
+class ScyllaConnector:
+    SERVICE = 'order'
+    TABLES = [ScyllaOrderItem, ScyllaOrder, ScyllaOrdersByUser]
+
+    def __init__(self, nodes):
+        """Establishes a connection to the ScyllaDB database and checks that the tables in TABLES match their
+        models, creating or updating them unless SCHEMA_AUTO_MIGRATE is "false".
+        """
+        self.session = get_session(nodes)
+        ensure_tables(self.session, self.SERVICE, self.TABLES)
+
+        self.insert_order = self.session.prepare(
+            "INSERT INTO wdm.scylla_order (order_id, user_id, paid) VALUES (?, ?, false)")
+        self.delete_order_partition = self.session.prepare("DELETE FROM wdm.scylla_order WHERE order_id = ?")
+        self.delete_items_partition = self.session.prepare("DELETE FROM wdm.scylla_order_item WHERE order_id = ?")
+        self.insert_user_order = self.session.prepare(
+            "INSERT INTO wdm.orders_by_user (user_id, order_id) VALUES (?, ?)")
+        self.delete_user_order = self.session.prepare(
+            "DELETE FROM wdm.orders_by_user WHERE user_id = ? AND order_id = ?")
+        self.select_user_orders = self.session.prepare(
+            "SELECT order_id FROM wdm.orders_by_user WHERE user_id = ?")
+        self.delete_user_orders = self.session.prepare("DELETE FROM wdm.orders_by_user WHERE user_id = ?")
+
+        self.select_order = self.session.prepare(
+            "SELECT order_id, user_id, paid FROM wdm.scylla_order WHERE order_id = ?")
+        self.select_items = self.session.prepare(
+            "SELECT item_id, item_num, price FROM wdm.scylla_order_item WHERE order_id = ?")
+        self.select_item = self.session.prepare(
+            "SELECT item_num, price FROM wdm.scylla_order_item WHERE order_id = ? AND item_id = ?")
+        self.select_order.is_idempotent = True
+        self.select_items.is_idempotent = True
+        self.update_order_paid = self.session.prepare(
+            "UPDATE wdm.scylla_order SET paid = true WHERE order_id = ? AND user_id = ?")
+        self.insert_items_paid = self.session.prepare(
+            "INSERT INTO wdm.scylla_order_item (order_id, paid) VALUES (?, ?)")
+        self.update_items_paid = self.session.prepare(
+            "UPDATE wdm.scylla_order_item SET paid = true WHERE order_id = ? IF paid = false")
+        self.insert_item = self.session.prepare(
+            "UPDATE wdm.scylla_order_item SET price = ?, item_num = 1 WHERE order_id = ? AND item_id = ? "
+            "IF paid = false AND item_num = null")
+        self.update_item_num = self.session.prepare(
+            "UPDATE wdm.scylla_order_item SET item_num = ? WHERE order_id = ? AND item_id = ? "
+            "IF paid = false AND item_num = ?")
+        self.delete_item = self.session.prepare(
+            "DELETE FROM wdm.scylla_order_item WHERE order_id = ? AND item_id = ? IF paid = false AND item_num = ?")
+
+    @classmethod
+    def init_schema(cls, nodes):
+        """Creates the "wdm" keyspace and creates or updates the tables in TABLES.
+
+        :return: a description of the changes
+        """
+        changed = create_tables(get_session(nodes), cls.SERVICE, cls.TABLES)
+        return "created or updated the Scylla tables" if changed else "the Scylla tables are up to date"
+
+    def create_order(self, user_id):
+        """creates an order for the given user, and returns an order_id
+
+        :param user_id: the user id
+        :return: the id of the order
+        """
+        order_id = uuid.uuid4()
+        user_id = to_uuid(user_id, 'User')
+        batch = BatchStatement()
+        batch.add(self.insert_order, (order_id, user_id))
+        batch.add(self.insert_items_paid, (order_id, False))
+        batch.add(self.insert_user_order, (user_id, order_id))
+        self.session.execute(batch)
+        return order_id
+
+    def delete_order(self, order_id):
+        """
+         deletes an order by ID
+        :param order_id: id of order to be deleted
+        """
+        order = self.get_order(order_id)
+        batch = BatchStatement()
+        for statement, parameters in self.order_deletes(order.order_id):
+            batch.add(statement, parameters)
+        batch.add(self.delete_user_order, (order.user_id, order.order_id))
+        self.session.execute(batch)
+
+    def order_deletes(self, order_id):
+        """Returns the statements that delete an order and its items.
+
+        :param order_id: the id of the order
+        :return: list of (statement, parameters) pairs, all on partitions keyed by order_id
+        """
+        return [(self.delete_order_partition, (order_id,)), (self.delete_items_partition, (order_id,))]
+
+    def delete_orders_for_user(self, user_id):
+        """Deletes all orders of a user and their items. Every order is deleted by an unlogged batch on its own
+        partitions, and the batches run concurrently.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the format of the user_id is invalid
+        :return: the number of deleted orders
+        """
+        user_id = to_uuid(user_id, 'User')
+        batches = []
+        for row in self.session.execute(self.select_user_orders, (user_id,)):
+            batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+            for statement, parameters in self.order_deletes(row.order_id):
+                batch.add(statement, parameters)
+            batches.append((batch, None))
+        execute_concurrent(self.session, batches, concurrency=DELETE_CONCURRENCY, raise_on_first_error=True)
+        self.session.execute(self.delete_user_orders, (user_id,))
+        return len(batches)
+
+    def get_order(self, order_id):
+        """Retrieves the order from the database by its id.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
+        :return: the order row with order_id, user_id and paid
+        """
+        order = self.session.execute(self.select_order, (to_uuid(order_id, 'Order'),)).one()
+        if order is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return order
+
+    @staticmethod
+    def conflicting_item_num(order_id, result):
+        """Returns the amount a conditional item write that was not applied conflicted with. The writes are
+        conditioned on the static paid column of the items, which create_order sets to false and set_paid to true,
+        so an order that is paid or does not exist refuses them without being read first.
+
+        :param order_id: the id of the order
+        :param result: the result of the write
+        :raises ValueError: if the order does not exist or is already paid
+        :return: the amount of the item in the order, or None if the order does not contain it
+        """
+        conflict = result.one()
+        if conflict.paid is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        if conflict.paid:
+            raise ValueError('Order already completed')
+        return conflict.item_num
+
+    def add_item(self, order_id, item_id, item_price):
+        """Adds a given item in the order given with a conditional write, retried with the amount the
+        write conflicted with.
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :param item_price: the price of the item, only used when the item is not in the order yet
+        :raises ValueError: if the order does not exist or is already paid
+        :return: the number of the item in the order
+        """
+        if item_price < 0:
+            raise ValueError(f"Item price {item_price} is not valid")
+        order_id = to_uuid(order_id, 'Order')
+        item_id = to_uuid(item_id, 'Item')
+        item_num = None
+        for _ in range(MAX_ITEM_UPDATE_ATTEMPTS):
+            if item_num is None:
+                result = self.session.execute(self.insert_item, (item_price, order_id, item_id))
+            else:
+                result = self.session.execute(self.update_item_num, (item_num + 1, order_id, item_id, item_num))
+            if result.was_applied:
+                return (item_num or 0) + 1
+            item_num = self.conflicting_item_num(order_id, result)
+        raise ValueError(f"Order {order_id} is being modified concurrently")
+
+    def remove_item(self, order_id, item_id):
+        """Removes the given item from the given order with a conditional write, retried with the amount the
+        write conflicted with.
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist, is already paid or does not contain the item
+        :return: the number of the item left in the order
+        """
+        order_id = to_uuid(order_id, 'Order')
+        item_id = to_uuid(item_id, 'Item')
+        item_num = 1
+        for _ in range(MAX_ITEM_UPDATE_ATTEMPTS):
+            if item_num is None:
+                raise ValueError(f"Order {order_id} does not contain item {item_id}")
+            if item_num == 1:
+                result = self.session.execute(self.delete_item, (order_id, item_id, item_num))
+            else:
+                result = self.session.execute(self.update_item_num, (item_num - 1, order_id, item_id, item_num))
+            if result.was_applied:
+                return item_num - 1
+            item_num = self.conflicting_item_num(order_id, result)
+        raise ValueError(f"Order {order_id} is being modified concurrently")
+
+    def get_order_summary(self, order_id):
+        """Get the order header and its aggregated items. The order and its items are read concurrently.
+
+        :param order_id: id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: order summary (paid, user_id, total_cost, item_counts) where item_counts maps item ids to amounts
+        """
+        order_id = to_uuid(order_id, 'Order')
+        items_future = self.session.execute_async(self.select_items, (order_id,))
+        order = self.session.execute(self.select_order, (order_id,)).one()
+        items = items_future.result()
+        if order is None:
+            raise ValueError("Order with id not found")
+
+        total_cost = 0
+        item_counts = {}
+        for item in items:
+            if item.item_id is None:
+                # The static paid column of an order without items.
+                continue
+            total_cost += item.item_num * item.price
+            item_counts[str(item.item_id)] = item.item_num
+        return order.paid, order.user_id, total_cost, item_counts
+
+    def get_order_info(self, order_id):
+        paid, user_id, total_cost, item_counts = self.get_order_summary(order_id)
+        return paid, expand_item_counts(item_counts), user_id, total_cost
+
+    def get_order_ids_by_user(self, user_id):
+        """Retrieves the ids of the orders of a user with a single partition read of orders_by_user.
+
+        :param user_id: the id of the user
+        :return: the list of order ids
+        """
+        return [row.order_id for row in self.session.execute(self.select_user_orders, (to_uuid(user_id, 'User'),))]
+
+    def get_item(self, order_id, item_id):
+        """Reads an item of an order.
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :raises ValueError: if the format of either id is invalid
+        :return: the item row with item_num and price, or None if the order does not contain the item
+        """
+        return self.session.execute(
+            self.select_item, (to_uuid(order_id, 'Order'), to_uuid(item_id, 'Item'))).one()
+
+    def find_item(self, order_id, item_id):
+        item = self.get_item(order_id, item_id)
+        if item is None:
+            return False, None
+        return True, item.price
+
+    def get_item_num(self, order_id, item_id):
+        item = self.get_item(order_id, item_id)
+        if item is None:
+            raise ValueError(f"Order {order_id} does not contain item {item_id}")
+        return item.item_num
+
+    def set_paid(self, order_id):
+        """Marks the order as paid, first in the static paid column of its items, so no item of the order changes
+        after it was paid, and then in the order itself.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: True
+        """
+        order = self.get_order(order_id)
+        self.session.execute(self.update_items_paid, (order.order_id,))
+        self.session.execute(self.update_order_paid, (order.order_id, order.user_id))
+        return True
+
+
+class ScyllaDocumentConnector(ScyllaConnector):
+    """Stores every order as a single order_document row that carries the item amounts and prices as maps,
+    so a single partition read answers order lookups. The total cost is computed from the maps when the order is
+    read.
+    """
+    TABLES = ScyllaConnector.TABLES + [ScyllaOrderDocument]
+
+    def __init__(self, nodes):
+        """Establishes a connection to the ScyllaDB database and checks the order_document table as well as
+        the order and order_item tables, which are kept for migrating existing orders.
+        """
+        super().__init__(nodes)
+        self.insert_document = self.session.prepare(
+            "INSERT INTO wdm.order_document (order_id, user_id, paid) VALUES (?, ?, false)")
+        self.select_document = self.session.prepare(
+            "SELECT order_id, user_id, paid, items, prices FROM wdm.order_document WHERE order_id = ?")
+        self.select_document.is_idempotent = True
+        self.delete_document = self.session.prepare(
+            "DELETE FROM wdm.order_document WHERE order_id = ?")
+        self.update_paid = self.session.prepare(
+            "UPDATE wdm.order_document SET paid = true WHERE order_id = ? IF EXISTS")
+        self.set_item = self.session.prepare(
+            "UPDATE wdm.order_document SET items[?] = ?, prices[?] = ? WHERE order_id = ? "
+            "IF paid = false AND items[?] = ?")
+        self.drop_item = self.session.prepare(
+            "UPDATE wdm.order_document SET items = items - ?, prices = prices - ? WHERE order_id = ? "
+            "IF paid = false AND items[?] = ?")
+
+    @staticmethod
+    def total_cost(document):
+        """Computes the total cost of an order document from its item amounts and prices."""
+        prices = document.prices or {}
+        return sum(item_num * prices[item_id] for item_id, item_num in (document.items or {}).items())
+
+    def get_document(self, order_id):
+        """Retrieves the order document with a single partition read.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: the order document row
+        """
+        document = self.session.execute(self.select_document, (to_uuid(order_id, 'Order'),)).one()
+        if document is None:
+            raise ValueError(f"Order with id {order_id} not found")
+        return document
+
+    def create_order(self, user_id):
+        """creates an order for the given user, and returns an order_id
+
+        :param user_id: the user id
+        :return: the id of the order
+        """
+        order_id = uuid.uuid4()
+        user_id = to_uuid(user_id, 'User')
+        batch = BatchStatement()
+        batch.add(self.insert_document, (order_id, user_id))
+        batch.add(self.insert_user_order, (user_id, order_id))
+        self.session.execute(batch)
+        return order_id
+
+    def order_deletes(self, order_id):
+        """Returns the statement that deletes an order document, which includes its items.
+
+        :param order_id: the id of the order
+        :return: list of (statement, parameters) pairs
+        """
+        return [(self.delete_document, (order_id,))]
+
+    def get_order(self, order_id):
+        """Retrieves the order from the database by its id.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
+        :return: the order with id order_id
+        """
+        return self.get_document(order_id)
+
+    def add_item(self, order_id, item_id, item_price):
+        """Adds a given item in the order given
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :param item_price: the price of the item, only used when the item is not in the order yet
+        :return: the number of the item in the order
+        """
+        if item_price < 0:
+            raise ValueError(f"Item price {item_price} is not valid")
+        return self.update_item(order_id, item_id, 1, item_price)
+
+    def remove_item(self, order_id, item_id):
+        """Removes the given item from the given order
+
+        :param item_id: the id of the item
+        :param order_id: the id of the order
+        :raises ValueError: if the item is not in the order
+        :return: the number of the item left in the order
+        """
+        return self.update_item(order_id, item_id, -1)
+
+    def update_item(self, order_id, item_id, delta, item_price=None):
+        """Changes the amount of an item in the order with one conditional update.
+
+        The update only applies if the order is unpaid and the amount of this item did not change since the
+        document was read, otherwise the document is read again and the update retried. Changes of different
+        items do not conflict, as the total cost is not stored but computed on read.
+
+        :param order_id: the id of the order
+        :param item_id: the id of the item
+        :param delta: the change of the item amount
+        :param item_price: the price of the item, only used when the item is not in the order yet
+        :raises ValueError: if the order is paid, does not contain the item or keeps changing concurrently
+        :return: the number of the item in the order
+        """
+        order_id = to_uuid(order_id, 'Order')
+        item_id = to_uuid(item_id, 'Item')
+        for _ in range(MAX_ITEM_UPDATE_ATTEMPTS):
+            document = self.get_document(order_id)
+            if document.paid:
+                raise ValueError('Order already completed')
+            item_num = (document.items or {}).get(item_id)
+            if item_num is None and delta < 0:
+                raise ValueError(f"Order {order_id} does not contain item {item_id}")
+            price = item_price if item_num is None else document.prices[item_id]
+            new_item_num = (item_num or 0) + delta
+            if new_item_num > 0:
+                result = self.session.execute(self.set_item, (item_id, new_item_num, item_id, price,
+                                                              order_id, item_id, item_num))
+            else:
+                result = self.session.execute(self.drop_item, ({item_id}, {item_id}, order_id, item_id, item_num))
+            if result.was_applied:
+                return new_item_num
+        raise ValueError(f"Order {order_id} is being modified concurrently")
+
+    def get_order_summary(self, order_id):
+        """Get the order header and its aggregated items with a single partition read.
+
+        :param order_id: id of the order
+        :raises ValueError: if the order does not exist or if the format of the order_id is invalid
+        :return: order summary (paid, user_id, total_cost, item_counts) where item_counts maps item ids to amounts
+        """
+        document = self.get_document(order_id)
+        item_counts = {str(item_id): item_num for item_id, item_num in (document.items or {}).items()}
+        return document.paid, document.user_id, self.total_cost(document), item_counts
+
+    def find_item(self, order_id, item_id):
+        document = self.get_document(order_id)
+        price = (document.prices or {}).get(to_uuid(item_id, 'Item'))
+        return price is not None, price
+
+    def get_item_num(self, order_id, item_id):
+        item_num = (self.get_document(order_id).items or {}).get(to_uuid(item_id, 'Item'))
+        if item_num is None:
+            raise ValueError(f"Order {order_id} does not contain item {item_id}")
+        return item_num
+
+    def set_paid(self, order_id):
+        if not self.session.execute(self.update_paid, (to_uuid(order_id, 'Order'),)).was_applied:
+            raise ValueError(f"Order with id {order_id} not found")
+        return True
@@ -0,0 +1,14 @@
+import uuid
+
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+
+
+class ScyllaOrderDocument(Model):
+    __table_name__ = 'order_document'
+
+    order_id = columns.UUID(primary_key=True, default=uuid.uuid4)
+    user_id = columns.UUID()
+    paid = columns.Boolean()
+    items = columns.Map(columns.UUID, columns.BigInt)
+    prices = columns.Map(columns.UUID, columns.Decimal)
@@ -9,3 +9,6 @@ class ScyllaOrderItem(Model):
     item_id = columns.UUID(primary_key=True, default=uuid.uuid4)
     price = columns.Decimal()
     item_num = columns.BigInt()
+    # Copy of the paid column of the order, shared by all items of the order, so the conditional item writes
+    # are refused once the order is paid.
+    paid = columns.Boolean(static=True)
@@ -0,0 +1,9 @@
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+
+
+class ScyllaOrdersByUser(Model):
+    __table_name__ = 'orders_by_user'
+
+    user_id = columns.UUID(partition_key=True)
+    order_id = columns.UUID(primary_key=True)
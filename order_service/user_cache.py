@@ -0,0 +1,65 @@
+import os
+
+from common.cache import MISSING, LRUCache
+from common.ids import to_uuid
+
+MODES = ['strict', 'cached']
+
+
+class UserCache:
+    def __init__(self):
+        """Cache of the ids of users known to exist, so that creating an order does not have to ask the users
+        service every time. Configured by the environment variables:
+
+            USER_CHECK_MODE     "strict" (the default) asks the users service before every order is created,
+                                "cached" remembers the users found
+            USER_CACHE_SIZE     the number of user ids kept per worker
+            USER_CACHE_TTL_S    seconds after which a user is checked again, 5 by default
+
+        A user is forgotten when its orders are deleted by /orders/deleteByUser, which the users service calls
+        when it removes the user. That call reaches a single worker, so other workers may accept orders of the
+        removed user until the entry expires; this is why caching is opt-in and entries expire quickly.
+        """
+        self.mode = os.getenv('USER_CHECK_MODE', 'strict')
+        if self.mode not in MODES:
+            raise ValueError(f"Invalid USER_CHECK_MODE {self.mode}")
+        self.ttl = float(os.getenv('USER_CACHE_TTL_S', '5'))
+        self.users = LRUCache(int(os.getenv('USER_CACHE_SIZE', '100000')) if self.mode == 'cached' else 0)
+
+    def is_known(self, user_id):
+        return self.mode == 'cached' and self.users.get(user_id) is not MISSING
+
+    def remember(self, user_id, exists):
+        if exists:
+            self.users.set(user_id, True, ttl=self.ttl)
+        return exists
+
+    def exists(self, user_id, load):
+        """Checks that a user exists, asking load on a miss.
+
+        :param user_id: the id of the user
+        :param load: function that returns whether the user exists
+        :raises ValueError: if the format of the user_id is invalid
+        :return: whether the user exists
+        """
+        user_id = str(to_uuid(user_id, 'User'))
+        return self.is_known(user_id) or self.remember(user_id, load(user_id))
+
+    async def exists_async(self, user_id, load):
+        """Checks that a user exists like exists, for the ASGI application. load is a coroutine function."""
+        user_id = str(to_uuid(user_id, 'User'))
+        return self.is_known(user_id) or self.remember(user_id, await load(user_id))
+
+    def forget(self, user_id):
+        """Removes a user from the cache, if the format of its id is valid."""
+        try:
+            self.users.pop(str(to_uuid(user_id, 'User')))
+        except ValueError:
+            pass
+
+    def stats(self):
+        """Returns the check mode and the counters of the cache."""
+        return dict(self.users.stats(), mode=self.mode, ttl_s=self.ttl)
+
+
+user_cache = UserCache()
@@ -0,0 +1,49 @@
+import os
+import sys
+from quart import jsonify
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from common.asgi import create_app, handler
+from common.async_http_client import http_client
+from payment_service import handlers
+from payment_service.connector import ConnectorFactory
+
+
+app = create_app(__name__)
+connector = None
+
+
+@app.before_serving
+async def start():
+    global connector
+    connector = await ConnectorFactory().get_async_connector()
+    await http_client.start()
+
+
+@app.after_serving
+async def stop():
+    await http_client.close()
+
+
+@app.route('/payment/metrics', methods=['GET'])
+async def metrics():
+    return jsonify({"http_client": http_client.stats(), "db_pool": connector.pool_stats()})
+
+
+@app.route('/payment/pay/<user_id>/<order_id>/<amount>', methods=['POST'])
+@handler
+async def pay(user_id, order_id, amount):
+    return await handlers.pay(connector, user_id, order_id, amount)
+
+
+@app.route('/payment/cancel/<user_id>/<order_id>', methods=['POST'])
+@handler
+async def cancel_pay(user_id, order_id):
+    return await handlers.cancel_pay(connector, user_id, order_id)
+
+
+@app.route('/payment/status/<order_id>', methods=['GET'])
+@handler
+async def status(order_id):
+    return await handlers.status(connector, order_id)
@@ -0,0 +1,185 @@
+import asyncio
+import os
+import uuid
+from decimal import Decimal, InvalidOperation
+
+import aiohttp
+import asyncpg
+from quart import abort
+
+from common.async_http_client import http_client
+from common.async_postgres import Query
+from common.ids import to_uuid
+from payment_service import postgres_connector
+from payment_service.postgres_connector import CANCELLED, PAID, PENDING_CANCEL, PENDING_PAYMENT, PENDING_TIMEOUT_S, \
+    REFUSED, UNKNOWN, credit_change_outcome, settled_state
+
+# The statements of the synchronous connector.
+LOCK_ORDER_QUERY = Query(postgres_connector.LOCK_ORDER_QUERY)
+SELECT_PAYMENT_QUERY = Query(postgres_connector.SELECT_PAYMENT_QUERY)
+SELECT_STATUS_QUERY = Query(postgres_connector.SELECT_STATUS_QUERY)
+INSERT_PENDING_PAYMENT_QUERY = Query(postgres_connector.INSERT_PENDING_PAYMENT_QUERY)
+START_PAYMENT_QUERY = Query(postgres_connector.START_PAYMENT_QUERY)
+START_CANCEL_QUERY = Query(postgres_connector.START_CANCEL_QUERY)
+FINISH_TRANSITION_QUERY = Query(postgres_connector.FINISH_TRANSITION_QUERY)
+DELETE_PENDING_PAYMENT_QUERY = Query(postgres_connector.DELETE_PENDING_PAYMENT_QUERY)
+
+
+class AsyncPostgresConnector:
+    def __init__(self, pool):
+        """Runs the payment transitions of PostgresConnector with asyncpg, for the ASGI application.
+
+        :param pool: the asyncpg pool returned by common.async_postgres.create_pool
+        """
+        self.pool = pool
+
+    def pool_stats(self):
+        return {'size': self.pool.get_size(), 'checked_out': self.pool.get_size() - self.pool.get_idle_size(),
+                'max_size': self.pool.get_max_size()}
+
+    @staticmethod
+    def parse_ids(user_id, order_id):
+        try:
+            return to_uuid(user_id, 'User'), to_uuid(order_id, 'Order')
+        except ValueError as error:
+            abort(400, str(error))
+
+    async def start_transition(self, user_id, order_id, start):
+        """Moves the payment of an order into a pending state in a short transaction that holds an advisory
+        lock on the order, like PostgresConnector.start_transition.
+
+        :param user_id: the id of the user
+        :param order_id: the id of the order
+        :param start: coroutine function called with the connection and the payment row, or None if there is
+        none; moves the payment into a pending state and returns (payment_id, previous state)
+        :return: what start returned
+        """
+        user_id, order_id = self.parse_ids(user_id, order_id)
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(*LOCK_ORDER_QUERY.args(order_id=str(order_id)))
+                    payment = await conn.fetchrow(*SELECT_PAYMENT_QUERY.args(
+                        order_id=order_id, user_id=user_id, pending_timeout=PENDING_TIMEOUT_S))
+                    return await start(conn, user_id, order_id, payment)
+        except asyncpg.PostgresError:
+            abort(400, 'Error in the database')
+
+    async def finish_transition(self, query, **params):
+        """Commits or reverts a pending payment."""
+        try:
+            await self.pool.execute(*query.args(**params))
+        except asyncpg.PostgresError:
+            abort(400, 'Error in the database')
+
+    @staticmethod
+    async def call_users_service(path):
+        """Changes the credit of a user in the users service.
+
+        :param path: the path of the credit change
+        :return: APPLIED, REFUSED if the users service refused or could not be connected to, or UNKNOWN if the
+        request failed after it may have been sent, for example by a read timeout, or got a server error
+        """
+        try:
+            response = await http_client.post(f"http://{os.environ['USER_SERVICE_URL']}{path}")
+            return credit_change_outcome(response.status)
+        except aiohttp.ClientConnectorError:
+            return REFUSED
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return UNKNOWN
+
+    async def pay(self, user_id, order_id, amount):
+        """Pays the order like PostgresConnector.pay, without holding a database connection while the users
+        service is called.
+
+        :param user_id the id of the user
+        :param order_id the id of the order
+        :param the amount of the transaction
+        :return creates the payment for the parameters used
+        """
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            abort(400, f"Payment amount {amount} is not valid")
+
+        async def start(conn, user_uuid, order_uuid, payment):
+            if payment is None:
+                payment_id = uuid.uuid4()
+                await conn.execute(*INSERT_PENDING_PAYMENT_QUERY.args(id=payment_id, user_id=user_uuid,
+                                                                      order_id=order_uuid, amount=amount))
+                return payment_id, None
+            state = settled_state(payment)
+            if state == PAID:
+                abort(400, "the payment is already made")
+            if state != CANCELLED:
+                abort(409, "the payment is being changed")
+            await conn.execute(*START_PAYMENT_QUERY.args(id=payment['id'], amount=amount))
+            return payment['id'], state
+
+        payment_id, previous = await self.start_transition(user_id, order_id, start)
+
+        outcome = await self.call_users_service(f"/users/credit/subtract/{user_id}/{amount}")
+        if outcome == UNKNOWN:
+            abort(503, "the outcome of the payment is unknown")
+        if outcome == REFUSED:
+            if previous is None:
+                await self.finish_transition(DELETE_PENDING_PAYMENT_QUERY, id=payment_id)
+            else:
+                await self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_PAYMENT,
+                                             state=previous, status=False)
+            abort(400, "User service failure")
+
+        await self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_PAYMENT, state=PAID,
+                                     status=True)
+        return True
+
+    async def cancel_pay(self, user_id, order_id):
+        """Cancels the payment like PostgresConnector.cancel_pay, without holding a database connection while
+        the users service is called.
+
+        :param user_id: the id of the user
+        :param order_id: the id of the order
+        :return: sets the payment status as false (cancel)
+        """
+        async def start(conn, user_uuid, order_uuid, payment):
+            if payment is None:
+                abort(400, 'payment does not exist')
+            state = settled_state(payment)
+            if state == CANCELLED:
+                abort(400, "the payment is not made")
+            if state != PAID:
+                abort(409, "the payment is being changed")
+            await conn.execute(*START_CANCEL_QUERY.args(id=payment['id']))
+            return payment['id'], payment['amount']
+
+        payment_id, amount = await self.start_transition(user_id, order_id, start)
+
+        outcome = await self.call_users_service(f"/users/credit/add/{user_id}/{amount}")
+        if outcome == UNKNOWN:
+            abort(503, "the outcome of the cancellation is unknown")
+        if outcome == REFUSED:
+            await self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_CANCEL, state=PAID,
+                                         status=True)
+            abort(400, "User service failure")
+
+        await self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_CANCEL,
+                                     state=CANCELLED, status=False)
+        return True
+
+    async def status(self, order_id):
+        """Retrieves the payment status of an order.
+
+        :param order_id: the id of the order
+        :return: whether the order is paid
+        """
+        try:
+            order_id = to_uuid(order_id, 'Order')
+        except ValueError as error:
+            abort(400, str(error))
+        try:
+            payment = await self.pool.fetchrow(*SELECT_STATUS_QUERY.args(order_id=order_id))
+        except asyncpg.PostgresError:
+            abort(400, 'Error in the database')
+        if payment is None:
+            abort(400, 'payment does not exist')
+        return payment['status']
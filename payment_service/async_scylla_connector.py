@@ -0,0 +1,98 @@
+import os
+from decimal import Decimal, InvalidOperation
+
+from quart import abort
+
+from common.aio import wrap_future
+from common.async_http_client import http_client
+from common.ids import to_uuid
+from payment_service.scylla_connector import ScyllaConnector
+
+
+class AsyncScyllaConnector:
+    def __init__(self, nodes):
+        """Runs the statements of ScyllaConnector with execute_async, for the ASGI application. Connecting and
+        preparing the statements is done by a ScyllaConnector.
+        """
+        self.sync = ScyllaConnector(nodes)
+        self.session = self.sync.session
+
+    async def execute(self, statement, parameters):
+        return await wrap_future(self.session.execute_async(statement, parameters))
+
+    def pool_stats(self):
+        return None
+
+    async def get_payment(self, order_id):
+        """Retrieves the payment of an order with a single partition read.
+
+        :param order_id: the id of the order
+        :return: the payment row, or None if the order has no payment
+        """
+        try:
+            order_id = to_uuid(order_id, 'Order')
+        except ValueError:
+            abort(400, f"Payment order_id {order_id} is not a valid id")
+        return (await self.execute(self.sync.select_payment, (order_id,))).one()
+
+    async def pay(self, user_id, order_id, amount):
+        """Pays the order like ScyllaConnector.pay.
+
+        :param user_id the id of the user
+        :param order_id the id of the order
+        :param the amount of the transaction
+        :return creates the payment for the parameters used
+        """
+        payment = await self.get_payment(order_id)
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            abort(400, f"Payment amount {amount} is not valid")
+        if payment is not None:
+            if payment.status:
+                abort(400, "the payment is already made")
+            await self.request_user_to_pay(user_id, amount)
+            await self.execute(self.sync.update_payment, (True, amount, payment.order_id))
+        else:
+            try:
+                user_id = to_uuid(user_id, 'User')
+            except ValueError:
+                abort(400, f"Payment user_id {user_id} is not a valid id")
+            await self.request_user_to_pay(user_id, amount)
+            await self.execute(self.sync.insert_payment, (to_uuid(order_id, 'Order'), user_id, amount))
+
+    @staticmethod
+    async def request_user_to_pay(user_id, amount):
+        users_response = await http_client \
+            .post(f"http://{os.environ['USER_SERVICE_URL']}/users/credit/subtract/{user_id}/{amount}")
+        if users_response.status == 400 or users_response.status == 404:
+            abort(400, "User service failure")
+
+    async def cancel_pay(self, user_id, order_id):
+        """Cancels the payment like ScyllaConnector.cancel_pay.
+
+        :param user_id: the id of the user
+        :param order_id: the id of the order
+        :return Payment status is False (cancel)
+        """
+        payment = await self.get_payment(order_id)
+        if payment is None:
+            abort(400, 'payment does not exist')
+        if not payment.status:
+            abort(400, "the payment is already canceled")
+        users_response = await http_client \
+            .post(f"http://{os.environ['USER_SERVICE_URL']}/users/credit/add/{user_id}/{payment.amount}")
+        if users_response.status == 400 or users_response.status == 404:
+            abort(400, "User service failure")
+        await self.execute(self.sync.update_payment, (False, payment.amount, payment.order_id))
+
+    async def status(self, order_id):
+        """Retrieves the payment status of an order.
+
+        :param order_id: the id of the order
+        :return: whether the order is paid
+        """
+        payment = await self.get_payment(order_id)
+        if payment is None:
+            abort(400, 'payment does not exist')
+        return payment.status
@@ -0,0 +1,12 @@
+async def pay(connector, user_id, order_id, amount):
+    await connector.pay(user_id, order_id, amount)
+    return 'success'
+
+
+async def cancel_pay(connector, user_id, order_id):
+    await connector.cancel_pay(user_id, order_id)
+    return 'success'
+
+
+async def status(connector, order_id):
+    return {"paid": await connector.status(order_id)}
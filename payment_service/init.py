@@ -0,0 +1,15 @@
+"""Creates or migrates the database schema of the payment service. Run it once per deployment before the workers
+start, which then only check the schema version. Inside the payment service image, with the environment of the
+service:
+
+    python init.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from payment_service.connector import ConnectorFactory
+
+if __name__ == '__main__':
+    print(f"payment service: {ConnectorFactory().init_schema()}")
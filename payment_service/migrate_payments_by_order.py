@@ -0,0 +1,62 @@
+"""Copies the payments from the payments table, keyed by a random id, into the payments_by_order table.
+
+The token ring is split into ranges that are scanned in parallel, and the rows of every range are written with
+concurrent inserts. Drain the payment service (scale it to zero replicas) before running this, so no payment
+changes while it is copied, then redeploy it. Rerunning it is harmless. Inside the payment service image:
+
+    DATABASE_TYPE=scylla SCYLLA_NODES="..." python migrate_payments_by_order.py
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from payment_service.scylla_connector import ScyllaConnector
+
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+
+def token_ranges(splits):
+    """Splits the Murmur3 token ring into ranges (start, end] of about equal size."""
+    step = (MAX_TOKEN - MIN_TOKEN) // splits
+    bounds = [MIN_TOKEN + i * step for i in range(splits)] + [MAX_TOKEN]
+    return list(zip(bounds, bounds[1:]))
+
+
+def migrate(connector, splits=256, workers=16, concurrency=50):
+    """Writes a payments_by_order row for every row of the payments table.
+
+    :param connector: a payment ScyllaConnector
+    :param splits: the number of token ranges
+    :param workers: the number of token ranges scanned at the same time
+    :param concurrency: the number of inserts in flight per token range
+    :return: the number of migrated payments
+    """
+    select = connector.session.prepare(
+        "SELECT order_id, user_id, status, amount FROM wdm.payments WHERE token(id) > ? AND token(id) <= ?")
+    insert = connector.session.prepare(
+        "INSERT INTO wdm.payments_by_order (order_id, user_id, status, amount) VALUES (?, ?, ?, ?)")
+
+    def migrate_range(token_range):
+        rows = connector.session.execute(select, token_range)
+        results = execute_concurrent_with_args(
+            connector.session, insert, ((row.order_id, row.user_id, row.status, row.amount) for row in rows),
+            concurrency=concurrency, raise_on_first_error=True)
+        return len(results)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(migrate_range, token_ranges(splits)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--splits', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=16)
+    args = parser.parse_args()
+    connector = ScyllaConnector(os.getenv('SCYLLA_NODES').split(' '))
+    print(f"Migrated {migrate(connector, args.splits, args.workers)} payments")
@@ -0,0 +1,242 @@
+import os
+import uuid
+
+import requests
+from flask import abort
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import scoped_session, sessionmaker
+from urllib3.exceptions import NewConnectionError
+
+from common.http_client import http_client
+from common.migrations import ensure_schema, init_postgres
+from common.pool_metrics import PoolMetrics
+from payment_service.postgres_payment_item import Base, Payment
+
+# Connections kept open per worker, and opened on top of those under load. The gunicorn configuration
+# sizes the concurrent requests per worker to match.
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+# Seconds after which a payment left pending by a transition that never finished, for example because its worker
+# died, is taken over by the next transition. Well above the read timeout of the users service calls, so a
+# transition that is still running is not taken over.
+PENDING_TIMEOUT_S = float(os.getenv('PAYMENT_PENDING_TIMEOUT_S', '60'))
+
+# Outcomes of a credit change in the users service. A change whose request may have reached the users service
+# without an answer is unknown, and so is one answered with a server error.
+APPLIED = 'applied'
+REFUSED = 'refused'
+UNKNOWN = 'unknown'
+
+PENDING_PAYMENT = 'pending_payment'
+PAID = 'paid'
+PENDING_CANCEL = 'pending_cancel'
+CANCELLED = 'cancelled'
+
+LOCK_ORDER_QUERY = text("SELECT pg_advisory_xact_lock(hashtext(:order_id))")
+SELECT_PAYMENT_QUERY = text("""
+    SELECT id, state, amount, pending_since < now() - make_interval(secs => :pending_timeout) AS stale
+    FROM payments WHERE order_id = :order_id AND user_id = :user_id
+""")
+SELECT_STATUS_QUERY = text("SELECT status FROM payments WHERE order_id = :order_id LIMIT 1")
+INSERT_PENDING_PAYMENT_QUERY = text("""
+    INSERT INTO payments (id, user_id, order_id, status, amount, state, pending_since)
+    VALUES (:id, :user_id, :order_id, false, :amount, 'pending_payment', now())
+""")
+START_PAYMENT_QUERY = text(
+    "UPDATE payments SET state = 'pending_payment', amount = :amount, pending_since = now() WHERE id = :id")
+START_CANCEL_QUERY = text("UPDATE payments SET state = 'pending_cancel', pending_since = now() WHERE id = :id")
+# Only moves a payment out of the pending state it was put in, so repeating a transition has no effect.
+FINISH_TRANSITION_QUERY = text(
+    "UPDATE payments SET state = :state, status = :status, pending_since = NULL WHERE id = :id AND state = :pending")
+DELETE_PENDING_PAYMENT_QUERY = text("DELETE FROM payments WHERE id = :id AND state = 'pending_payment'")
+
+
+def credit_change_outcome(status_code):
+    """Returns the outcome of a credit change answered with the given HTTP status."""
+    if 200 <= status_code < 300:
+        return APPLIED
+    if 400 <= status_code < 500:
+        return REFUSED
+    return UNKNOWN
+
+
+def settled_state(payment):
+    """Returns the state of a payment row, taking a transition that has been pending for longer than
+    PENDING_TIMEOUT_S as abandoned: such a payment is in the state the transition started from, not paid for a
+    pending payment and paid for a pending cancel. Whether the users service applied the credit change of the
+    abandoned transition is not known, so taking it over may repeat that change.
+    """
+    if payment['stale'] and payment['state'] == PENDING_PAYMENT:
+        return CANCELLED
+    if payment['stale'] and payment['state'] == PENDING_CANCEL:
+        return PAID
+    return payment['state']
+
+
+class PostgresConnector:
+    def __init__(self, db_user, db_password, db_host, db_port, db_name):
+        """Establishes a connection to the PostgreSQL database, and checks that it has the current schema.
+        """
+        self.engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}',
+                                    convert_unicode=True, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                    pool_timeout=3)
+        self.pool_metrics = PoolMetrics(self.engine)
+        self.db_session = scoped_session(sessionmaker(bind=self.engine))
+        Base.query = self.db_session.query_property()
+        Base.metadata.query = self.db_session.query_property()
+        Payment.metadata.query = self.db_session.query_property()
+        ensure_schema(self.engine)
+
+    @staticmethod
+    def init_schema(db_user, db_password, db_host, db_port, db_name):
+        """Applies the migrations the PostgreSQL database does not have yet.
+
+        :return: a description of the changes
+        """
+        applied = init_postgres(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
+        return f"applied Postgres migrations {applied}"
+
+    def pool_stats(self):
+        return self.pool_metrics.stats()
+
+    def start_transition(self, user_id, order_id, start):
+        """Moves the payment of an order into a pending state in a short transaction, which holds an advisory
+        lock on the order so concurrent transitions of the same payment are serialized.
+
+        :param user_id: the id of the user
+        :param order_id: the id of the order
+        :param start: called with the connection and the payment row, or None if there is none; moves the
+        payment into a pending state and returns (payment_id, previous state)
+        :return: what start returned
+        """
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(LOCK_ORDER_QUERY, order_id=order_id)
+                payment = conn.execute(SELECT_PAYMENT_QUERY, order_id=order_id, user_id=user_id,
+                                       pending_timeout=PENDING_TIMEOUT_S).first()
+                return start(conn, payment)
+        except SQLAlchemyError:
+            abort(400, 'Error in the database')
+
+    def finish_transition(self, query, **params):
+        """Commits or reverts a pending payment in a short transaction."""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(query, **params)
+        except SQLAlchemyError:
+            abort(400, 'Error in the database')
+
+    @staticmethod
+    def call_users_service(path):
+        """Changes the credit of a user in the users service.
+
+        :param path: the path of the credit change
+        :return: APPLIED, REFUSED if the users service refused or could not be connected to, or UNKNOWN if the
+        request failed after it may have been sent, for example by a read timeout, or got a server error
+        """
+        try:
+            return credit_change_outcome(http_client.post(f"http://{os.environ['USER_SERVICE_URL']}{path}").status_code)
+        except requests.ConnectTimeout:
+            return REFUSED
+        except requests.ConnectionError as error:
+            reason = getattr(error.args[0], 'reason', None) if error.args else None
+            return REFUSED if isinstance(reason, NewConnectionError) else UNKNOWN
+        except requests.RequestException:
+            return UNKNOWN
+
+    def pay(self, user_id, order_id, amount):
+        """Pays the order. The payment is marked as pending before the credit of the user is subtracted, and
+        marked as paid afterwards, so no database connection is held while the users service is called. If the
+        users service refuses or cannot be connected to, the payment is put back in its previous state. If it is
+        not known whether the credit was subtracted, the payment stays pending until PENDING_TIMEOUT_S has passed.
+
+        :param user_id the id of the user
+        :param order_id the id of the order
+        :param the amount of the transaction
+        :raise ValidationErrror if the order id is not valid
+        :return creates the payment for the parameters used
+        """
+        def start(conn, payment):
+            if payment is None:
+                payment_id = str(uuid.uuid4())
+                conn.execute(INSERT_PENDING_PAYMENT_QUERY, id=payment_id, user_id=user_id, order_id=order_id,
+                             amount=amount)
+                return payment_id, None
+            state = settled_state(payment)
+            if state == PAID:
+                abort(400, "the payment is already made")
+            if state != CANCELLED:
+                abort(409, "the payment is being changed")
+            conn.execute(START_PAYMENT_QUERY, id=payment.id, amount=amount)
+            return payment.id, state
+
+        payment_id, previous = self.start_transition(user_id, order_id, start)
+
+        outcome = self.call_users_service(f"/users/credit/subtract/{user_id}/{amount}")
+        if outcome == UNKNOWN:
+            abort(503, "the outcome of the payment is unknown")
+        if outcome == REFUSED:
+            if previous is None:
+                self.finish_transition(DELETE_PENDING_PAYMENT_QUERY, id=payment_id)
+            else:
+                self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_PAYMENT,
+                                       state=previous, status=False)
+            abort(400, "User service failure")
+
+        self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_PAYMENT, state=PAID,
+                               status=True)
+        return True
+
+    def cancel_pay(self, user_id, order_id):
+        """Cancels the payment from the database. The payment is marked as pending before the credit is given
+        back to the user, and marked as cancelled afterwards, so no database connection is held while the
+        users service is called. If the users service refuses or cannot be connected to, the payment is put back
+        in the paid state. If it is not known whether the credit was given back, the payment stays pending until
+        PENDING_TIMEOUT_S has passed.
+
+        :param user_id: the id of the user
+        :param order_id: the id of the order
+        :raises : error  if the payment does not exist/made and  if the userid and order id does not exist
+        :return: sets the payment status as false (cancel)
+        """
+        def start(conn, payment):
+            if payment is None:
+                abort(400, 'payment does not exist')
+            state = settled_state(payment)
+            if state == CANCELLED:
+                abort(400, "the payment is not made")
+            if state != PAID:
+                abort(409, "the payment is being changed")
+            conn.execute(START_CANCEL_QUERY, id=payment.id)
+            return payment.id, payment.amount
+
+        payment_id, amount = self.start_transition(user_id, order_id, start)
+
+        outcome = self.call_users_service(f"/users/credit/add/{user_id}/{amount}")
+        if outcome == UNKNOWN:
+            abort(503, "the outcome of the cancellation is unknown")
+        if outcome == REFUSED:
+            self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_CANCEL, state=PAID,
+                                   status=True)
+            abort(400, "User service failure")
+
+        self.finish_transition(FINISH_TRANSITION_QUERY, id=payment_id, pending=PENDING_CANCEL, state=CANCELLED,
+                               status=False)
+        return True
+
+    def status(self, order_id):
+        """Retrieves the payment from the database by its order_id.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
+        :return: the payment with order_id order_id
+        """
+        try:
+            with self.engine.connect() as conn:
+                payment = conn.execute(SELECT_STATUS_QUERY, order_id=order_id).first()
+        except SQLAlchemyError:
+            return abort(400, 'Error in the database')
+        if payment is None:
+            abort(400, 'payment does not exist')
+        return payment.status
@@ -1,7 +1,7 @@
 import uuid
 
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Column, Boolean, Numeric
+from sqlalchemy import Column, Boolean, DateTime, Numeric, Text
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -16,13 +16,18 @@ class Payment(Base):
     order_id = Column(UUID(as_uuid=True), nullable=False, default= uuid.uuid4)
     status = Column(Boolean())
     amount = Column(Numeric())
+    # pending_payment, paid, pending_cancel or cancelled
+    state = Column(Text())
+    # when the payment entered its pending state, None if it is not pending
+    pending_since = Column(DateTime(timezone=True))
 
     # Define all the views
 
-    def __init__(self, user_id, order_id, status, amount):
+    def __init__(self, user_id, order_id, status, amount, state=None):
         self.user_id = user_id
         self.order_id = order_id
         self.status = status
         self.amount = amount
+        self.state = state
 
 
@@ -0,0 +1,118 @@
+import os
+from decimal import Decimal, InvalidOperation
+
+from flask import abort
+
+from common.http_client import http_client
+from common.ids import to_uuid
+from common.scylla import create_tables, ensure_tables, get_session
+from payment_service.scylla_payment_by_order import ScyllaPaymentByOrder
+
+
+class ScyllaConnector:
+    SERVICE = 'payment'
+    TABLES = [ScyllaPaymentByOrder]
+
+    def __init__(self, nodes):
+        """Establishes a connection to the ScyllaDB database and checks that the tables in TABLES match their
+        models, creating or updating them unless SCHEMA_AUTO_MIGRATE is "false".
+        """
+        self.session = get_session(nodes)
+        ensure_tables(self.session, self.SERVICE, self.TABLES)
+
+        self.select_payment = self.session.prepare(
+            "SELECT order_id, user_id, status, amount FROM wdm.payments_by_order WHERE order_id = ?")
+        self.select_payment.is_idempotent = True
+        self.insert_payment = self.session.prepare(
+            "INSERT INTO wdm.payments_by_order (order_id, user_id, status, amount) VALUES (?, ?, true, ?)")
+        self.update_payment = self.session.prepare(
+            "UPDATE wdm.payments_by_order SET status = ?, amount = ? WHERE order_id = ?")
+
+    @classmethod
+    def init_schema(cls, nodes):
+        """Creates the "wdm" keyspace and creates or updates the tables in TABLES.
+
+        :return: a description of the changes
+        """
+        changed = create_tables(get_session(nodes), cls.SERVICE, cls.TABLES)
+        return "created or updated the Scylla tables" if changed else "the Scylla tables are up to date"
+
+    def pool_stats(self):
+        return None
+
+    def get_payment(self, order_id):
+        """Retrieves the payment of an order with a single partition read.
+
+        :param order_id: the id of the order
+        :return: the payment row, or None if the order has no payment
+        """
+        try:
+            order_id = to_uuid(order_id, 'Order')
+        except ValueError:
+            abort(400, f"Payment order_id {order_id} is not a valid id")
+        return self.session.execute(self.select_payment, (order_id,)).one()
+
+    def pay(self, user_id, order_id, amount):
+        """Pays the order
+        :param user_id the id of the user
+        :param order_id the id of the order
+        :param the amount of the transaction
+        :raise ValidationErrror if the order id is not valid
+        :return creates the payment for the parameters used
+
+        """
+        payment = self.get_payment(order_id)
+        try:
+            amount = Decimal(amount)
+        except InvalidOperation:
+            abort(400, f"Payment amount {amount} is not valid")
+        if payment is not None:
+            if payment.status:
+                abort(400, "the payment is already made")
+            self.request_user_to_pay(user_id, amount)
+            self.session.execute(self.update_payment, (True, amount, payment.order_id))
+        else:
+            try:
+                user_id = to_uuid(user_id, 'User')
+            except ValueError:
+                abort(400, f"Payment user_id {user_id} is not a valid id")
+            self.request_user_to_pay(user_id, amount)
+            self.session.execute(self.insert_payment, (to_uuid(order_id, 'Order'), user_id, amount))
+
+    @staticmethod
+    def request_user_to_pay(user_id, amount):
+        users_response = http_client \
+            .post(f"http://{os.environ['USER_SERVICE_URL']}/users/credit/subtract/{user_id}/{amount}")
+        if users_response.status_code == 400 or users_response.status_code == 404:
+            abort(400, "User service failure")
+
+    def cancel_pay(self, user_id, order_id):
+        """Cancels the payment.
+
+        :param user_id: the id of the user
+        :param order_id: the id of the order
+        :raises ValueError: if there is no such user
+        :return Payment status is False (cancel)
+        """
+        payment = self.get_payment(order_id)
+        if payment is None:
+            abort(400, 'payment does not exist')
+        if not payment.status:
+            abort(400, "the payment is already canceled")
+        users_response = http_client\
+            .post(f"http://{os.environ['USER_SERVICE_URL']}/users/credit/add/{user_id}/{payment.amount}")
+        if users_response.status_code == 400 or users_response.status_code == 404:
+            abort(400, "User service failure")
+        self.session.execute(self.update_payment, (False, payment.amount, payment.order_id))
+
+    def status(self, order_id):
+        """Retrieves the payment from the database by its order_id.
+
+        :param order_id: the id of the order
+        :raises ValueError: if the order with order_id does not exist or if the format of the order_id is invalid
+        :return: the payment with order_id order_id
+        """
+        payment = self.get_payment(order_id)
+        if payment is None:
+            abort(400, 'payment does not exist')
+        return payment.status
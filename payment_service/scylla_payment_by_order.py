@@ -0,0 +1,11 @@
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+
+
+class ScyllaPaymentByOrder(Model):
+    __table_name__ = 'payments_by_order'
+
+    order_id = columns.UUID(partition_key=True)
+    user_id = columns.UUID()
+    status = columns.Boolean()
+    amount = columns.Decimal()
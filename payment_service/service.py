@@ -1,33 +1,45 @@
 import os
 import sys
-from flask import Flask, Response, jsonify
+from flask import Flask, jsonify
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
+from common.handlers import AwaitableCalls
+from common.http_client import http_client
+from common.worker import LazyConnector, start_worker
+from common.wsgi import handler
+from payment_service import handlers
 from payment_service.connector import ConnectorFactory
 
 
 app = Flask(__name__)
 
-connector = ConnectorFactory().get_connector()
+connector = LazyConnector(ConnectorFactory().get_connector)
+app.before_first_request(start_worker)
+calls = AwaitableCalls(connector)
+
+
+@app.route('/payment/metrics', methods=['GET'])
+def metrics():
+    return jsonify({"http_client": http_client.stats(), "db_pool": connector.pool_stats()})
 
 
 @app.route('/payment/pay/<user_id>/<order_id>/<amount>', methods=['POST'])
+@handler
 def pay(user_id, order_id, amount):
-    connector.pay(user_id, order_id, amount)
-    return Response('success', status=200)
+    return handlers.pay(calls, user_id, order_id, amount)
 
 
 @app.route('/payment/cancel/<user_id>/<order_id>', methods=['POST'])
+@handler
 def cancel_pay(user_id, order_id):
-    connector.cancel_pay(user_id, order_id)
-    return Response('success', status=200)
+    return handlers.cancel_pay(calls, user_id, order_id)
 
 
 @app.route('/payment/status/<order_id>', methods=['GET'])
+@handler
 def status(order_id):
-    payment_status = connector.status(order_id)
-    return jsonify({"paid": payment_status})
+    return handlers.status(calls, order_id)
 
 
 if __name__ == '__main__':
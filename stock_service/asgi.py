@@ -0,0 +1,86 @@
+import asyncio
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from quart import jsonify, request
+from common.asgi import create_app, handler
+from stock_service import handlers
+from stock_service.rebalancer import rebalance_periodically
+from stock_service.connector import ConnectorFactory
+
+app = create_app(__name__)
+connector = None
+rebalancer = None
+
+# Every worker with a positive interval runs a rebalancer, so it is off by default and enabled in a single process.
+rebalance_interval = float(os.getenv('STOCK_REBALANCE_INTERVAL_S', '0'))
+
+
+@app.before_serving
+async def start():
+    global connector, rebalancer
+    connector = await ConnectorFactory().get_async_connector()
+    if rebalance_interval > 0:
+        rebalancer = asyncio.ensure_future(rebalance_periodically(connector, rebalance_interval))
+
+
+@app.after_serving
+async def stop():
+    if rebalancer is not None:
+        rebalancer.cancel()
+
+
+@app.route('/stock/metrics', methods=['GET'])
+async def metrics():
+    # Stock writes are not coalesced in the ASGI application.
+    return jsonify({"coalescer": None})
+
+
+@app.route('/stock/find/<item_id>', methods=['GET'])
+@handler
+async def find_item(item_id):
+    return await handlers.find_item(connector, item_id)
+
+
+@app.route('/stock/find_many', methods=['POST'])
+@handler
+async def find_items():
+    return await handlers.find_items(connector, await request.get_json(silent=True))
+
+
+@app.route('/stock/subtract/<item_id>/<int:number>', methods=['POST'])
+@handler
+async def subtract_amount(item_id, number):
+    return await handlers.subtract_amount(connector, item_id, number)
+
+
+@app.route('/stock/subtract_batch', methods=['POST'])
+@handler
+async def subtract_batch():
+    return await handlers.subtract_batch(connector, await request.get_json(silent=True))
+
+
+@app.route('/stock/add/<item_id>/<int:number>', methods=['POST'])
+@handler
+async def add_amount(item_id, number):
+    return await handlers.add_amount(connector, item_id, number)
+
+
+@app.route('/stock/item/shard/<item_id>/<int:shards>', methods=['POST'])
+@handler
+async def shard_item(item_id, shards):
+    return await handlers.shard_item(connector, item_id, shards)
+
+
+@app.route('/stock/item/create_many/<int:count>/<price>/<int:stock>', methods=['POST'])
+@handler
+async def create_items(count, price, stock):
+    return await handlers.create_items(connector, count, price, stock)
+
+
+@app.route('/stock/item/create/<price>', methods=['POST'])
+@handler
+async def create_item(price):
+    return await handlers.create_item(connector, price)
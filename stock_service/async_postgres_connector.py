@@ -0,0 +1,237 @@
+import random
+import uuid
+
+from common.async_postgres import Query, to_row
+from common.bulk import chunk_sizes
+from common.ids import to_uuid
+from stock_service import postgres_connector
+from stock_service.connector import AlreadyShardedError, InsufficientStockError, ItemNotFoundError, \
+    parse_amounts, parse_item_ids, split_stock
+
+# The statements of the synchronous connector.
+ADD_QUERY = Query(postgres_connector.ADD_QUERY)
+SUBTRACT_QUERY = Query(postgres_connector.SUBTRACT_QUERY)
+SELECT_ITEM_QUERY = Query(postgres_connector.SELECT_ITEM_QUERY)
+SELECT_ITEMS_QUERY = Query(postgres_connector.SELECT_ITEMS_QUERY)
+SELECT_SHARDS_QUERY = Query(postgres_connector.SELECT_SHARDS_QUERY)
+SELECT_FOR_UPDATE_QUERY = Query(postgres_connector.SELECT_FOR_UPDATE_QUERY)
+SET_SHARDS_QUERY = Query(postgres_connector.SET_SHARDS_QUERY)
+SELECT_SHARDED_ITEMS_QUERY = Query(postgres_connector.SELECT_SHARDED_ITEMS_QUERY)
+INSERT_SHARD_QUERY = Query(postgres_connector.INSERT_SHARD_QUERY)
+ADD_SHARD_QUERY = Query(postgres_connector.ADD_SHARD_QUERY)
+SUBTRACT_SHARD_QUERY = Query(postgres_connector.SUBTRACT_SHARD_QUERY)
+LOCK_SHARDS_QUERY = Query(postgres_connector.LOCK_SHARDS_QUERY)
+SET_SHARD_QUERY = Query(postgres_connector.SET_SHARD_QUERY)
+SET_STOCK_QUERY = Query(postgres_connector.SET_STOCK_QUERY)
+
+INSERT_ITEM_QUERY = Query("INSERT INTO stock_item (id, price, in_stock, shards) VALUES (:item_id, :price, 0, 1)")
+# Locks the rows of a batch in id order, so concurrent batches cannot deadlock.
+LOCK_ITEMS_QUERY = Query(
+    "SELECT id, in_stock, shards FROM stock_item WHERE id = ANY(:item_ids) ORDER BY id FOR UPDATE")
+
+
+async def take_from_shards(conn, item_id, number):
+    """Subtracts a number from the shards of an item like postgres_connector.take_from_shards, in the
+    transaction of the given connection.
+
+    :return: the number of the item in stock, or None if the shards together hold too little
+    """
+    rows = await conn.fetch(*LOCK_SHARDS_QUERY.args(item_id=item_id))
+    in_stock = sum(row['in_stock'] for row in rows)
+    if in_stock < number:
+        return None
+    remaining = number
+    for row in rows:
+        take = min(row['in_stock'], remaining)
+        if take:
+            await conn.execute(*SET_SHARD_QUERY.args(item_id=item_id, shard=row['shard'],
+                                                     in_stock=row['in_stock'] - take))
+            remaining -= take
+    return in_stock - number
+
+
+class AsyncPostgresConnector:
+    def __init__(self, pool):
+        """Runs the queries of PostgresConnector with asyncpg, for the ASGI application.
+
+        :param pool: the asyncpg pool returned by common.async_postgres.create_pool
+        """
+        self.pool = pool
+        # Items are never unsharded, so the shard counts learned from the database stay valid.
+        self.sharded_items = {}
+
+    async def create_item(self, price):
+        """Creates an item with the specified price.
+
+        :param price: the price of the item
+        :return: the id of the created item
+        """
+        item_id = uuid.uuid4()
+        await self.pool.execute(*INSERT_ITEM_QUERY.args(item_id=item_id, price=price))
+        return str(item_id)
+
+    async def create_items(self, count, price, in_stock):
+        """Creates items with the given price and stock, BULK_CHUNK_SIZE at a time with a COPY.
+
+        :param count: the number of items
+        :param price: the price of every item
+        :param in_stock: the initial stock of every item
+        :return: async generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            item_ids = [uuid.uuid4() for _ in range(size)]
+            async with self.pool.acquire() as conn:
+                await conn.copy_records_to_table('stock_item', columns=['id', 'price', 'in_stock'],
+                                                 records=[(item_id, price, in_stock) for item_id in item_ids])
+            yield item_ids
+
+    async def get_item(self, item_id):
+        """Retrieves the item from the database by its id.
+
+        :param item_id: the id of the item
+        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
+        :return: the item row with id, price and in_stock, which is summed over the shards of a sharded item
+        """
+        item = await self.pool.fetchrow(*SELECT_ITEM_QUERY.args(item_id=to_uuid(item_id, 'Item')))
+        if item is None:
+            raise ValueError(f"Item with id {item_id} not found")
+        return to_row(item)
+
+    async def get_items(self, item_ids):
+        """Retrieves several items from the database with a single query.
+
+        :param item_ids: list of item ids
+        :return: the rows of the items that exist, in no particular order, with id, price and in_stock
+        """
+        item_ids = parse_item_ids(item_ids)
+        if not item_ids:
+            return []
+        return [to_row(item) for item in await self.pool.fetch(*SELECT_ITEMS_QUERY.args(item_ids=item_ids))]
+
+    async def update_item(self, query, item_id, number):
+        """Runs a stock change on an item row that only applies to unsharded items, reading the shards of an item
+        whose change did not apply again like PostgresConnector.update_item.
+
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :return: the number of the item in stock, None if the change did not apply, and the shards of the item
+        """
+        item_uuid = to_uuid(item_id, 'Item')
+        row = await self.pool.fetchrow(*query.args(item_id=item_uuid, number=number))
+        in_stock, shards = row['in_stock'], row['shards']
+        if in_stock is None and shards == 1:
+            shards = await self.pool.fetchval(*SELECT_SHARDS_QUERY.args(item_id=item_uuid))
+        if shards is None:
+            raise ValueError(f"Item with id {item_id} not found")
+        if shards > 1:
+            self.sharded_items[str(item_id)] = shards
+        return in_stock, shards
+
+    async def add_amount(self, item_id, number):
+        """Adds the given number to the item count.
+
+        :param item_id: the id of the item
+        :param number: the number to add to stock
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :return: the number of the item in stock
+        """
+        if str(item_id) not in self.sharded_items:
+            in_stock, shards = await self.update_item(ADD_QUERY, item_id, number)
+            if shards == 1:
+                return in_stock
+        return await self.pool.fetchval(*ADD_SHARD_QUERY.args(
+            item_id=to_uuid(item_id, 'Item'), number=number, shard=random.randrange(self.sharded_items[str(item_id)])))
+
+    async def subtract_amount(self, item_id, number):
+        """Subtracts the given number from the item count.
+
+        :param item_id: the id of the item
+        :param number: the number to subtract from stock
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AssertionError: if the item count after subtraction is negative
+        :return: the number of the item in stock
+        """
+        if str(item_id) not in self.sharded_items:
+            in_stock, shards = await self.update_item(SUBTRACT_QUERY, item_id, number)
+            if shards == 1:
+                assert in_stock is not None, 'Item count cannot be negative'
+                return in_stock
+        item_uuid = to_uuid(item_id, 'Item')
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(*SUBTRACT_SHARD_QUERY.args(
+                    item_id=item_uuid, number=number, shard=random.randrange(self.sharded_items[str(item_id)])))
+                if row['applied']:
+                    return row['in_stock'] - number
+                # The random shard holds too little, so take from all shards.
+                in_stock = await take_from_shards(conn, item_uuid, number)
+        assert in_stock is not None, 'Item count cannot be negative'
+        return in_stock
+
+    async def subtract_batch(self, amounts):
+        """Subtracts the given numbers from the counts of several items in one transaction, all or nothing.
+
+        :param amounts: list of (item_id, number) pairs
+        :raises InsufficientStockError: if the count of an item would become negative
+        :raises ItemNotFoundError: if an item does not exist
+        :return: dict mapping the item ids to their remaining stock
+        """
+        merged = parse_amounts(amounts)
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(*LOCK_ITEMS_QUERY.args(item_ids=list(merged)))
+                found = {row['id']: row for row in rows}
+                stock = {}
+                for item_id, number in sorted(merged.items()):
+                    if item_id not in found:
+                        raise ItemNotFoundError(item_id)
+                    if found[item_id]['shards'] > 1:
+                        stock[item_id] = await take_from_shards(conn, item_id, number)
+                        if stock[item_id] is None:
+                            raise InsufficientStockError(item_id)
+                        continue
+                    if found[item_id]['in_stock'] - number < 0:
+                        raise InsufficientStockError(item_id)
+                    stock[item_id] = found[item_id]['in_stock'] - number
+                    await conn.execute(*SET_STOCK_QUERY.args(item_id=item_id, in_stock=stock[item_id]))
+        return {str(item_id): in_stock for item_id, in_stock in stock.items()}
+
+    async def shard_item(self, item_id, shards):
+        """Splits the count of an item over the given number of shard rows, so that concurrent changes of the
+        item lock different rows.
+
+        :param item_id: the id of the item
+        :param shards: the number of shards, at least 2
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AlreadyShardedError: if the item is already sharded
+        """
+        item_uuid = to_uuid(item_id, 'Item')
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                row = await conn.fetchrow(*SELECT_FOR_UPDATE_QUERY.args(item_id=item_uuid))
+                if row is None:
+                    raise ValueError(f"Item with id {item_id} not found")
+                if row['shards'] > 1:
+                    raise AlreadyShardedError(item_id)
+                await conn.executemany(INSERT_SHARD_QUERY.sql, [
+                    INSERT_SHARD_QUERY.values(item_id=item_uuid, shard=shard, in_stock=in_stock)
+                    for shard, in_stock in enumerate(split_stock(row['in_stock'], shards))])
+                await conn.execute(*SET_SHARDS_QUERY.args(item_id=item_uuid, shards=shards))
+        self.sharded_items[str(item_id)] = shards
+
+    async def sharded_item_ids(self):
+        """Returns the ids of the sharded items."""
+        return [row['id'] for row in await self.pool.fetch(SELECT_SHARDED_ITEMS_QUERY.sql)]
+
+    async def rebalance(self, item_id):
+        """Spreads the count of a sharded item evenly over its shards in one transaction.
+
+        :param item_id: the id of the item
+        """
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                rows = await conn.fetch(*LOCK_SHARDS_QUERY.args(item_id=item_id))
+                targets = split_stock(sum(row['in_stock'] for row in rows), len(rows))
+                for row, target in zip(rows, targets):
+                    if row['in_stock'] != target:
+                        await conn.execute(*SET_SHARD_QUERY.args(item_id=item_id, shard=row['shard'],
+                                                                 in_stock=target))
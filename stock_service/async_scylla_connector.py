@@ -0,0 +1,257 @@
+import asyncio
+import random
+import uuid
+
+from common.aio import gather_limited, wrap_future
+from common.bulk import BULK_CONCURRENCY, chunk_sizes
+from common.ids import to_uuid
+from stock_service.connector import AlreadyShardedError, InsufficientStockError, ItemNotFoundError, \
+    StockContentionError, parse_amounts, parse_item_ids, split_stock, undo_changes_async
+from stock_service.scylla_connector import FIND_MANY_CONCURRENCY, MAX_STOCK_UPDATE_ATTEMPTS, ScyllaConnector
+
+
+class AsyncScyllaConnector:
+    def __init__(self, nodes):
+        """Runs the statements of ScyllaConnector with execute_async, for the ASGI application. Connecting and
+        preparing the statements is done by a ScyllaConnector.
+        """
+        self.sync = ScyllaConnector(nodes)
+        self.session = self.sync.session
+
+    async def execute(self, statement, parameters=None):
+        return await wrap_future(self.session.execute_async(statement, parameters))
+
+    async def create_item(self, price):
+        """Creates an item with the specified price.
+
+        :param price: the price of the item
+        :return: the id of the created item
+        """
+        item_id = uuid.uuid4()
+        await self.execute(self.sync.insert_item, (item_id, price))
+        return item_id
+
+    async def create_items(self, count, price, in_stock):
+        """Creates items with the given price and stock, BULK_CHUNK_SIZE at a time with concurrent inserts.
+
+        :param count: the number of items
+        :param price: the price of every item
+        :param in_stock: the initial stock of every item
+        :return: async generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            item_ids = [uuid.uuid4() for _ in range(size)]
+            await gather_limited(BULK_CONCURRENCY, [self.execute(self.sync.insert_item_with_stock,
+                                                                 (item_id, price, in_stock))
+                                                    for item_id in item_ids])
+            yield item_ids
+
+    async def read_item(self, item_id):
+        """Reads the item row, whose in_stock is None if the item is sharded.
+
+        :param item_id: the id of the item
+        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
+        :return: the item row with id, price, in_stock and shards
+        """
+        item = (await self.execute(self.sync.select_item, (to_uuid(item_id, 'Item'),))).one()
+        if item is None:
+            raise ValueError(f"Item with id {item_id} not found")
+        return item
+
+    async def get_item(self, item_id):
+        """Retrieves the item from the database by its id.
+
+        :param item_id: the id of the item
+        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
+        :return: the item row with id, price and in_stock, which is summed over the shards of a sharded item
+        """
+        item = await self.read_item(item_id)
+        if (item.shards or 1) > 1:
+            return item._replace(in_stock=await self.sharded_in_stock(item.id, item.shards))
+        return item
+
+    async def get_items(self, item_ids):
+        """Retrieves several items, reading their partitions concurrently.
+
+        :param item_ids: list of item ids
+        :return: the rows of the items that exist, in no particular order, with id, price and in_stock
+        """
+        results = await gather_limited(FIND_MANY_CONCURRENCY, [self.execute(self.sync.select_item, (item_id,))
+                                                               for item_id in parse_item_ids(item_ids)])
+        items = [result.one() for result in results]
+        return [item._replace(in_stock=await self.sharded_in_stock(item.id, item.shards)) if (item.shards or 1) > 1
+                else item for item in items if item is not None]
+
+    async def update_amount(self, item_id, delta):
+        """Changes the item count like ScyllaConnector.update_amount.
+
+        :param item_id: the id of the item
+        :param delta: the number to add to stock, negative to subtract
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AssertionError: if the item count after the change is negative
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        :return: the number of the item in stock
+        """
+        item = await self.read_item(item_id)
+        in_stock = item.in_stock
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            if in_stock is None:
+                # The item is sharded, possibly since it was read.
+                if item.in_stock is not None:
+                    item = await self.read_item(item_id)
+                return await self.update_sharded_amount(item, delta)
+            assert in_stock + delta >= 0, 'Item count cannot be negative'
+            result = await self.execute(self.sync.update_in_stock, (in_stock + delta, item.id, in_stock))
+            if result.was_applied:
+                return in_stock + delta
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    async def add_amount(self, item_id, number):
+        return await self.update_amount(item_id, number)
+
+    async def subtract_amount(self, item_id, number):
+        return await self.update_amount(item_id, -number)
+
+    async def subtract_batch(self, amounts):
+        """Subtracts the given numbers from the counts of several items, all or nothing, like
+        ScyllaConnector.subtract_batch.
+
+        :param amounts: list of (item_id, number) pairs
+        :raises InsufficientStockError: if the count of an item would become negative
+        :raises ItemNotFoundError: if an item does not exist
+        :raises StockContentionError: if an item kept changing during every attempt to update it
+        :return: dict mapping the item ids to their remaining stock
+        """
+        merged = parse_amounts(amounts)
+        stock = {}
+        try:
+            for item_id, number in sorted(merged.items()):
+                try:
+                    stock[item_id] = await self.subtract_amount(item_id, number)
+                except AssertionError:
+                    raise InsufficientStockError(item_id)
+                except ValueError:
+                    raise ItemNotFoundError(item_id)
+        except Exception:
+            await undo_changes_async(self.add_amount, [(item_id, merged[item_id]) for item_id in stock])
+            raise
+        return {str(item_id): in_stock for item_id, in_stock in stock.items()}
+
+    async def shard_item(self, item_id, shards):
+        """Splits the count of an item over the given number of shards like ScyllaConnector.shard_item.
+
+        :param item_id: the id of the item
+        :param shards: the number of shards, at least 2
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AlreadyShardedError: if the item is already sharded
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        """
+        item = await self.read_item(item_id)
+        in_stock = item.in_stock
+        if in_stock is None:
+            raise AlreadyShardedError(item_id)
+        await asyncio.gather(*[self.execute(self.sync.insert_empty_shard, (item.id, shard)) for shard in range(shards)])
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            if in_stock is None:
+                raise AlreadyShardedError(item_id)
+            result = await self.execute(self.sync.set_shards, (shards, item.id, in_stock))
+            if result.was_applied:
+                moves = await asyncio.gather(*[self.change_shard(item.id, shard, shard_stock)
+                                                 for shard, shard_stock in enumerate(split_stock(in_stock, shards))],
+                                               return_exceptions=True)
+                await self.execute(self.sync.insert_sharded_item, (item.id,))
+                for move in moves:
+                    if isinstance(move, BaseException):
+                        raise move
+                return
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    async def sharded_item_ids(self):
+        """Returns the ids of the sharded items."""
+        return [row.item_id for row in await self.execute(self.sync.select_sharded_items)]
+
+    async def sharded_in_stock(self, item_id, shards):
+        """Reads the shards of an item concurrently and sums their counts."""
+        results = await asyncio.gather(*[self.execute(self.sync.select_shard, (item_id, shard))
+                                         for shard in range(shards)])
+        return sum(result.one().in_stock for result in results)
+
+    async def change_shard(self, item_id, shard, delta, partial=False):
+        """Changes the count of a shard like ScyllaConnector.change_shard.
+
+        :param item_id: the id of the item
+        :param shard: the number of the shard
+        :param delta: the number to add to the shard, negative to subtract
+        :param partial: whether to subtract everything the shard holds if it holds less than asked
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        :return: the number added to the shard, negative if subtracted, or None if the shard holds too little
+        """
+        in_stock = (await self.execute(self.sync.select_shard, (item_id, shard))).one().in_stock
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            change = delta
+            if in_stock + delta < 0:
+                if not partial:
+                    return None
+                change = -in_stock
+            if change == 0:
+                return 0
+            result = await self.execute(self.sync.update_shard, (in_stock + change, item_id, shard, in_stock))
+            if result.was_applied:
+                return change
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    async def update_sharded_amount(self, item, delta):
+        """Changes the count of a sharded item like ScyllaConnector.update_sharded_amount.
+
+        :param item: the item row
+        :param delta: the number to add to stock, negative to subtract
+        :raises AssertionError: if the item count after the change is negative
+        :return: the number of the item in stock
+        """
+        shards = random.sample(range(item.shards), item.shards)
+        for shard in shards:
+            if await self.change_shard(item.id, shard, delta) is not None:
+                break
+        else:
+            taken = []
+            remaining = -delta
+            try:
+                for shard in shards:
+                    if remaining == 0:
+                        break
+                    change = await self.change_shard(item.id, shard, -remaining, partial=True)
+                    taken.append((item.id, shard, -change))
+                    remaining += change
+            except Exception:
+                await undo_changes_async(self.change_shard, taken)
+                raise
+            if remaining > 0:
+                await undo_changes_async(self.change_shard, taken)
+                raise AssertionError('Item count cannot be negative')
+        return await self.sharded_in_stock(item.id, item.shards)
+
+    async def rebalance(self, item_id):
+        """Moves stock between the shards of an item like ScyllaConnector.rebalance.
+
+        :param item_id: the id of the item
+        """
+        item = await self.read_item(item_id)
+        results = await asyncio.gather(*[self.execute(self.sync.select_shard, (item.id, shard))
+                                         for shard in range(item.shards)])
+        counts = [result.one().in_stock for result in results]
+        targets = split_stock(sum(counts), item.shards)
+        surplus = [[shard, counts[shard] - target] for shard, target in enumerate(targets) if counts[shard] > target]
+        for shard, target in enumerate(targets):
+            missing = target - counts[shard]
+            while missing > 0 and surplus:
+                source = surplus[0]
+                moved = -await self.change_shard(item.id, source[0], -min(missing, source[1]), partial=True)
+                if moved:
+                    await self.change_shard(item.id, shard, moved)
+                missing -= moved
+                source[1] -= moved
+                if source[1] <= 0 or not moved:
+                    surplus.pop(0)
@@ -0,0 +1,113 @@
+import threading
+from time import perf_counter, sleep
+
+
+class PendingUpdate:
+    def __init__(self, delta):
+        """A stock change waiting in a batch, completed by the request that writes the batch."""
+        self.delta = delta
+        self.done = threading.Event()
+        self.in_stock = None
+        self.error = None
+
+    def result(self):
+        """Waits until the batch is written.
+
+        :raises AssertionError: if the change would have made the item count negative
+        :return: the number of the item in stock right after this change
+        """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        if self.in_stock is None:
+            raise AssertionError('Item count cannot be negative')
+        return self.in_stock
+
+
+class WriteCoalescer:
+    def __init__(self, connector, window):
+        """Merges the concurrent stock changes of an item into a single write.
+
+        The first request for an item becomes the leader of a batch: it waits for the window, takes the
+        changes that arrived in the meantime and writes them with connector.apply_deltas, which accepts or
+        refuses every change in arrival order. The other requests of the batch wait for that write.
+
+        :param connector: the stock connector that writes the batches
+        :param window: the time in seconds a leader waits for more changes
+        """
+        self.connector = connector
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.counters = {'batches': 0, 'requests': 0, 'max_batch_size': 0, 'window_wait_ms': 0.0,
+                         'request_wait_ms': 0.0}
+
+    def add_amount(self, item_id, number):
+        return self.submit(item_id, number)
+
+    def subtract_amount(self, item_id, number):
+        return self.submit(item_id, -number)
+
+    def submit(self, item_id, delta):
+        """Adds a stock change to the batch of its item, leading the batch if there is none yet.
+
+        :param item_id: the id of the item
+        :param delta: the number to add to stock, negative to subtract
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AssertionError: if the change would make the item count negative
+        :return: the number of the item in stock right after this change
+        """
+        start = perf_counter()
+        update = PendingUpdate(delta)
+        with self.lock:
+            batch = self.pending.get(item_id)
+            leader = batch is None
+            if leader:
+                batch = self.pending[item_id] = []
+            batch.append(update)
+
+        if leader:
+            sleep(self.window)
+            with self.lock:
+                del self.pending[item_id]
+                self.counters['window_wait_ms'] += (perf_counter() - start) * 1000
+            self.write(item_id, batch)
+
+        try:
+            return update.result()
+        finally:
+            with self.lock:
+                self.counters['request_wait_ms'] += (perf_counter() - start) * 1000
+
+    def write(self, item_id, batch):
+        """Writes a batch and completes its updates."""
+        try:
+            for update, in_stock in zip(batch, self.connector.apply_deltas(item_id, [u.delta for u in batch])):
+                update.in_stock = in_stock
+        except Exception as error:
+            for update in batch:
+                update.error = error
+        finally:
+            with self.lock:
+                self.counters['batches'] += 1
+                self.counters['requests'] += len(batch)
+                self.counters['max_batch_size'] = max(self.counters['max_batch_size'], len(batch))
+            for update in batch:
+                update.done.set()
+
+    def stats(self):
+        """Returns the batch counters, with the mean batch size, the mean time leaders waited for their window
+        and the mean time requests waited for their batch to be written.
+        """
+        with self.lock:
+            counters = dict(self.counters)
+        batches, requests = counters['batches'], counters['requests']
+        return {
+            'window_ms': self.window * 1000,
+            'batches': batches,
+            'requests': requests,
+            'max_batch_size': counters['max_batch_size'],
+            'mean_batch_size': requests / batches if batches else 0,
+            'mean_window_wait_ms': counters['window_wait_ms'] / batches if batches else 0,
+            'mean_request_wait_ms': counters['request_wait_ms'] / requests if requests else 0,
+        }
@@ -1,18 +1,174 @@
+import logging
 import os
-from time import sleep
+import uuid
 
-from cassandra import ConsistencyLevel
-from cassandra.cluster import Cluster
-from cassandra.cqlengine import connection, ValidationError
-from cassandra.cqlengine.management import sync_table
-from cassandra.cqlengine.query import QueryException
-from sqlalchemy import create_engine
-from sqlalchemy.exc import DataError
-from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy.orm.exc import NoResultFound
+logger = logging.getLogger(__name__)
 
-from stock_service.scylla_stock_item import ScyllaStockItem
-from stock_service.postgres_stock_item import Base, PostgresStockItem
+
+class InsufficientStockError(AssertionError):
+    """Raised when subtracting from the stock of an item would make it negative."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Item {item_id} does not have enough stock")
+        self.item_id = item_id
+
+
+class ItemNotFoundError(ValueError):
+    """Raised when an item does not exist or its id is not a valid id."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Item with id {item_id} not found")
+        self.item_id = item_id
+
+
+class StockContentionError(RuntimeError):
+    """Raised when the stock of an item kept changing during every attempt to update it."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Item {item_id} is being modified concurrently")
+        self.item_id = item_id
+
+
+class AlreadyShardedError(ValueError):
+    """Raised when sharding an item that is already sharded."""
+
+    def __init__(self, item_id):
+        super().__init__(f"Item {item_id} is already sharded")
+        self.item_id = item_id
+
+
+def parse_amounts(amounts):
+    """Parses the item ids of a batch and merges the amounts of duplicate items.
+
+    :param amounts: list of (item_id, number) pairs
+    :raises ItemNotFoundError: if an item id is not a valid id
+    :return: dict mapping item UUIDs to the total number
+    """
+    merged = {}
+    for item_id, number in amounts:
+        try:
+            key = uuid.UUID(str(item_id))
+        except ValueError:
+            raise ItemNotFoundError(item_id)
+        merged[key] = merged.get(key, 0) + number
+    return merged
+
+
+def decide_deltas(in_stock, deltas):
+    """Applies stock changes in order, refusing every change that would make the count negative.
+
+    :param in_stock: the number of the item in stock before the changes
+    :param deltas: the numbers to add to stock, negative to subtract
+    :return: (results, in_stock) where results holds the count right after every accepted change, or None for
+    a refused one, and in_stock is the count after all accepted changes
+    """
+    results = []
+    for delta in deltas:
+        if in_stock + delta >= 0:
+            in_stock += delta
+            results.append(in_stock)
+        else:
+            results.append(None)
+    return results, in_stock
+
+
+def net_change(deltas):
+    """Sums stock changes and finds the lowest count from which every one of them can be applied in order.
+
+    :param deltas: the numbers to add to stock, negative to subtract
+    :return: (net, required) where net is the sum of the changes and required the lowest count for which none
+    of them makes the count negative
+    """
+    net = required = 0
+    for delta in deltas:
+        net += delta
+        required = max(required, -net)
+    return net, required
+
+
+def parse_item_ids(item_ids):
+    """Parses the ids of a multi-get, leaving out duplicates and ids that are not valid ids.
+
+    :param item_ids: list of item ids
+    :return: list of item UUIDs
+    """
+    parsed = []
+    for item_id in item_ids:
+        try:
+            parsed.append(uuid.UUID(str(item_id)))
+        except ValueError:
+            pass
+    return list(dict.fromkeys(parsed))
+
+
+def items_in_order(item_ids, items):
+    """Orders the items found by a multi-get like the ids they were asked for.
+
+    :param item_ids: the list of item ids that was asked for
+    :param items: the item rows that were found, with id, price and in_stock
+    :return: list with a dict of the item_id, stock and price of every item found, once per item
+    """
+    found = {str(item.id): item for item in items}
+    response = []
+    for item_id in item_ids:
+        try:
+            item = found.pop(str(uuid.UUID(str(item_id))), None)
+        except ValueError:
+            continue
+        if item is not None:
+            response.append({"item_id": item.id, "stock": item.in_stock, "price": item.price})
+    return response
+
+
+def split_stock(in_stock, shards):
+    """Splits a count into the given number of shard counts that differ by at most one."""
+    return [in_stock // shards + (1 if shard < in_stock % shards else 0) for shard in range(shards)]
+
+
+def apply_deltas_one_by_one(connector, item_id, deltas):
+    """Applies stock changes in order with separate writes.
+
+    :return: the count right after every change, None for changes refused because of insufficient stock
+    """
+    results = []
+    for delta in deltas:
+        try:
+            if delta >= 0:
+                results.append(connector.add_amount(item_id, delta))
+            else:
+                results.append(connector.subtract_amount(item_id, -delta))
+        except AssertionError:
+            results.append(None)
+    return results
+
+
+def undo_changes(undo, changes):
+    """Undoes stock changes one by one, going on with the others when undoing one of them fails.
+
+    :param undo: function that undoes a change, called with the arguments of the change
+    :param changes: list of argument tuples of the changes to undo
+    :return: the argument tuples of the changes that could not be undone, which are logged
+    """
+    failed = []
+    for change in changes:
+        try:
+            undo(*change)
+        except Exception:
+            logger.exception("Undoing the stock change %s failed", change)
+            failed.append(change)
+    return failed
+
+
+async def undo_changes_async(undo, changes):
+    """Undoes stock changes like undo_changes, where undo is a coroutine function."""
+    failed = []
+    for change in changes:
+        try:
+            await undo(*change)
+        except Exception:
+            logger.exception("Undoing the stock change %s failed", change)
+            failed.append(change)
+    return failed
 
 
 class ConnectorFactory:
@@ -35,173 +191,46 @@ class ConnectorFactory:
         or a ScyllaConnector if DATABASE_TYPE is set to scylla
         """
         if self.db_type == 'postgres':
+            from stock_service.postgres_connector import PostgresConnector
             return PostgresConnector(self.postgres_user, self.postgres_password, self.db_host, self.postgres_port,
                                      self.postgres_name)
         elif self.db_type == 'scylla':
+            from stock_service.scylla_connector import ScyllaConnector
             return ScyllaConnector(self.scylla_nodes)
         else:
             raise ValueError("Invalid database")
 
-
-class ScyllaConnector:
-    def __init__(self, nodes):
-        """Establishes a connection to the ScyllaDB database, creates the "wdm" keyspace if it does not exist
-        and creates or updates the stock_item table.
+    async def get_async_connector(self):
         """
-        while True:
-            try:
-                session = Cluster(contact_points=nodes).connect()
-                break
-            except Exception:
-                sleep(1)
-        session.execute("""
-            CREATE KEYSPACE IF NOT EXISTS wdm
-            WITH replication = { 'class': 'SimpleStrategy', 'replication_factor': '3' }
-            """)
-        session.default_consistency_level = ConsistencyLevel.QUORUM
-
-        connection.setup(nodes, "wdm")
-        sync_table(ScyllaStockItem)
-
-    @staticmethod
-    def create_item(price):
-        """Creates an item with the specified price.
-
-        :param price: the price of the item
-        :return: the id of the created item
-        """
-        item = ScyllaStockItem.create(price=price, in_stock=0)
-        return item.id
-
-    @staticmethod
-    def get_item(item_id):
-        """Retrieves the item from the database by its id.
-
-        :param item_id: the id of the item
-        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
-        :return: the item with id item_id
-        """
-        try:
-            item = ScyllaStockItem.get(id=item_id)
-        except QueryException:
-            raise ValueError(f"Item with id {item_id} not found")
-        except ValidationError:
-            raise ValueError(f"Item id {item_id} is not a valid id")
-
-        return item
-
-    def add_amount(self, item_id, number):
-        """Adds the given number to the item count.
-
-        :param item_id: the id of the item
-        :param number: the number to add to stock
-        :return: the number of the item in stock
-        """
-        item = self.get_item(item_id)
-        item.in_stock = item.in_stock + number
-        ScyllaStockItem.update(item)
-        return item.in_stock
-
-    def subtract_amount(self, item_id, number):
-        """Subtracts the given number from the item count.
-
-        :param item_id: the id of the item
-        :param number: the number to subtract from stock
-        :raises AssertionError: if the item count after subtraction is negative
-        :return: the number of the item in stock
-        """
-        item = self.get_item(item_id)
-        item.in_stock = item.in_stock - number
-
-        assert item.in_stock >= 0, 'Item count cannot be negative'
-
-        ScyllaStockItem.update(item)
-        return item.in_stock
-
-
-class PostgresConnector:
-    def __init__(self, db_user, db_password, db_host, db_port, db_name):
-        """Establishes a connection to the PostgreSQL database, and creates or updates the stock_item table.
-        """
-        self.engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}',
-                                    convert_unicode=True, pool_timeout=3)
-        self.db_session = scoped_session(sessionmaker(bind=self.engine))
-        Base.query = self.db_session.query_property()
-        Base.metadata.create_all(bind=self.engine)
-        Base.metadata.query = self.db_session.query_property()
-        PostgresStockItem.metadata.create_all(bind=self.engine)
-        PostgresStockItem.metadata.query = self.db_session.query_property()
-
-    def create_item(self, price):
-        """Creates an item with the specified price.
-
-        :param price: the price of the item
-        :return: the id of the created item
-        """
-        session = self.db_session()
-        try:
-            item = PostgresStockItem(price=price, in_stock=0)
-            session.add(item)
-            session.commit()
-            return str(item.id)
-        except Exception:
-            raise
-        finally:
-            session.close()
-
-    def get_item(self, item_id):
-        """Retrieves the item from the database by its id.
-
-        :param item_id: the id of the item
-        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
-        :return: the item with id item_id
-        """
-        session = self.db_session()
-        try:
-            return session.query(PostgresStockItem).filter_by(id=item_id).one()
-        except NoResultFound:
-            raise ValueError(f"Item with id {item_id} not found")
-        except DataError:
-            raise ValueError(f"Item id {item_id} is not a valid id")
-        except Exception:
-            raise
-        finally:
-            session.close()
-
-    def add_amount(self, item_id, number):
-        """Adds the given number to the item count.
-
-        :param item_id: the id of the item
-        :param number: the number to add to stock
-        :return: the number of the item in stock
+        Returns the connector of the ASGI application for the DATABASE_TYPE environment variable, which has the
+        methods of the connector returned by get_connector as coroutines.
+        :raises ValueError: if DATABASE_TYPE is not a valid database option
+        :return: an AsyncPostgresConnector if DATABASE_TYPE is set to postgres,
+        or an AsyncScyllaConnector if DATABASE_TYPE is set to scylla
         """
-        session = self.db_session()
-        try:
-            item = session.query(PostgresStockItem).filter_by(id=item_id).one()
-            item.in_stock = item.in_stock + number
-            session.commit()
-            return item.in_stock
-        except Exception:
-            raise
-        finally:
-            session.close()
-
-    def subtract_amount(self, item_id, number):
-        """Subtracts the given number from the item count.
+        if self.db_type == 'postgres':
+            from common.async_postgres import create_pool
+            from stock_service.async_postgres_connector import AsyncPostgresConnector
+            return AsyncPostgresConnector(await create_pool(self.postgres_user, self.postgres_password, self.db_host,
+                                                            self.postgres_port, self.postgres_name))
+        elif self.db_type == 'scylla':
+            from stock_service.async_scylla_connector import AsyncScyllaConnector
+            return AsyncScyllaConnector(self.scylla_nodes)
+        else:
+            raise ValueError("Invalid database")
 
-        :param item_id: the id of the item
-        :param number: the number to subtract from stock
-        :raises AssertionError: if the item count after subtraction is negative
-        :return: the number of the item in stock
+    def init_schema(self):
+        """Creates or migrates the schema of the database specified by the DATABASE_TYPE environment variable.
+        This is run once per deployment by init.py, before the workers start.
+        :raises ValueError: if DATABASE_TYPE is not a valid database option
+        :return: a description of the changes
         """
-        session = self.db_session()
-        try:
-            item = session.query(PostgresStockItem).filter_by(id=item_id).one()
-            assert item.in_stock - number >= 0, 'Item count cannot be negative'
-            item.in_stock = item.in_stock - number
-            session.commit()
-            return item.in_stock
-        except Exception:
-            raise
-        finally:
-            session.close()
+        if self.db_type == 'postgres':
+            from stock_service.postgres_connector import PostgresConnector
+            return PostgresConnector.init_schema(self.postgres_user, self.postgres_password, self.db_host,
+                                                 self.postgres_port, self.postgres_name)
+        elif self.db_type == 'scylla':
+            from stock_service.scylla_connector import ScyllaConnector
+            return ScyllaConnector.init_schema(self.scylla_nodes)
+        else:
+            raise ValueError("Invalid database")
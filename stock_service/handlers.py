@@ -0,0 +1,143 @@
+import os
+from decimal import Decimal, InvalidOperation
+
+from markupsafe import escape
+
+from common.bulk import parse_bulk_request
+from common.handlers import HttpError, flatten
+from stock_service.connector import AlreadyShardedError, InsufficientStockError, ItemNotFoundError, \
+    StockContentionError, items_in_order
+
+# Maximum number of items a single /stock/find_many request may ask for.
+find_many_limit = int(os.getenv('STOCK_FIND_MANY_LIMIT', '1000'))
+
+
+async def find_item(connector, item_id):
+    """Returns the item.
+
+    :param item_id: the id of the item
+    :return: the number of the item in stock
+    """
+    try:
+        item = await connector.get_item(escape(item_id))
+    except ValueError:
+        raise HttpError(404)
+    return {
+        "item_id": item.id,
+        "stock": item.in_stock,
+        "price": item.price
+    }
+
+
+async def find_items(connector, item_ids):
+    """Returns several items at once.
+
+    :param item_ids: the request body, a JSON list of item ids
+    :return: JSON list with the item_id, stock and price of every item that exists, in the order asked for
+    """
+    if not isinstance(item_ids, list) or len(item_ids) > find_many_limit or \
+            not all(isinstance(item_id, str) for item_id in item_ids):
+        raise HttpError(400)
+    return items_in_order(item_ids, await connector.get_items(item_ids))
+
+
+async def subtract_amount(writer, item_id, number):
+    """Subtracts the given number from the item count.
+
+    :param writer: the connector, or the coalescer that writes through it
+    :param item_id: the id of the item
+    :param number: the number to subtract from stock
+    :return: the number of the item in stock
+    """
+    try:
+        return str(await writer.subtract_amount(item_id, number))
+    except AssertionError:
+        raise HttpError(400)
+    except ValueError:
+        raise HttpError(404)
+    except StockContentionError:
+        raise HttpError(503)
+
+
+async def subtract_batch(connector, amounts):
+    """Subtracts the given numbers from the counts of several items, all or nothing.
+
+    :param amounts: the request body, a JSON list of [item_id, number] pairs
+    :return: the remaining stock per item, or the id of the item that failed
+    """
+    if not isinstance(amounts, list) or \
+            not all(isinstance(pair, list) and len(pair) == 2 and type(pair[1]) is int and pair[1] >= 0
+                    for pair in amounts):
+        raise HttpError(400)
+
+    try:
+        return {"stock": await connector.subtract_batch(amounts)}
+    except InsufficientStockError as error:
+        return {"item_id": str(error.item_id)}, 400
+    except ItemNotFoundError as error:
+        return {"item_id": str(error.item_id)}, 404
+    except StockContentionError as error:
+        return {"item_id": str(error.item_id)}, 503
+
+
+async def add_amount(writer, item_id, number):
+    """Adds the given number to the item count.
+
+    :param writer: the connector, or the coalescer that writes through it
+    :param item_id: the id of the item
+    :param number: the number to add to stock
+    :return: the number of the item in stock
+    """
+    try:
+        return str(await writer.add_amount(item_id, number))
+    except ValueError:
+        raise HttpError(404)
+    except StockContentionError:
+        raise HttpError(503)
+
+
+async def shard_item(connector, item_id, shards):
+    """Splits the stock of a hot item over the given number of shards, so concurrent changes of the item
+    are written to different rows.
+
+    :param item_id: the id of the item
+    :param shards: the number of shards, at least 2
+    :return: the id of the item and its number of shards
+    """
+    if shards < 2:
+        raise HttpError(400)
+    try:
+        await connector.shard_item(item_id, shards)
+    except AlreadyShardedError:
+        raise HttpError(409)
+    except ValueError:
+        raise HttpError(404)
+    except StockContentionError:
+        raise HttpError(503)
+    return {"item_id": item_id, "shards": shards}
+
+
+async def create_items(connector, count, price, stock):
+    """Creates the given number of items with the given price and stock.
+
+    :return: a JSON list of the ids of the created items
+    """
+    try:
+        price = parse_bulk_request(count, price)
+    except ValueError as error:
+        raise HttpError(400, error.args[0])
+    return [str(item_id) for item_id in await flatten(connector.create_items(count, price, stock))]
+
+
+async def create_item(connector, price):
+    """Creates an item with the specified price.
+
+    :return: the id of the created item
+    """
+    try:
+        price = Decimal(price)
+        if price < 0:
+            raise HttpError(404)
+    except InvalidOperation:
+        raise HttpError(404)
+    return {"item_id": await connector.create_item(price)}
@@ -0,0 +1,35 @@
+"""Creates items with a price and stock directly in the database of the stock service, for seeding benchmarks.
+Postgres rows are written with COPY and ScyllaDB rows with concurrent inserts, BULK_CHUNK_SIZE at a time. The ids
+of the created items are written to standard output, one per line. Inside the stock service image, with the
+environment of the service:
+
+    python load_items.py --count 1000000 --price 10 --stock 100 > item_ids.txt
+"""
+import argparse
+import os
+import sys
+from decimal import Decimal
+from time import perf_counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from stock_service.connector import ConnectorFactory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, required=True)
+    parser.add_argument('--price', type=Decimal, required=True)
+    parser.add_argument('--stock', type=int, default=0)
+    args = parser.parse_args()
+
+    start = perf_counter()
+    created = 0
+    for item_ids in ConnectorFactory().get_connector().create_items(args.count, args.price, args.stock):
+        sys.stdout.write(''.join(f"{item_id}\n" for item_id in item_ids))
+        created += len(item_ids)
+        print(f"created {created} items in {perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
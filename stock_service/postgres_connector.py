@@ -0,0 +1,378 @@
+import os
+import random
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from common.bulk import chunk_sizes, copy_rows
+from common.migrations import ensure_schema, init_postgres
+from stock_service.connector import AlreadyShardedError, InsufficientStockError, ItemNotFoundError, \
+    apply_deltas_one_by_one, decide_deltas, net_change, parse_amounts, parse_item_ids, split_stock
+from stock_service.postgres_stock_item import Base, PostgresStockItem
+
+# Connections kept open per worker, and opened on top of those under load. The gunicorn configuration
+# sizes the concurrent requests per worker to match.
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+# The changes of an item row only apply to unsharded items. The subqueries on stock_item see the table as it was
+# before the update, so they tell a missing item, a sharded item and an item without enough stock apart in the
+# same round trip.
+ADD_QUERY = text("""
+    WITH updated AS (
+        UPDATE stock_item SET in_stock = in_stock + :number
+        WHERE id = :item_id AND shards = 1
+        RETURNING in_stock
+    )
+    SELECT (SELECT in_stock FROM updated) AS in_stock,
+           (SELECT shards FROM stock_item WHERE id = :item_id) AS shards
+""")
+SUBTRACT_QUERY = text("""
+    WITH updated AS (
+        UPDATE stock_item SET in_stock = in_stock - :number
+        WHERE id = :item_id AND shards = 1 AND in_stock >= :number
+        RETURNING in_stock
+    )
+    SELECT (SELECT in_stock FROM updated) AS in_stock,
+           (SELECT shards FROM stock_item WHERE id = :item_id) AS shards
+""")
+# Applies the net change of several changes when the count is at least :required, so none of them is refused.
+NET_CHANGE_QUERY = text("""
+    WITH updated AS (
+        UPDATE stock_item SET in_stock = in_stock + :number
+        WHERE id = :item_id AND shards = 1 AND in_stock >= :required
+        RETURNING in_stock
+    )
+    SELECT (SELECT in_stock FROM updated) AS in_stock,
+           (SELECT shards FROM stock_item WHERE id = :item_id) AS shards
+""")
+SELECT_ITEM_QUERY = text("""
+    SELECT i.id, i.price,
+           CASE WHEN i.shards > 1
+                THEN (SELECT COALESCE(SUM(s.in_stock), 0) FROM stock_item_shard s WHERE s.item_id = i.id)
+                ELSE i.in_stock END AS in_stock
+    FROM stock_item i WHERE i.id = :item_id
+""")
+SELECT_ITEMS_QUERY = text("""
+    SELECT i.id, i.price,
+           CASE WHEN i.shards > 1
+                THEN (SELECT COALESCE(SUM(s.in_stock), 0) FROM stock_item_shard s WHERE s.item_id = i.id)
+                ELSE i.in_stock END AS in_stock
+    FROM stock_item i WHERE i.id = ANY(CAST(:item_ids AS uuid[]))
+""")
+SELECT_SHARDS_QUERY = text("SELECT shards FROM stock_item WHERE id = :item_id")
+SELECT_FOR_UPDATE_QUERY = text("SELECT in_stock, shards FROM stock_item WHERE id = :item_id FOR UPDATE")
+SET_STOCK_QUERY = text("UPDATE stock_item SET in_stock = :in_stock WHERE id = :item_id")
+
+SET_SHARDS_QUERY = text("UPDATE stock_item SET in_stock = 0, shards = :shards WHERE id = :item_id")
+SELECT_SHARDED_ITEMS_QUERY = text("SELECT id FROM stock_item WHERE shards > 1")
+INSERT_SHARD_QUERY = text(
+    "INSERT INTO stock_item_shard (item_id, shard, in_stock) VALUES (:item_id, :shard, :in_stock)")
+# The sums see the shards as they were before the update.
+ADD_SHARD_QUERY = text("""
+    WITH updated AS (
+        UPDATE stock_item_shard SET in_stock = in_stock + :number
+        WHERE item_id = :item_id AND shard = :shard
+    )
+    SELECT COALESCE(SUM(in_stock), 0) + :number AS in_stock FROM stock_item_shard WHERE item_id = :item_id
+""")
+SUBTRACT_SHARD_QUERY = text("""
+    WITH updated AS (
+        UPDATE stock_item_shard SET in_stock = in_stock - :number
+        WHERE item_id = :item_id AND shard = :shard AND in_stock >= :number
+        RETURNING in_stock
+    )
+    SELECT EXISTS (SELECT 1 FROM updated) AS applied,
+           (SELECT COALESCE(SUM(in_stock), 0) FROM stock_item_shard WHERE item_id = :item_id) AS in_stock
+""")
+LOCK_SHARDS_QUERY = text(
+    "SELECT shard, in_stock FROM stock_item_shard WHERE item_id = :item_id ORDER BY shard FOR UPDATE")
+SET_SHARD_QUERY = text("UPDATE stock_item_shard SET in_stock = :in_stock WHERE item_id = :item_id AND shard = :shard")
+
+
+def take_from_shards(conn, item_id, number):
+    """Subtracts a number from the shards of an item, taking from several shards if needed, in the
+    transaction of the given connection.
+
+    :return: the number of the item in stock, or None if the shards together hold too little
+    """
+    rows = conn.execute(LOCK_SHARDS_QUERY, item_id=item_id).fetchall()
+    in_stock = sum(row.in_stock for row in rows)
+    if in_stock < number:
+        return None
+    remaining = number
+    for row in rows:
+        take = min(row.in_stock, remaining)
+        if take:
+            conn.execute(SET_SHARD_QUERY, item_id=item_id, shard=row.shard, in_stock=row.in_stock - take)
+            remaining -= take
+    return in_stock - number
+
+
+class PostgresConnector:
+    def __init__(self, db_user, db_password, db_host, db_port, db_name):
+        """Establishes a connection to the PostgreSQL database, and checks that it has the current schema.
+        """
+        self.engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}',
+                                    convert_unicode=True, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                    pool_timeout=3)
+        self.db_session = scoped_session(sessionmaker(bind=self.engine))
+        Base.query = self.db_session.query_property()
+        Base.metadata.query = self.db_session.query_property()
+        PostgresStockItem.metadata.query = self.db_session.query_property()
+        ensure_schema(self.engine)
+        # Items are never unsharded, so the shard counts learned from the database stay valid.
+        self.sharded_items = {}
+
+    @staticmethod
+    def init_schema(db_user, db_password, db_host, db_port, db_name):
+        """Applies the migrations the PostgreSQL database does not have yet.
+
+        :return: a description of the changes
+        """
+        applied = init_postgres(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
+        return f"applied Postgres migrations {applied}"
+
+    def create_item(self, price):
+        """Creates an item with the specified price.
+
+        :param price: the price of the item
+        :return: the id of the created item
+        """
+        session = self.db_session()
+        try:
+            item = PostgresStockItem(price=price, in_stock=0)
+            session.add(item)
+            session.commit()
+            return str(item.id)
+        except Exception:
+            raise
+        finally:
+            session.close()
+
+    def create_items(self, count, price, in_stock):
+        """Creates items with the given price and stock, BULK_CHUNK_SIZE at a time with a COPY.
+
+        :param count: the number of items
+        :param price: the price of every item
+        :param in_stock: the initial stock of every item
+        :return: generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            item_ids = [uuid.uuid4() for _ in range(size)]
+            copy_rows(self.engine, 'stock_item', ['id', 'price', 'in_stock'],
+                      [(item_id, price, in_stock) for item_id in item_ids])
+            yield item_ids
+
+    def get_item(self, item_id):
+        """Retrieves the item from the database by its id.
+
+        :param item_id: the id of the item
+        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
+        :return: the item row with id, price and in_stock, which is summed over the shards of a sharded item
+        """
+        try:
+            with self.engine.connect() as conn:
+                item = conn.execute(SELECT_ITEM_QUERY, item_id=item_id).first()
+        except DataError:
+            raise ValueError(f"Item id {item_id} is not a valid id")
+        if item is None:
+            raise ValueError(f"Item with id {item_id} not found")
+        return item
+
+    def get_items(self, item_ids):
+        """Retrieves several items from the database with a single query.
+
+        :param item_ids: list of item ids
+        :return: the rows of the items that exist, in no particular order, with id, price and in_stock
+        """
+        item_ids = [str(item_id) for item_id in parse_item_ids(item_ids)]
+        if not item_ids:
+            return []
+        with self.engine.connect() as conn:
+            return conn.execute(SELECT_ITEMS_QUERY, item_ids=item_ids).fetchall()
+
+    def update_item(self, query, item_id, number, **params):
+        """Runs a stock change on an item row that only applies to unsharded items.
+
+        The shards returned with the change are read from the snapshot the statement started with. A change that
+        waited for a concurrent shard_item finds the item sharded and does not apply, while that snapshot still
+        shows it unsharded, so the shards of an item whose change did not apply are read again.
+
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :return: the number of the item in stock, None if the change did not apply, and the shards of the item
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(query, item_id=item_id, number=number, **params).first()
+                in_stock, shards = row.in_stock, row.shards
+                if in_stock is None and shards == 1:
+                    shards = conn.execute(SELECT_SHARDS_QUERY, item_id=item_id).scalar()
+        except DataError:
+            raise ValueError(f"Item id {item_id} is not a valid id")
+        if shards is None:
+            raise ValueError(f"Item with id {item_id} not found")
+        if shards > 1:
+            self.sharded_items[str(item_id)] = shards
+        return in_stock, shards
+
+    def add_amount(self, item_id, number):
+        """Adds the given number to the item count.
+
+        :param item_id: the id of the item
+        :param number: the number to add to stock
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :return: the number of the item in stock
+        """
+        if str(item_id) not in self.sharded_items:
+            in_stock, shards = self.update_item(ADD_QUERY, item_id, number)
+            if shards == 1:
+                return in_stock
+        with self.engine.begin() as conn:
+            return conn.execute(ADD_SHARD_QUERY, item_id=item_id, number=number,
+                                shard=random.randrange(self.sharded_items[str(item_id)])).scalar()
+
+    def subtract_amount(self, item_id, number):
+        """Subtracts the given number from the item count.
+
+        :param item_id: the id of the item
+        :param number: the number to subtract from stock
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AssertionError: if the item count after subtraction is negative
+        :return: the number of the item in stock
+        """
+        if str(item_id) not in self.sharded_items:
+            in_stock, shards = self.update_item(SUBTRACT_QUERY, item_id, number)
+            if shards == 1:
+                assert in_stock is not None, 'Item count cannot be negative'
+                return in_stock
+        with self.engine.begin() as conn:
+            row = conn.execute(SUBTRACT_SHARD_QUERY, item_id=item_id, number=number,
+                               shard=random.randrange(self.sharded_items[str(item_id)])).first()
+            if row.applied:
+                return row.in_stock - number
+            # The random shard holds too little, so take from all shards.
+            in_stock = take_from_shards(conn, item_id, number)
+        assert in_stock is not None, 'Item count cannot be negative'
+        return in_stock
+
+    def apply_deltas(self, item_id, deltas):
+        """Applies several changes to the item count in order. Their net change is written with a single
+        conditional statement when the count suffices for all of them; only when some of them are refused is
+        the item row locked to decide which. The changes to a sharded item are applied one by one.
+
+        :param item_id: the id of the item
+        :param deltas: the numbers to add to stock, negative to subtract
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :return: the count right after every change, None for changes refused because of insufficient stock
+        """
+        if str(item_id) not in self.sharded_items:
+            net, required = net_change(deltas)
+            in_stock, shards = self.update_item(NET_CHANGE_QUERY, item_id, net, required=required)
+            if shards == 1 and in_stock is not None:
+                return decide_deltas(in_stock - net, deltas)[0]
+            if shards == 1:
+                results = self.apply_deltas_locked(item_id, deltas)
+                if results is not None:
+                    return results
+        return apply_deltas_one_by_one(self, item_id, deltas)
+
+    def apply_deltas_locked(self, item_id, deltas):
+        """Applies several changes to the count of an unsharded item in order in one transaction that locks the
+        item row, refusing the ones the count does not suffice for.
+
+        :return: the count right after every change, None for refused changes, or None instead of the list if
+        the item has been sharded
+        """
+        with self.engine.begin() as conn:
+            row = conn.execute(SELECT_FOR_UPDATE_QUERY, item_id=item_id).first()
+            if row.shards > 1:
+                self.sharded_items[str(item_id)] = row.shards
+                return None
+            results, in_stock = decide_deltas(row.in_stock, deltas)
+            if in_stock != row.in_stock:
+                conn.execute(SET_STOCK_QUERY, item_id=item_id, in_stock=in_stock)
+            return results
+
+    def subtract_batch(self, amounts):
+        """Subtracts the given numbers from the counts of several items in one transaction, all or nothing.
+
+        The rows are locked in id order so concurrent batches cannot deadlock.
+
+        :param amounts: list of (item_id, number) pairs
+        :raises InsufficientStockError: if the count of an item would become negative
+        :raises ItemNotFoundError: if an item does not exist
+        :return: dict mapping the item ids to their remaining stock
+        """
+        merged = parse_amounts(amounts)
+        session = self.db_session()
+        try:
+            items = session.query(PostgresStockItem) \
+                .filter(PostgresStockItem.id.in_(list(merged))) \
+                .order_by(PostgresStockItem.id) \
+                .with_for_update() \
+                .all()
+
+            found = {item.id: item for item in items}
+            stock = {}
+            for item_id, number in sorted(merged.items()):
+                if item_id not in found:
+                    raise ItemNotFoundError(item_id)
+                if found[item_id].shards > 1:
+                    stock[item_id] = take_from_shards(session.connection(), str(item_id), number)
+                    if stock[item_id] is None:
+                        raise InsufficientStockError(item_id)
+                    continue
+                if found[item_id].in_stock - number < 0:
+                    raise InsufficientStockError(item_id)
+                found[item_id].in_stock = found[item_id].in_stock - number
+                stock[item_id] = found[item_id].in_stock
+            session.commit()
+            return {str(item_id): in_stock for item_id, in_stock in stock.items()}
+        except Exception:
+            raise
+        finally:
+            session.close()
+
+    def shard_item(self, item_id, shards):
+        """Splits the count of an item over the given number of shard rows, so that concurrent changes of the
+        item lock different rows.
+
+        :param item_id: the id of the item
+        :param shards: the number of shards, at least 2
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AlreadyShardedError: if the item is already sharded
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(SELECT_FOR_UPDATE_QUERY, item_id=item_id).first()
+                if row is None:
+                    raise ValueError(f"Item with id {item_id} not found")
+                if row.shards > 1:
+                    raise AlreadyShardedError(item_id)
+                conn.execute(INSERT_SHARD_QUERY, [{'item_id': item_id, 'shard': shard, 'in_stock': in_stock}
+                                                  for shard, in_stock in enumerate(split_stock(row.in_stock, shards))])
+                conn.execute(SET_SHARDS_QUERY, item_id=item_id, shards=shards)
+        except DataError:
+            raise ValueError(f"Item id {item_id} is not a valid id")
+        self.sharded_items[str(item_id)] = shards
+
+    def sharded_item_ids(self):
+        """Returns the ids of the sharded items."""
+        with self.engine.connect() as conn:
+            return [row.id for row in conn.execute(SELECT_SHARDED_ITEMS_QUERY)]
+
+    def rebalance(self, item_id):
+        """Spreads the count of a sharded item evenly over its shards in one transaction, so subtractions keep
+        finding a shard that holds enough.
+
+        :param item_id: the id of the item
+        """
+        with self.engine.begin() as conn:
+            rows = conn.execute(LOCK_SHARDS_QUERY, item_id=item_id).fetchall()
+            targets = split_stock(sum(row.in_stock for row in rows), len(rows))
+            for row, target in zip(rows, targets):
+                if row.in_stock != target:
+                    conn.execute(SET_SHARD_QUERY, item_id=item_id, shard=row.shard, in_stock=target)
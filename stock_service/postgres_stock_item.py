@@ -1,7 +1,7 @@
 import uuid
 
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, BigInteger, Numeric
+from sqlalchemy import Column, BigInteger, Integer, Numeric
 from sqlalchemy.dialects.postgresql import UUID
 
 Base = declarative_base()
@@ -13,6 +13,7 @@ class PostgresStockItem(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True, nullable=False)
     price = Column(Numeric, nullable=False)
     in_stock = Column(BigInteger, nullable=False)
+    shards = Column(Integer, nullable=False, default=1, server_default='1')
 
     def __init__(self, price, in_stock):
         self.price = price
@@ -0,0 +1,18 @@
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, BigInteger, Integer
+from sqlalchemy.dialects.postgresql import UUID
+
+Base_stock_item_shard = declarative_base()
+
+
+class PostgresStockItemShard(Base_stock_item_shard):
+    __tablename__ = 'stock_item_shard'
+
+    item_id = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    shard = Column(Integer, primary_key=True, nullable=False)
+    in_stock = Column(BigInteger, nullable=False)
+
+    def __init__(self, item_id, shard, in_stock):
+        self.item_id = item_id
+        self.shard = shard
+        self.in_stock = in_stock
@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import threading
+from time import sleep
+
+logger = logging.getLogger(__name__)
+
+
+def start_rebalancer(connector, interval):
+    """Starts a daemon thread that evens out the shards of every sharded item every interval seconds.
+
+    :param connector: the stock connector
+    :param interval: the time in seconds between two rounds
+    :return: the started thread
+    """
+    def run():
+        while True:
+            sleep(interval)
+            try:
+                for item_id in connector.sharded_item_ids():
+                    connector.rebalance(item_id)
+            except Exception:
+                logger.exception("Rebalancing the stock shards failed")
+
+    thread = threading.Thread(target=run, name='stock-rebalancer', daemon=True)
+    thread.start()
+    return thread
+
+
+async def rebalance_periodically(connector, interval):
+    """Evens out the shards of every sharded item every interval seconds, as the thread of start_rebalancer
+    does, for the connector of the ASGI application. Runs until it is cancelled.
+
+    :param connector: the async stock connector
+    :param interval: the time in seconds between two rounds
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for item_id in await connector.sharded_item_ids():
+                await connector.rebalance(item_id)
+        except Exception:
+            logger.exception("Rebalancing the stock shards failed")
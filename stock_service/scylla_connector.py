@@ -0,0 +1,351 @@
+import os
+import random
+import uuid
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from common.bulk import BULK_CONCURRENCY, chunk_sizes
+from common.ids import to_uuid
+from common.scylla import create_tables, ensure_tables, get_session
+from stock_service.connector import AlreadyShardedError, InsufficientStockError, ItemNotFoundError, \
+    StockContentionError, apply_deltas_one_by_one, decide_deltas, parse_amounts, parse_item_ids, split_stock, \
+    undo_changes
+from stock_service.scylla_sharded_item import ScyllaShardedItem
+from stock_service.scylla_stock_item import ScyllaStockItem
+from stock_service.scylla_stock_item_shard import ScyllaStockItemShard
+
+
+MAX_STOCK_UPDATE_ATTEMPTS = int(os.getenv('STOCK_UPDATE_ATTEMPTS', '20'))
+# Item partitions read in parallel by a multi-get.
+FIND_MANY_CONCURRENCY = 100
+
+
+class ScyllaConnector:
+    SERVICE = 'stock'
+    TABLES = [ScyllaStockItem, ScyllaStockItemShard, ScyllaShardedItem]
+
+    def __init__(self, nodes):
+        """Establishes a connection to the ScyllaDB database and checks that the tables in TABLES match their
+        models, creating or updating them unless SCHEMA_AUTO_MIGRATE is "false".
+        """
+        self.session = get_session(nodes)
+        ensure_tables(self.session, self.SERVICE, self.TABLES)
+
+        self.insert_item = self.session.prepare(
+            "INSERT INTO wdm.scylla_stock_item (id, price, in_stock, shards) VALUES (?, ?, 0, 1)")
+        self.insert_item_with_stock = self.session.prepare(
+            "INSERT INTO wdm.scylla_stock_item (id, price, in_stock, shards) VALUES (?, ?, ?, 1)")
+        self.select_item = self.session.prepare(
+            "SELECT id, price, in_stock, shards FROM wdm.scylla_stock_item WHERE id = ?")
+        self.select_item.is_idempotent = True
+        self.update_in_stock = self.session.prepare(
+            "UPDATE wdm.scylla_stock_item SET in_stock = ? WHERE id = ? IF in_stock = ?")
+
+        self.set_shards = self.session.prepare(
+            "UPDATE wdm.scylla_stock_item SET shards = ?, in_stock = null WHERE id = ? IF in_stock = ?")
+        self.insert_empty_shard = self.session.prepare(
+            "INSERT INTO wdm.scylla_stock_item_shard (item_id, shard, in_stock) VALUES (?, ?, 0) IF NOT EXISTS")
+        self.select_shard = self.session.prepare(
+            "SELECT in_stock FROM wdm.scylla_stock_item_shard WHERE item_id = ? AND shard = ?")
+        self.select_shard.is_idempotent = True
+        self.update_shard = self.session.prepare(
+            "UPDATE wdm.scylla_stock_item_shard SET in_stock = ? WHERE item_id = ? AND shard = ? IF in_stock = ?")
+        self.insert_sharded_item = self.session.prepare(
+            "INSERT INTO wdm.scylla_sharded_item (bucket, item_id) VALUES (0, ?)")
+        self.select_sharded_items = self.session.prepare(
+            "SELECT item_id FROM wdm.scylla_sharded_item WHERE bucket = 0")
+
+    @classmethod
+    def init_schema(cls, nodes):
+        """Creates the "wdm" keyspace and creates or updates the tables in TABLES.
+
+        :return: a description of the changes
+        """
+        changed = create_tables(get_session(nodes), cls.SERVICE, cls.TABLES)
+        return "created or updated the Scylla tables" if changed else "the Scylla tables are up to date"
+
+    def create_item(self, price):
+        """Creates an item with the specified price.
+
+        :param price: the price of the item
+        :return: the id of the created item
+        """
+        item_id = uuid.uuid4()
+        self.session.execute(self.insert_item, (item_id, price))
+        return item_id
+
+    def create_items(self, count, price, in_stock):
+        """Creates items with the given price and stock, BULK_CHUNK_SIZE at a time with concurrent inserts.
+
+        :param count: the number of items
+        :param price: the price of every item
+        :param in_stock: the initial stock of every item
+        :return: generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            item_ids = [uuid.uuid4() for _ in range(size)]
+            execute_concurrent_with_args(self.session, self.insert_item_with_stock,
+                                         [(item_id, price, in_stock) for item_id in item_ids],
+                                         concurrency=BULK_CONCURRENCY, raise_on_first_error=True)
+            yield item_ids
+
+    def read_item(self, item_id):
+        """Reads the item row, whose in_stock is None if the item is sharded.
+
+        :param item_id: the id of the item
+        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
+        :return: the item row with id, price, in_stock and shards
+        """
+        item = self.session.execute(self.select_item, (to_uuid(item_id, 'Item'),)).one()
+        if item is None:
+            raise ValueError(f"Item with id {item_id} not found")
+        return item
+
+    def get_item(self, item_id):
+        """Retrieves the item from the database by its id.
+
+        :param item_id: the id of the item
+        :raises ValueError: if the item with item_id does not exist or if the format of the item_id is invalid
+        :return: the item row with id, price and in_stock, which is summed over the shards of a sharded item
+        """
+        item = self.read_item(item_id)
+        if (item.shards or 1) > 1:
+            return item._replace(in_stock=self.sharded_in_stock(item.id, item.shards))
+        return item
+
+    def get_items(self, item_ids):
+        """Retrieves several items, reading their partitions concurrently.
+
+        :param item_ids: list of item ids
+        :return: the rows of the items that exist, in no particular order, with id, price and in_stock
+        """
+        results = execute_concurrent_with_args(self.session, self.select_item,
+                                               [(item_id,) for item_id in parse_item_ids(item_ids)],
+                                               concurrency=FIND_MANY_CONCURRENCY, raise_on_first_error=True)
+        items = [result.result_or_exc.one() for result in results]
+        return [item._replace(in_stock=self.sharded_in_stock(item.id, item.shards)) if (item.shards or 1) > 1
+                else item for item in items if item is not None]
+
+    def update_amount(self, item_id, delta):
+        """Changes the item count with a conditional write on the count that was read, retried with the count
+        the write conflicted with.
+
+        :param item_id: the id of the item
+        :param delta: the number to add to stock, negative to subtract
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AssertionError: if the item count after the change is negative
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        :return: the number of the item in stock
+        """
+        item = self.read_item(item_id)
+        in_stock = item.in_stock
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            if in_stock is None:
+                # The item is sharded, possibly since it was read.
+                return self.update_sharded_amount(item if item.in_stock is None else self.read_item(item_id), delta)
+            assert in_stock + delta >= 0, 'Item count cannot be negative'
+            result = self.session.execute(self.update_in_stock, (in_stock + delta, item.id, in_stock))
+            if result.was_applied:
+                return in_stock + delta
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    def add_amount(self, item_id, number):
+        """Adds the given number to the item count.
+
+        :param item_id: the id of the item
+        :param number: the number to add to stock
+        :return: the number of the item in stock
+        """
+        return self.update_amount(item_id, number)
+
+    def apply_deltas(self, item_id, deltas):
+        """Applies several changes to the item count in order with one conditional write, retried with the
+        count the write conflicted with. The changes to a sharded item are applied one by one.
+
+        :param item_id: the id of the item
+        :param deltas: the numbers to add to stock, negative to subtract
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        :return: the count right after every change, None for changes refused because of insufficient stock
+        """
+        item = self.read_item(item_id)
+        in_stock = item.in_stock
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            if in_stock is None:
+                return apply_deltas_one_by_one(self, item_id, deltas)
+            results, new_in_stock = decide_deltas(in_stock, deltas)
+            if new_in_stock == in_stock:
+                return results
+            result = self.session.execute(self.update_in_stock, (new_in_stock, item.id, in_stock))
+            if result.was_applied:
+                return results
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    def subtract_amount(self, item_id, number):
+        """Subtracts the given number from the item count.
+
+        :param item_id: the id of the item
+        :param number: the number to subtract from stock
+        :raises AssertionError: if the item count after subtraction is negative
+        :return: the number of the item in stock
+        """
+        return self.update_amount(item_id, -number)
+
+    def subtract_batch(self, amounts):
+        """Subtracts the given numbers from the counts of several items, all or nothing.
+
+        Items live in different partitions, so they cannot share a conditional batch. The items are
+        subtracted one by one in id order instead, and the subtractions already made are added back
+        when one of them fails. Every one of them is added back even if adding back another one fails, which
+        is logged.
+
+        :param amounts: list of (item_id, number) pairs
+        :raises InsufficientStockError: if the count of an item would become negative
+        :raises ItemNotFoundError: if an item does not exist
+        :raises StockContentionError: if an item kept changing during every attempt to update it
+        :return: dict mapping the item ids to their remaining stock
+        """
+        merged = parse_amounts(amounts)
+        stock = {}
+        try:
+            for item_id, number in sorted(merged.items()):
+                try:
+                    stock[item_id] = self.subtract_amount(item_id, number)
+                except AssertionError:
+                    raise InsufficientStockError(item_id)
+                except ValueError:
+                    raise ItemNotFoundError(item_id)
+        except Exception:
+            undo_changes(self.add_amount, [(item_id, merged[item_id]) for item_id in stock])
+            raise
+        return {str(item_id): in_stock for item_id, in_stock in stock.items()}
+
+    def shard_item(self, item_id, shards):
+        """Splits the count of an item over the given number of shards, each in a partition of its own, so
+        that concurrent changes of the item can be written to different partitions.
+
+        The shards are created empty if they do not exist yet, so the shards of an item that is sharded
+        concurrently are never overwritten. The count is only moved into them after the conditional write that
+        shards the item applied, so until then the item holds less than its count.
+
+        :param item_id: the id of the item
+        :param shards: the number of shards, at least 2
+        :raises ValueError: if the item does not exist or if the format of the item_id is invalid
+        :raises AlreadyShardedError: if the item is already sharded
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        """
+        item = self.read_item(item_id)
+        in_stock = item.in_stock
+        if in_stock is None:
+            raise AlreadyShardedError(item_id)
+        for shard in range(shards):
+            self.session.execute(self.insert_empty_shard, (item.id, shard))
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            if in_stock is None:
+                raise AlreadyShardedError(item_id)
+            result = self.session.execute(self.set_shards, (shards, item.id, in_stock))
+            if result.was_applied:
+                failed = None
+                for shard, shard_stock in enumerate(split_stock(in_stock, shards)):
+                    try:
+                        self.change_shard(item.id, shard, shard_stock)
+                    except StockContentionError as error:
+                        failed = error
+                self.session.execute(self.insert_sharded_item, (item.id,))
+                if failed is not None:
+                    raise failed
+                return
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    def sharded_item_ids(self):
+        """Returns the ids of the sharded items."""
+        return [row.item_id for row in self.session.execute(self.select_sharded_items)]
+
+    def sharded_in_stock(self, item_id, shards):
+        """Reads the shards of an item concurrently and sums their counts."""
+        futures = [self.session.execute_async(self.select_shard, (item_id, shard)) for shard in range(shards)]
+        return sum(future.result().one().in_stock for future in futures)
+
+    def change_shard(self, item_id, shard, delta, partial=False):
+        """Changes the count of a shard with a conditional write on the count that was read, retried with the
+        count the write conflicted with.
+
+        :param item_id: the id of the item
+        :param shard: the number of the shard
+        :param delta: the number to add to the shard, negative to subtract
+        :param partial: whether to subtract everything the shard holds if it holds less than asked
+        :raises StockContentionError: if every attempt conflicted with a concurrent update
+        :return: the number added to the shard, negative if subtracted, or None if the shard holds too little
+        """
+        in_stock = self.session.execute(self.select_shard, (item_id, shard)).one().in_stock
+        for _ in range(MAX_STOCK_UPDATE_ATTEMPTS):
+            change = delta
+            if in_stock + delta < 0:
+                if not partial:
+                    return None
+                change = -in_stock
+            if change == 0:
+                return 0
+            result = self.session.execute(self.update_shard, (in_stock + change, item_id, shard, in_stock))
+            if result.was_applied:
+                return change
+            in_stock = result.one().in_stock
+        raise StockContentionError(item_id)
+
+    def update_sharded_amount(self, item, delta):
+        """Changes the count of a sharded item in a random shard that holds enough, and takes from several
+        shards when none does. If they hold too little together, or taking from one fails, what was taken is
+        put back.
+
+        :param item: the item row
+        :param delta: the number to add to stock, negative to subtract
+        :raises AssertionError: if the item count after the change is negative
+        :return: the number of the item in stock
+        """
+        shards = random.sample(range(item.shards), item.shards)
+        for shard in shards:
+            if self.change_shard(item.id, shard, delta) is not None:
+                break
+        else:
+            taken = []
+            remaining = -delta
+            try:
+                for shard in shards:
+                    if remaining == 0:
+                        break
+                    change = self.change_shard(item.id, shard, -remaining, partial=True)
+                    taken.append((item.id, shard, -change))
+                    remaining += change
+            except Exception:
+                undo_changes(self.change_shard, taken)
+                raise
+            if remaining > 0:
+                undo_changes(self.change_shard, taken)
+                raise AssertionError('Item count cannot be negative')
+        return self.sharded_in_stock(item.id, item.shards)
+
+    def rebalance(self, item_id):
+        """Moves stock from the shards of an item that hold more than an even share to the ones that hold less,
+        so subtractions keep finding a shard that holds enough.
+
+        :param item_id: the id of the item
+        """
+        item = self.read_item(item_id)
+        counts = [self.session.execute(self.select_shard, (item.id, shard)).one().in_stock
+                  for shard in range(item.shards)]
+        targets = split_stock(sum(counts), item.shards)
+        surplus = [[shard, counts[shard] - target] for shard, target in enumerate(targets) if counts[shard] > target]
+        for shard, target in enumerate(targets):
+            missing = target - counts[shard]
+            while missing > 0 and surplus:
+                source = surplus[0]
+                moved = -self.change_shard(item.id, source[0], -min(missing, source[1]), partial=True)
+                if moved:
+                    self.change_shard(item.id, shard, moved)
+                missing -= moved
+                source[1] -= moved
+                if source[1] <= 0 or not moved:
+                    surplus.pop(0)
@@ -0,0 +1,7 @@
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+
+
+class ScyllaShardedItem(Model):
+    bucket = columns.Integer(partition_key=True, default=0)
+    item_id = columns.UUID(primary_key=True)
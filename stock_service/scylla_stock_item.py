@@ -8,3 +8,4 @@ class ScyllaStockItem(Model):
     id = columns.UUID(primary_key=True, default=uuid.uuid4)
     price = columns.Decimal()
     in_stock = columns.BigInt()
+    shards = columns.Integer()
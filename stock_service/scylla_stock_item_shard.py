@@ -0,0 +1,8 @@
+from cassandra.cqlengine import columns
+from cassandra.cqlengine.models import Model
+
+
+class ScyllaStockItemShard(Model):
+    item_id = columns.UUID(partition_key=True)
+    shard = columns.Integer(partition_key=True)
+    in_stock = columns.BigInt()
@@ -1,86 +1,79 @@
-from _decimal import InvalidOperation
-from decimal import Decimal
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
-from flask import Flask, abort, jsonify
-from markupsafe import escape
+from flask import Flask, jsonify, request
+from common.handlers import AwaitableCalls
+from common.worker import LazyConnector, on_worker_start, start_worker
+from common.wsgi import handler
+from stock_service import handlers
+from stock_service.coalescer import WriteCoalescer
+from stock_service.rebalancer import start_rebalancer
 from stock_service.connector import ConnectorFactory
 
 app = Flask(__name__)
 
-connector = ConnectorFactory().get_connector()
+connector = LazyConnector(ConnectorFactory().get_connector)
+app.before_first_request(start_worker)
+coalesce_window = float(os.getenv('STOCK_COALESCE_WINDOW_MS', '0')) / 1000
+coalescer = WriteCoalescer(connector, coalesce_window) if coalesce_window > 0 else None
+calls = AwaitableCalls(connector)
+stock_writer = AwaitableCalls(coalescer or connector)
+# Every worker with a positive interval runs a rebalancer, so it is off by default and enabled in a single process.
+rebalance_interval = float(os.getenv('STOCK_REBALANCE_INTERVAL_S', '0'))
+if rebalance_interval > 0:
+    on_worker_start(lambda: start_rebalancer(connector, rebalance_interval))
+
+
+@app.route('/stock/metrics', methods=['GET'])
+def metrics():
+    return jsonify({"coalescer": coalescer.stats() if coalescer else None})
 
 
 @app.route('/stock/find/<item_id>', methods=['GET'])
+@handler
 def find_item(item_id):
-    """Returns the item.
+    return handlers.find_item(calls, item_id)
 
-    :param item_id: the id of the item
-    :return: the number of the item in stock
-    """
-    try:
-        item = connector.get_item(escape(item_id))
-        response = {
-            "item_id": item.id,
-            "stock": item.in_stock,
-            "price": item.price
-        }
 
-        return jsonify(response)
-    except ValueError:
-        abort(404)
+@app.route('/stock/find_many', methods=['POST'])
+@handler
+def find_items():
+    return handlers.find_items(calls, request.get_json(silent=True))
 
 
 @app.route('/stock/subtract/<item_id>/<int:number>', methods=['POST'])
+@handler
 def subtract_amount(item_id, number):
-    """Subtracts the given number from the item count.
+    return handlers.subtract_amount(stock_writer, item_id, number)
+
 
-    :param item_id: the id of the item
-    :param number: the number to subtract from stock
-    :return: the number of the item in stock
-    """
-    try:
-        item_count = connector.subtract_amount(item_id, number)
-        return str(item_count)
-    except AssertionError:
-        abort(400)
-    except ValueError:
-        abort(404)
+@app.route('/stock/subtract_batch', methods=['POST'])
+@handler
+def subtract_batch():
+    return handlers.subtract_batch(calls, request.get_json(silent=True))
 
 
 @app.route('/stock/add/<item_id>/<int:number>', methods=['POST'])
+@handler
 def add_amount(item_id, number):
-    """Adds the given number to the item count.
+    return handlers.add_amount(stock_writer, item_id, number)
+
+
+@app.route('/stock/item/shard/<item_id>/<int:shards>', methods=['POST'])
+@handler
+def shard_item(item_id, shards):
+    return handlers.shard_item(calls, item_id, shards)
+
 
-    :param item_id: the id of the item
-    :param number: the number to add to stock
-    :return: the number of the item in stock
-    """
-    try:
-        item_count = connector.add_amount(item_id, number)
-        return str(item_count)
-    except ValueError:
-        abort(404)
+@app.route('/stock/item/create_many/<int:count>/<price>/<int:stock>', methods=['POST'])
+@handler
+def create_items(count, price, stock):
+    return handlers.create_items(calls, count, price, stock)
 
 
 @app.route('/stock/item/create/<price>', methods=['POST'])
+@handler
 def create_item(price):
-    """Creates an item with the specified price.
-
-    :return: the id of the created item
-    """
-    if Decimal(price) < 0:
-        abort(404)
-
-    try:
-        item_id = connector.create_item(Decimal(price))
-        response = {
-            "item_id": item_id,
-        }
-
-        return jsonify(response)
-    except InvalidOperation:
-        abort(404)
+    return handlers.create_item(calls, price)
@@ -14,6 +14,10 @@ class EndPoints:
     def users_create():
         return requests.post(f'{EndPoints.user_host}users/create')
 
+    @staticmethod
+    def users_create_many(count, credit):
+        return requests.post(f'{EndPoints.user_host}users/create_many/{count}/{credit}')
+
     @staticmethod
     def users_remove(user_id):
         return requests.delete(f'{EndPoints.user_host}users/remove/{user_id}')
@@ -34,10 +38,18 @@ class EndPoints:
     def stock_create(price):
         return requests.post(f'{EndPoints.stock_host}stock/item/create/{price}')
 
+    @staticmethod
+    def stock_create_many(count, price, stock):
+        return requests.post(f'{EndPoints.stock_host}stock/item/create_many/{count}/{price}/{stock}')
+
     @staticmethod
     def stock_find(item_id):
         return requests.get(f'{EndPoints.stock_host}stock/find/{item_id}')
 
+    @staticmethod
+    def stock_find_many(item_ids):
+        return requests.post(f'{EndPoints.stock_host}stock/find_many', json=item_ids)
+
     @staticmethod
     def stock_add(item_id, amount):
         return requests.post(f'{EndPoints.stock_host}stock/add/{item_id}/{amount}')
@@ -46,6 +58,14 @@ class EndPoints:
     def stock_subtract(item_id, amount):
         return requests.post(f'{EndPoints.stock_host}stock/subtract/{item_id}/{amount}')
 
+    @staticmethod
+    def stock_subtract_batch(amounts):
+        return requests.post(f'{EndPoints.stock_host}stock/subtract_batch', json=amounts)
+
+    @staticmethod
+    def stock_shard(item_id, shards):
+        return requests.post(f'{EndPoints.stock_host}stock/item/shard/{item_id}/{shards}')
+
     @staticmethod
     def orders_create(user_id):
         return requests.post(f'{EndPoints.order_host}orders/create/{user_id}')
@@ -54,6 +74,10 @@ class EndPoints:
     def orders_remove(order_id):
         return requests.delete(f'{EndPoints.order_host}orders/remove/{order_id}')
 
+    @staticmethod
+    def orders_delete_by_user(user_id):
+        return requests.delete(f'{EndPoints.order_host}orders/deleteByUser/{user_id}')
+
     @staticmethod
     def orders_find(order_id):
         return requests.get(f'{EndPoints.order_host}orders/find/{order_id}')
@@ -70,6 +94,10 @@ class EndPoints:
     def orders_remove_item(order_id, item_id):
         return requests.delete(f'{EndPoints.order_host}orders/removeItem/{order_id}/{item_id}')
 
+    @staticmethod
+    def orders_metrics():
+        return requests.get(f'{EndPoints.order_host}orders/metrics')
+
     @staticmethod
     def orders_checkout(order_id):
         return requests.post(f'{EndPoints.order_host}orders/checkout/{order_id}')
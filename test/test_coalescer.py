@@ -0,0 +1,83 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from stock_service.coalescer import WriteCoalescer
+from stock_service.connector import decide_deltas
+
+
+class RecordingConnector:
+    """Applies the batches of a WriteCoalescer to an in-memory count and records them."""
+
+    def __init__(self, in_stock, error=None):
+        self.in_stock = in_stock
+        self.error = error
+        self.batches = []
+
+    def apply_deltas(self, item_id, deltas):
+        self.batches.append(list(deltas))
+        if self.error is not None:
+            raise self.error
+        results, self.in_stock = decide_deltas(self.in_stock, deltas)
+        return results
+
+
+class TestWriteCoalescer(unittest.TestCase):
+    def submit_concurrently(self, coalescer, deltas):
+        """Submits the changes of an item at the same time and returns the counts or errors they got."""
+        barrier = threading.Barrier(len(deltas))
+
+        def submit(delta):
+            barrier.wait()
+            try:
+                return coalescer.submit('item', delta)
+            except Exception as error:
+                return error
+
+        with ThreadPoolExecutor(max_workers=len(deltas)) as pool:
+            return list(pool.map(submit, deltas))
+
+    def test_concurrent_changes_share_a_write(self):
+        connector = RecordingConnector(10)
+        coalescer = WriteCoalescer(connector, window=0.2)
+
+        results = self.submit_concurrently(coalescer, [-1] * 5)
+
+        self.assertEqual(len(connector.batches), 1)
+        self.assertCountEqual(results, [9, 8, 7, 6, 5])
+        self.assertEqual(connector.in_stock, 5)
+        stats = coalescer.stats()
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['max_batch_size'], 5)
+
+    def test_changes_are_refused_in_arrival_order(self):
+        connector = RecordingConnector(2)
+        coalescer = WriteCoalescer(connector, window=0.2)
+
+        results = self.submit_concurrently(coalescer, [-1] * 4)
+
+        self.assertEqual(len([result for result in results if isinstance(result, AssertionError)]), 2)
+        self.assertCountEqual([result for result in results if not isinstance(result, AssertionError)], [1, 0])
+        self.assertEqual(connector.in_stock, 0)
+
+    def test_failed_write_fails_every_change_of_the_batch(self):
+        connector = RecordingConnector(10, error=ValueError("Item with id item not found"))
+        coalescer = WriteCoalescer(connector, window=0.2)
+
+        results = self.submit_concurrently(coalescer, [-1, 2, -3])
+
+        self.assertEqual(len(connector.batches), 1)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+
+    def test_later_changes_start_a_new_batch(self):
+        connector = RecordingConnector(10)
+        coalescer = WriteCoalescer(connector, window=0.01)
+
+        self.assertEqual(coalescer.add_amount('item', 1), 11)
+        self.assertEqual(coalescer.subtract_amount('item', 2), 9)
+        self.assertEqual(connector.batches, [[1], [-2]])
+
+
+if __name__ == '__main__':
+    unittest.main()
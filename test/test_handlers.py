@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from common.handlers import AwaitableCalls, flatten, response_parts, run_sync
+
+
+class BlockingConnector:
+    def get(self, key):
+        return f"value of {key}"
+
+    def create_many(self, count):
+        for start in range(0, count, 2):
+            yield list(range(start, min(start + 2, count)))
+
+
+class TestHandlers(unittest.TestCase):
+    def test_blocking_calls_run_synchronously(self):
+        connector = AwaitableCalls(BlockingConnector())
+
+        async def handle():
+            return await connector.get('a'), await flatten(connector.create_many(3))
+
+        self.assertEqual(run_sync(handle()), ('value of a', [0, 1, 2]))
+
+    def test_suspending_handler_is_refused(self):
+        with self.assertRaises(RuntimeError):
+            run_sync(asyncio.sleep(0.01))
+
+    def test_asynchronous_chunks_are_flattened(self):
+        async def chunks():
+            yield [1, 2]
+            yield [3]
+
+        self.assertEqual(asyncio.run(flatten(chunks())), [1, 2, 3])
+
+    def test_response_parts(self):
+        def jsonify(body):
+            return ('json', body)
+
+        self.assertEqual(response_parts({'a': 1}, jsonify), (('json', {'a': 1}), 200))
+        self.assertEqual(response_parts(({'item_id': 'x'}, 400), jsonify), (('json', {'item_id': 'x'}), 400))
+        self.assertEqual(response_parts('5', jsonify), ('5', 200))
+
+
+if __name__ == '__main__':
+    unittest.main()
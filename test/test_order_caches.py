@@ -0,0 +1,111 @@
+import os
+import unittest
+from decimal import Decimal
+from time import sleep
+from unittest import mock
+from uuid import uuid4
+
+from order_service.price_cache import PriceCache
+from order_service.user_cache import UserCache
+
+
+class TestPriceCache(unittest.TestCase):
+    def setUp(self) -> None:
+        with mock.patch.dict(os.environ, {'PRICE_CACHE_SIZE': '10', 'PRICE_CACHE_NEGATIVE_TTL_S': '0.05'}):
+            os.environ.pop('PRICE_CACHE_SERVER', None)
+            self.cache = PriceCache()
+        self.loads = []
+
+    def load(self, item_id):
+        self.loads.append(item_id)
+        return Decimal('20')
+
+    def test_second_lookup_is_a_hit(self):
+        item_id = str(uuid4())
+        before = self.cache.stats()
+
+        self.assertEqual(self.cache.get(item_id, self.load), Decimal('20'))
+        after_miss = self.cache.stats()
+        self.assertEqual(self.cache.get(item_id, self.load), Decimal('20'))
+        after_hit = self.cache.stats()
+
+        self.assertEqual(self.loads, [item_id])
+        self.assertEqual(after_miss['misses'], before['misses'] + 1)
+        self.assertEqual(after_miss['loads'], before['loads'] + 1)
+        self.assertEqual(after_hit['hits'], after_miss['hits'] + 1)
+        self.assertEqual(after_hit['misses'], after_miss['misses'])
+        self.assertEqual(after_hit['hit_ratio'], 0.5)
+
+    def test_missing_item_is_remembered_briefly(self):
+        item_id = str(uuid4())
+
+        with self.assertRaises(ValueError):
+            self.cache.get(item_id, lambda _: None)
+        with self.assertRaises(ValueError):
+            self.cache.get(item_id, self.load)
+        self.assertEqual(self.cache.stats()['negative_hits'], 1)
+
+        sleep(0.1)
+        self.assertEqual(self.cache.get(item_id, self.load), Decimal('20'))
+        self.assertEqual(self.loads, [item_id])
+
+
+class TestUserCache(unittest.TestCase):
+    def create_cache(self, mode='cached', ttl='60'):
+        with mock.patch.dict(os.environ, {'USER_CHECK_MODE': mode, 'USER_CACHE_TTL_S': ttl, 'USER_CACHE_SIZE': '10'}):
+            return UserCache()
+
+    def test_known_user_is_a_hit(self):
+        cache = self.create_cache()
+        user_id = str(uuid4())
+        before = cache.stats()
+
+        self.assertTrue(cache.exists(user_id, lambda _: True))
+        self.assertTrue(cache.exists(user_id, lambda _: self.fail('a known user is checked again')))
+        after = cache.stats()
+
+        self.assertEqual(after['misses'], before['misses'] + 1)
+        self.assertEqual(after['hits'], before['hits'] + 1)
+
+    def test_forgotten_user_is_refused(self):
+        cache = self.create_cache()
+        user_id = str(uuid4())
+        self.assertTrue(cache.exists(user_id, lambda _: True))
+
+        cache.forget(user_id)
+
+        self.assertFalse(cache.exists(user_id, lambda _: False))
+
+    def test_user_is_checked_again_after_ttl(self):
+        cache = self.create_cache(ttl='0.05')
+        user_id = str(uuid4())
+        self.assertTrue(cache.exists(user_id, lambda _: True))
+
+        sleep(0.1)
+
+        self.assertFalse(cache.exists(user_id, lambda _: False))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_caching_is_opt_in(self):
+        with mock.patch.dict(os.environ):
+            for variable in ['USER_CHECK_MODE', 'USER_CACHE_TTL_S']:
+                os.environ.pop(variable, None)
+            cache = UserCache()
+
+        self.assertEqual(cache.stats()['mode'], 'strict')
+        self.assertEqual(cache.stats()['ttl_s'], 5)
+
+    def test_strict_mode_checks_every_time(self):
+        cache = self.create_cache(mode='strict')
+        user_id = str(uuid4())
+        checks = []
+
+        for _ in range(2):
+            self.assertTrue(cache.exists(user_id, lambda checked: checks.append(checked) or True))
+
+        self.assertEqual(len(checks), 2)
+        self.assertEqual(cache.stats()['hits'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
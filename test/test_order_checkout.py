@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+
+from common.handlers import CallError, HttpError, Reply, run_sync
+from order_service import handlers
+
+
+class ScriptedClient:
+    """Answers the calls of the order handlers with scripted replies, repeating the last one, and records them."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.calls = []
+
+    async def post(self, url, **kwargs):
+        path = url.split('/', 3)[3]
+        self.calls.append(path)
+        replies = self.replies[path.split('/')[1]]
+        reply = replies.pop(0) if len(replies) > 1 else replies[0]
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    @staticmethod
+    async def sleep(seconds):
+        pass
+
+    @staticmethod
+    async def map(limit, func, calls):
+        return [run_sync(func(*args)) for args in calls]
+
+
+class FakeConnector:
+    def __init__(self, set_paid_error=None):
+        self.set_paid_error = set_paid_error
+
+    async def get_order_summary(self, order_id):
+        return False, 'user', 10, {'item': 2}
+
+    async def set_paid(self, order_id):
+        if self.set_paid_error:
+            raise self.set_paid_error
+        return True
+
+
+class TestCheckout(unittest.TestCase):
+    def checkout(self, client, connector=None):
+        with mock.patch.object(handlers, 'rollback_deadline', 0.5):
+            return run_sync(handlers.checkout(connector or FakeConnector(), client, 'order'))
+
+    def test_cancel_is_retried_until_the_payment_settles(self):
+        client = ScriptedClient({'pay': [CallError('read timeout')],
+                                 'cancel': [Reply(409, b''), Reply(503, b''), Reply(200, b'')]})
+
+        with self.assertRaises(HttpError) as raised:
+            self.checkout(client)
+
+        self.assertEqual(raised.exception.status, 400)
+        self.assertEqual([call.split('/')[1] for call in client.calls], ['pay', 'cancel', 'cancel', 'cancel'])
+
+    def test_cancel_that_never_settles_fails_the_checkout(self):
+        client = ScriptedClient({'pay': [Reply(503, b'')], 'cancel': [Reply(409, b'')]})
+
+        with self.assertLogs(handlers.logger, 'ERROR'), self.assertRaises(HttpError) as raised:
+            self.checkout(client)
+
+        self.assertEqual(raised.exception.status, 503)
+
+    def test_failed_stock_rollback_fails_the_checkout(self):
+        client = ScriptedClient({'pay': [Reply(200, b'')], 'subtract_batch': [Reply(200, b'')],
+                                 'add': [Reply(404, b'')], 'cancel': [Reply(200, b'')]})
+
+        with self.assertLogs(handlers.logger, 'ERROR'), self.assertRaises(HttpError) as raised:
+            self.checkout(client, FakeConnector(set_paid_error=ValueError("Order with id order not found")))
+
+        self.assertEqual(raised.exception.status, 503)
+        self.assertIn('payment/cancel/user/order', client.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
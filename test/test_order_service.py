@@ -1,5 +1,6 @@
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
 from uuid import UUID
 from test.endpoints import EndPoints as ep
 
@@ -44,6 +45,14 @@ class TestOrderService(unittest.TestCase):
         self.assertTrue(res.ok)
         self.assertEqual(str(uuid_obj), order_id)
 
+    def test_order_create_existing_user_twice(self):
+        res = ep.orders_create(self.user1['user_id'])
+        res2 = ep.orders_create(self.user1['user_id'])
+
+        self.assertTrue(res.ok)
+        self.assertTrue(res2.ok)
+        self.assertNotEqual(res.json()['order_id'], res2.json()['order_id'])
+
     def test_order_create_non_existing_user(self):
         res = ep.orders_create(self.order1['order_id'])
 
@@ -90,6 +99,18 @@ class TestOrderService(unittest.TestCase):
 
         self.assertFalse(res.ok)
 
+    def test_order_delete_by_user(self):
+        user_id = self.user1['user_id']
+        order_id = self.order1['order_id']
+        other_order = ep.orders_find(self.order2['order_id']).json()
+
+        res = ep.orders_delete_by_user(user_id)
+
+        self.assertTrue(res.ok)
+        self.assertFalse(ep.orders_find(order_id).ok)
+        self.assertEqual(ep.orders_find_by_user(user_id).json()['order_ids'], [])
+        self.assertEqual(ep.orders_find(self.order2['order_id']).json(), other_order)
+
     def test_order_find_by_user_existing(self):
         res = ep.orders_find_by_user(self.user1['user_id'])
 
@@ -134,6 +155,14 @@ class TestOrderService(unittest.TestCase):
         self.assertTrue(res2.ok)
         self.assertEqual(amount, str(2))
 
+    def test_order_add_item_cached_price(self):
+        ep.orders_add_item(self.order3['order_id'], self.item1['item_id'])
+        ep.orders_add_item(self.order3['order_id'], self.item2['item_id'])
+
+        total_cost = ep.orders_find(self.order3['order_id']).json()['total_cost']
+
+        self.assertEqual(float(total_cost), 30)
+
     def test_order_add_item_non_existing_order(self):
         res = ep.orders_add_item(self.user1['user_id'], self.item1['item_id'])
         self.assertFalse(res.ok)
@@ -176,6 +205,23 @@ class TestOrderService(unittest.TestCase):
         self.assertNotEqual(items_before, items_after)
         self.assertCountEqual(test, items_after)
 
+    def test_order_remove_item_concurrently(self):
+        order_id = self.order1['order_id']
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            responses = list(pool.map(lambda _: ep.orders_remove_item(order_id, self.item1['item_id']), range(2)))
+
+        self.assertTrue(all(res.ok for res in responses))
+        self.assertNotIn(self.item1['item_id'], ep.orders_find(order_id).json()['items'])
+
+    def test_order_change_items_after_checkout(self):
+        order_id = self.order1['order_id']
+        self.assertTrue(ep.orders_checkout(order_id).ok)
+        items_before = ep.orders_find(order_id).json()['items']
+
+        self.assertFalse(ep.orders_add_item(order_id, self.item2['item_id']).ok)
+        self.assertFalse(ep.orders_remove_item(order_id, self.item1['item_id']).ok)
+        self.assertCountEqual(items_before, ep.orders_find(order_id).json()['items'])
+
     def test_order_remove_item_non_existing_order(self):
         res = ep.orders_remove_item(self.user1['user_id'], self.item1['item_id'])
         self.assertFalse(res.ok)
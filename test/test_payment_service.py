@@ -74,6 +74,35 @@ class TestPaymentService(unittest.TestCase):
         self.assertFalse(res.ok)
         self.assertFalse(status_after.ok)
 
+    def test_payment_transitions(self):
+        user_id = self.user1['user_id']
+        order_id = self.order1['order_id']
+        balance_before = ep.users_find(user_id).json()['credit']
+
+        self.assertTrue(ep.payment_pay(user_id, order_id, self.price).ok)
+        self.assertTrue(ep.payment_status(order_id).json()['paid'])
+        self.assertEqual(ep.payment_pay(user_id, order_id, self.price).status_code, 400)
+
+        self.assertTrue(ep.payment_cancel(user_id, order_id).ok)
+        self.assertFalse(ep.payment_status(order_id).json()['paid'])
+        self.assertEqual(ep.payment_cancel(user_id, order_id).status_code, 400)
+        self.assertAlmostEqual(ep.users_find(user_id).json()['credit'], balance_before)
+
+        self.assertTrue(ep.payment_pay(user_id, order_id, self.price).ok)
+        self.assertTrue(ep.payment_status(order_id).json()['paid'])
+        self.assertAlmostEqual(ep.users_find(user_id).json()['credit'] + self.price, balance_before)
+
+    def test_payment_retried_after_insufficient_funds(self):
+        user_id = self.user2['user_id']
+        order_id = self.order2['order_id']
+
+        # The refused payment is reverted instead of staying pending.
+        self.assertEqual(ep.payment_pay(user_id, order_id, self.price).status_code, 400)
+        ep.users_credit_add(user_id, self.price)
+
+        self.assertTrue(ep.payment_pay(user_id, order_id, self.price).ok)
+        self.assertTrue(ep.payment_status(order_id).json()['paid'])
+
     if __name__ == '__main__':
         unittest.main()
 
@@ -0,0 +1,64 @@
+import unittest
+from unittest import mock
+
+import requests
+from werkzeug.exceptions import HTTPException
+
+from payment_service import postgres_connector
+from payment_service.postgres_connector import PAID, PENDING_CANCEL, PostgresConnector
+
+
+class TestPaymentTransitions(unittest.TestCase):
+    """Runs the transitions of PostgresConnector against a users service whose answer is lost after it changed
+    the credit, without a database."""
+
+    def setUp(self) -> None:
+        self.connector = PostgresConnector.__new__(PostgresConnector)
+        self.finished = []
+        self.connector.finish_transition = lambda query, **params: self.finished.append(params)
+        self.credit_changes = []
+
+        def post(url):
+            self.credit_changes.append(url)
+            raise requests.ReadTimeout()
+
+        patcher = mock.patch.object(postgres_connector, 'http_client', mock.Mock(post=mock.Mock(side_effect=post)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        environ = mock.patch.dict('os.environ', {'USER_SERVICE_URL': 'users'})
+        environ.start()
+        self.addCleanup(environ.stop)
+
+    def test_timeout_after_debit_leaves_payment_pending(self):
+        self.connector.start_transition = lambda user_id, order_id, start: ('payment', None)
+
+        with self.assertRaises(HTTPException) as raised:
+            self.connector.pay('user', 'order', '10')
+
+        self.assertEqual(raised.exception.code, 503)
+        self.assertEqual(self.credit_changes, ['http://users/users/credit/subtract/user/10'])
+        self.assertEqual(self.finished, [])
+
+    def test_timeout_after_refund_leaves_cancel_pending(self):
+        self.connector.start_transition = lambda user_id, order_id, start: ('payment', 10)
+
+        with self.assertRaises(HTTPException) as raised:
+            self.connector.cancel_pay('user', 'order')
+
+        self.assertEqual(raised.exception.code, 503)
+        self.assertEqual(self.finished, [])
+
+    def test_refusal_reverts_payment(self):
+        self.connector.start_transition = lambda user_id, order_id, start: ('payment', 10)
+        postgres_connector.http_client.post.side_effect = None
+        postgres_connector.http_client.post.return_value = mock.Mock(status_code=400)
+
+        with self.assertRaises(HTTPException) as raised:
+            self.connector.cancel_pay('user', 'order')
+
+        self.assertEqual(raised.exception.code, 400)
+        self.assertEqual(self.finished, [{'id': 'payment', 'pending': PENDING_CANCEL, 'state': PAID, 'status': True}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import unittest
+from uuid import uuid4
+
+from sqlalchemy import create_engine, text
+
+from common.migrations import migrate
+from order_service import postgres_connector as order_queries
+from payment_service import postgres_connector as payment_queries
+from stock_service import postgres_connector as stock_queries
+from users_service import postgres_connector as users_queries
+
+ORDER_ID = str(uuid4())
+ITEM_ID = str(uuid4())
+USER_ID = str(uuid4())
+
+# The statements the Postgres connectors run on every request, with representative bind parameters. EXPLAIN does
+# not run them, so the writes among them change nothing.
+HOT_QUERIES = {
+    'order summary': (order_queries.ORDER_SUMMARY_QUERY, {'order_id': ORDER_ID}),
+    'add item': (order_queries.ADD_ITEM_QUERY, {'order_id': ORDER_ID, 'item_id': ITEM_ID, 'price': 10}),
+    'remove item': (order_queries.REMOVE_ITEM_QUERY, {'order_id': ORDER_ID, 'item_id': ITEM_ID}),
+    'delete orders of user': (order_queries.DELETE_USER_ORDERS_QUERY, {'user_id': USER_ID}),
+    'payment by order and user': (payment_queries.SELECT_PAYMENT_QUERY,
+                                  {'order_id': ORDER_ID, 'user_id': USER_ID, 'pending_timeout': 60}),
+    'payment status': (payment_queries.SELECT_STATUS_QUERY, {'order_id': ORDER_ID}),
+    'subtract credit': (users_queries.SUBTRACT_QUERY, {'user_id': USER_ID, 'number': 1}),
+    'subtract stock': (stock_queries.SUBTRACT_QUERY, {'item_id': ITEM_ID, 'number': 1}),
+    'find items': (stock_queries.SELECT_ITEMS_QUERY, {'item_ids': [ITEM_ID, str(uuid4())]}),
+    'shards of item': (stock_queries.LOCK_SHARDS_QUERY, {'item_id': ITEM_ID}),
+    'sharded items': (stock_queries.SELECT_SHARDED_ITEMS_QUERY, {}),
+    # The lookups made through the ORM, and the one made by the cascade of order_item_order_id_fkey.
+    'order by id': (text('SELECT * FROM "order" WHERE order_id = :order_id'), {'order_id': ORDER_ID}),
+    'orders by user': (text('SELECT * FROM "order" WHERE user_id = :user_id'), {'user_id': USER_ID}),
+    'order item': (text('SELECT * FROM order_item WHERE order_id = :order_id AND item_id = :item_id'),
+                   {'order_id': ORDER_ID, 'item_id': ITEM_ID}),
+    'user by id': (text('SELECT * FROM webshopuser WHERE id = :user_id'), {'user_id': USER_ID}),
+    'items of order': (text('DELETE FROM order_item WHERE order_id = :order_id'), {'order_id': ORDER_ID}),
+}
+
+def scanned_tables(plan, node_type):
+    """Returns the tables a query plan reads with nodes of node_type."""
+    tables = [plan['Relation Name']] if plan['Node Type'] == node_type else []
+    for child in plan.get('Plans', []):
+        tables.extend(scanned_tables(child, node_type))
+    return tables
+
+
+@unittest.skipUnless(os.getenv('DB_HOST'), 'needs DB_HOST of a Postgres database')
+class TestPostgresIndexes(unittest.TestCase):
+    engine = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.engine = create_engine(
+            f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:"
+            f"{os.getenv('POSTGRES_PASSWORD', 'mysecretpassword')}@{os.getenv('DB_HOST')}:"
+            f"{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB', 'postgres')}")
+        migrate(cls.engine)
+
+    def test_hot_queries_use_indexes(self):
+        with self.engine.connect() as conn:
+            # On small test tables a sequential scan is cheaper, so the planner only falls back to one when no
+            # index applies.
+            conn.execute(text('SET enable_seqscan = off'))
+            for name, (query, params) in HOT_QUERIES.items():
+                with self.subTest(query=name):
+                    plan = conn.execute(text(f'EXPLAIN (FORMAT JSON) {query.text}'), **params).scalar()[0]['Plan']
+                    self.assertEqual(scanned_tables(plan, 'Seq Scan'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import unittest
+from uuid import uuid4
+
+from sqlalchemy import create_engine, text
+
+from common.migrations import migrate
+from order_service.postgres_connector import DELETE_ORDER_QUERY, DELETE_USER_ORDERS_QUERY
+
+INSERT_ORDER_QUERY = text('INSERT INTO "order" (order_id, user_id, paid) VALUES (:order_id, :user_id, false)')
+INSERT_ITEM_QUERY = text("""
+    INSERT INTO order_item (order_id, item_id, price, item_num) VALUES (:order_id, :item_id, 10, 1)
+""")
+COUNT_ITEMS_QUERY = text('SELECT count(*) FROM order_item WHERE order_id = ANY(CAST(:order_ids AS uuid[]))')
+
+
+@unittest.skipUnless(os.getenv('DB_HOST'), 'needs DB_HOST of a Postgres database')
+class TestPostgresOrderDeletion(unittest.TestCase):
+    engine = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.engine = create_engine(
+            f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:"
+            f"{os.getenv('POSTGRES_PASSWORD', 'mysecretpassword')}@{os.getenv('DB_HOST')}:"
+            f"{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB', 'postgres')}")
+        migrate(cls.engine)
+
+    def create_order(self, conn, user_id, items=2):
+        order_id = str(uuid4())
+        conn.execute(INSERT_ORDER_QUERY, order_id=order_id, user_id=user_id)
+        for _ in range(items):
+            conn.execute(INSERT_ITEM_QUERY, order_id=order_id, item_id=str(uuid4()))
+        return order_id
+
+    def test_delete_order_deletes_its_items(self):
+        with self.engine.begin() as conn:
+            order_id = self.create_order(conn, str(uuid4()))
+            other_id = self.create_order(conn, str(uuid4()))
+
+            self.assertEqual(conn.execute(DELETE_ORDER_QUERY, order_id=order_id).scalar(), 1)
+            self.assertEqual(conn.execute(COUNT_ITEMS_QUERY, order_ids=[order_id]).scalar(), 0)
+            self.assertEqual(conn.execute(COUNT_ITEMS_QUERY, order_ids=[other_id]).scalar(), 2)
+            conn.execute(DELETE_ORDER_QUERY, order_id=other_id)
+
+    def test_delete_user_orders_deletes_their_items(self):
+        user_id = str(uuid4())
+        with self.engine.begin() as conn:
+            order_ids = [self.create_order(conn, user_id) for _ in range(3)]
+            other_id = self.create_order(conn, str(uuid4()))
+
+            self.assertEqual(conn.execute(DELETE_USER_ORDERS_QUERY, user_id=user_id).scalar(), 3)
+            self.assertEqual(conn.execute(COUNT_ITEMS_QUERY, order_ids=order_ids).scalar(), 0)
+            self.assertEqual(conn.execute(COUNT_ITEMS_QUERY, order_ids=[other_id]).scalar(), 2)
+            conn.execute(DELETE_ORDER_QUERY, order_id=other_id)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+from uuid import uuid4
+
+from sqlalchemy import text
+
+from stock_service.connector import split_stock
+from stock_service.postgres_connector import INSERT_SHARD_QUERY, SELECT_FOR_UPDATE_QUERY, SET_SHARDS_QUERY, \
+    PostgresConnector
+
+INSERT_ITEM_QUERY = text("INSERT INTO stock_item (id, price, in_stock, shards) VALUES (:item_id, 10, :in_stock, 1)")
+
+
+@unittest.skipUnless(os.getenv('DB_HOST'), 'needs DB_HOST of a Postgres database')
+class TestPostgresStockSharding(unittest.TestCase):
+    connector = None
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        init = (os.getenv('POSTGRES_USER', 'postgres'), os.getenv('POSTGRES_PASSWORD', 'mysecretpassword'),
+                os.getenv('DB_HOST'), os.getenv('POSTGRES_PORT', '5432'), os.getenv('POSTGRES_DB', 'postgres'))
+        PostgresConnector.init_schema(*init)
+        cls.connector = PostgresConnector(*init)
+
+    def test_change_waiting_for_sharding_goes_to_the_shards(self):
+        item_id = str(uuid4())
+        with self.connector.engine.begin() as conn:
+            conn.execute(INSERT_ITEM_QUERY, item_id=item_id, in_stock=10)
+
+        # Shards the item like shard_item, but only commits once the subtraction waits for the item row.
+        with ThreadPoolExecutor(max_workers=1) as pool, self.connector.engine.begin() as conn:
+            conn.execute(SELECT_FOR_UPDATE_QUERY, item_id=item_id)
+            conn.execute(INSERT_SHARD_QUERY, [{'item_id': item_id, 'shard': shard, 'in_stock': in_stock}
+                                              for shard, in_stock in enumerate(split_stock(10, 2))])
+            conn.execute(SET_SHARDS_QUERY, item_id=item_id, shards=2)
+            subtraction = pool.submit(self.connector.subtract_amount, item_id, 3)
+            sleep(0.5)
+
+        self.assertEqual(subtraction.result(), 7)
+        self.assertEqual(self.connector.get_item(item_id).in_stock, 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 
+from concurrent.futures import ThreadPoolExecutor
 from random import randint, uniform
 from uuid import UUID
 from test.endpoints import EndPoints as ep
@@ -39,6 +40,18 @@ class TestStockService(unittest.TestCase):
         self.assertTrue(res.ok)
         self.assertEqual(str(uuid_obj), item_id)
 
+    def test_stock_create_many(self):
+        res = ep.stock_create_many(3, 20, 5)
+        item_ids = res.json()
+
+        self.assertTrue(res.ok)
+        self.assertEqual(len(set(item_ids)), 3)
+        items = ep.stock_find_many(item_ids).json()
+        self.assertEqual([item['item_id'] for item in items], item_ids)
+        for item in items:
+            self.assertEqual(item['price'], 20)
+            self.assertEqual(item['stock'], 5)
+
     def test_stock_find(self):
 
         self.assertTrue(self.res.ok)
@@ -46,6 +59,21 @@ class TestStockService(unittest.TestCase):
         self.assertEqual(self.stock_item['price'], self.price)
         self.assertEqual(self.stock_item['stock'], 0.0)
 
+    def test_stock_find_many(self):
+        item_id2 = ep.stock_create(self.price).json()['item_id']
+        ep.stock_add(item_id2, 5)
+
+        res = ep.stock_find_many([item_id2, 'not-an-id', str(UUID(int=0)), self.item_id, item_id2])
+
+        self.assertTrue(res.ok)
+        self.assertEqual([item['item_id'] for item in res.json()], [item_id2, self.item_id])
+        self.assertEqual([item['stock'] for item in res.json()], [5, 0])
+
+    def test_stock_find_many_not_a_list(self):
+        res = ep.stock_find_many({'item_id': self.item_id})
+
+        self.assertEqual(res.status_code, 400)
+
     def test_stock_add_positive_integer(self):
 
         res2 = ep.stock_add(self.stock_item['item_id'], self.rand_int_pos)
@@ -116,5 +144,51 @@ class TestStockService(unittest.TestCase):
         self.assertFalse(res3.ok)
         self.assertEqual(ep.stock_find(self.item_id).json()['stock'], self.rand_int_pos)
 
+    def test_stock_subtract_batch(self):
+        item_id2 = ep.stock_create(self.price).json()['item_id']
+        ep.stock_add(self.item_id, 5)
+        ep.stock_add(item_id2, 5)
+
+        res = ep.stock_subtract_batch([[self.item_id, 2], [item_id2, 3]])
+
+        self.assertTrue(res.ok)
+        self.assertEqual(res.json()['stock'], {self.item_id: 3, item_id2: 2})
+        self.assertEqual(ep.stock_find(self.item_id).json()['stock'], 3)
+        self.assertEqual(ep.stock_find(item_id2).json()['stock'], 2)
+
+    def test_stock_subtract_batch_insufficient(self):
+        item_id2 = ep.stock_create(self.price).json()['item_id']
+        ep.stock_add(self.item_id, 5)
+        ep.stock_add(item_id2, 1)
+
+        res = ep.stock_subtract_batch([[self.item_id, 2], [item_id2, 3]])
+
+        self.assertFalse(res.ok)
+        self.assertEqual(res.json()['item_id'], item_id2)
+        self.assertEqual(ep.stock_find(self.item_id).json()['stock'], 5)
+        self.assertEqual(ep.stock_find(item_id2).json()['stock'], 1)
+
+    def test_stock_subtract_concurrent(self):
+        ep.stock_add(self.item_id, 10)
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            responses = list(pool.map(lambda _: ep.stock_subtract(self.item_id, 1), range(20)))
+
+        self.assertEqual(sum(res.ok for res in responses), 10)
+        self.assertEqual(ep.stock_find(self.item_id).json()['stock'], 0)
+
+    def test_stock_sharded(self):
+        ep.stock_add(self.item_id, 10)
+
+        res = ep.stock_shard(self.item_id, 4)
+
+        self.assertTrue(res.ok)
+        self.assertEqual(ep.stock_find(self.item_id).json()['stock'], 10)
+        self.assertEqual(ep.stock_subtract(self.item_id, 9).json(), 1)
+        self.assertEqual(ep.stock_add(self.item_id, 5).json(), 6)
+        self.assertFalse(ep.stock_subtract(self.item_id, 7).ok)
+        self.assertEqual(ep.stock_find(self.item_id).json()['stock'], 6)
+        self.assertEqual(ep.stock_shard(self.item_id, 4).status_code, 409)
+
     if __name__ == '__main__':
         unittest.main()
@@ -24,6 +24,20 @@ class TestUsersService(unittest.TestCase):
         self.assertTrue(res.ok)
         self.assertEqual(str(uuid_obj), user_id)
 
+    def test_users_create_many(self):
+        res = ep.users_create_many(3, 50)
+        user_ids = res.json()
+
+        self.assertTrue(res.ok)
+        self.assertEqual(len(set(user_ids)), 3)
+        for user_id in user_ids:
+            self.assertEqual(ep.users_find(user_id).json()['credit'], 50)
+
+    def test_users_create_many_negative_credit(self):
+        res = ep.users_create_many(3, -50)
+
+        self.assertEqual(res.status_code, 400)
+
     def test_users_find(self):
         res = ep.users_find(self.user_id)
 
@@ -0,0 +1,67 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from quart import jsonify
+from common.asgi import create_app, handler
+from common.async_http_client import HandlerClient, http_client
+from users_service import handlers
+from users_service.connector import ConnectorFactory
+
+app = create_app(__name__)
+connector = None
+client = HandlerClient(http_client)
+
+
+@app.before_serving
+async def start():
+    global connector
+    connector = await ConnectorFactory().get_async_connector()
+    await http_client.start()
+
+
+@app.after_serving
+async def stop():
+    await http_client.close()
+
+
+@app.route('/users/metrics', methods=['GET'])
+async def metrics():
+    return jsonify({"http_client": http_client.stats()})
+
+
+@app.route('/users/create', methods=['POST'])
+@handler
+async def create():
+    return await handlers.create(connector)
+
+
+@app.route('/users/create_many/<int:count>/<credit>', methods=['POST'])
+@handler
+async def create_many(count, credit):
+    return await handlers.create_many(connector, count, credit)
+
+
+@app.route('/users/remove/<user_id>', methods=['DELETE'])
+@handler
+async def remove(user_id):
+    return await handlers.remove(connector, client, user_id)
+
+
+@app.route('/users/find/<user_id>', methods=['GET'])
+@handler
+async def find_user(user_id):
+    return await handlers.find_user(connector, user_id)
+
+
+@app.route('/users/credit/subtract/<user_id>/<number>', methods=['POST'])
+@handler
+async def subtract_amount(user_id, number):
+    return await handlers.subtract_amount(connector, user_id, number)
+
+
+@app.route('/users/credit/add/<user_id>/<number>', methods=['POST'])
+@handler
+async def add_amount(user_id, number):
+    return await handlers.add_amount(connector, user_id, number)
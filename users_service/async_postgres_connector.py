@@ -0,0 +1,94 @@
+import uuid
+
+from common.async_postgres import Query, to_row
+from common.bulk import chunk_sizes
+from common.ids import to_uuid
+from users_service import postgres_connector
+
+INSERT_USER_QUERY = Query("INSERT INTO webshopuser (id, credit) VALUES (:user_id, 0)")
+SELECT_USER_QUERY = Query("SELECT id, credit FROM webshopuser WHERE id = :user_id")
+DELETE_USER_QUERY = Query("DELETE FROM webshopuser WHERE id = :user_id RETURNING id")
+# The credit changes are the statements of the synchronous connector.
+ADD_QUERY = Query(postgres_connector.ADD_QUERY)
+SUBTRACT_QUERY = Query(postgres_connector.SUBTRACT_QUERY)
+
+
+class AsyncPostgresConnector:
+    def __init__(self, pool):
+        """Runs the queries of PostgresConnector with asyncpg, for the ASGI application.
+
+        :param pool: the asyncpg pool returned by common.async_postgres.create_pool
+        """
+        self.pool = pool
+
+    async def create(self):
+        """Creates a user with zero initial credit.
+
+        :return: the id of the created user
+        """
+        user_id = uuid.uuid4()
+        await self.pool.execute(*INSERT_USER_QUERY.args(user_id=user_id))
+        return str(user_id)
+
+    async def create_many(self, count, credit):
+        """Creates users with the given initial credit, BULK_CHUNK_SIZE at a time with a COPY.
+
+        :param count: the number of users
+        :param credit: the initial credit of every user
+        :return: async generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            user_ids = [uuid.uuid4() for _ in range(size)]
+            async with self.pool.acquire() as conn:
+                await conn.copy_records_to_table('webshopuser', columns=['id', 'credit'],
+                                                 records=[(user_id, credit) for user_id in user_ids])
+            yield user_ids
+
+    async def get_user(self, user_id):
+        """Retrieves the user from the database by its id.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the user with user_id does not exist or if the format of the user_id is invalid
+        :return: the user row with id and credit
+        """
+        user = await self.pool.fetchrow(*SELECT_USER_QUERY.args(user_id=to_uuid(user_id, 'User')))
+        if user is None:
+            raise ValueError(f"User with id {user_id} not found")
+        return to_row(user)
+
+    async def remove(self, user_id):
+        """Removes a user with the given user id.
+
+        :raises ValueError: if there is no such user
+        """
+        if await self.pool.fetchval(*DELETE_USER_QUERY.args(user_id=to_uuid(user_id, 'User'))) is None:
+            raise ValueError(f"User with id {user_id} not found")
+        return True
+
+    async def add_amount(self, user_id, number):
+        """Adds the given number to the user's credit.
+
+        :param user_id: the id of the user
+        :param number: the number to add to credit
+        :raises ValueError: if the user does not exist or if the format of the user_id is invalid
+        :return: the total credit
+        """
+        row = await self.pool.fetchrow(*ADD_QUERY.args(user_id=to_uuid(user_id, 'User'), number=number))
+        if row is None:
+            raise ValueError(f"User with id {user_id} not found")
+        return row['credit']
+
+    async def subtract_amount(self, user_id, number):
+        """Subtracts the given number from the user's credit.
+
+        :param user_id: the id of the user
+        :param number: the number to subtract from credit
+        :raises ValueError: if the user does not exist or if the format of the user_id is invalid
+        :raises AssertionError: if the user credit after subtraction is negative
+        :return: the remaining credit
+        """
+        row = await self.pool.fetchrow(*SUBTRACT_QUERY.args(user_id=to_uuid(user_id, 'User'), number=number))
+        if not row['found']:
+            raise ValueError(f"User with id {user_id} not found")
+        assert row['credit'] is not None, 'User credit cannot be negative'
+        return row['credit']
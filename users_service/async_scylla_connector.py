@@ -0,0 +1,91 @@
+import uuid
+from decimal import Decimal
+
+from common.aio import gather_limited, wrap_future
+from common.bulk import BULK_CONCURRENCY, chunk_sizes
+from common.ids import to_uuid
+from users_service.connector import CreditContentionError
+from users_service.scylla_connector import MAX_CREDIT_UPDATE_ATTEMPTS, ScyllaConnector
+
+
+class AsyncScyllaConnector:
+    def __init__(self, nodes):
+        """Runs the statements of ScyllaConnector with execute_async, for the ASGI application. Connecting and
+        preparing the statements is done by a ScyllaConnector.
+        """
+        self.sync = ScyllaConnector(nodes)
+        self.session = self.sync.session
+
+    async def execute(self, statement, parameters):
+        return await wrap_future(self.session.execute_async(statement, parameters))
+
+    async def create(self):
+        """Creates a user with zero initial credit.
+
+        :return: the id of the created user
+        """
+        user_id = uuid.uuid4()
+        await self.execute(self.sync.insert_user, (user_id, Decimal(0)))
+        return user_id
+
+    async def create_many(self, count, credit):
+        """Creates users with the given initial credit, BULK_CHUNK_SIZE at a time with concurrent inserts.
+
+        :param count: the number of users
+        :param credit: the initial credit of every user
+        :return: async generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            user_ids = [uuid.uuid4() for _ in range(size)]
+            await gather_limited(BULK_CONCURRENCY, [self.execute(self.sync.insert_user, (user_id, credit))
+                                                    for user_id in user_ids])
+            yield user_ids
+
+    async def remove(self, user_id):
+        """Removes a user with the given user id.
+
+        :raises ValueError: if there is no such user
+        """
+        user = await self.get_user(user_id)
+        await self.execute(self.sync.delete_user, (user.id,))
+
+    async def get_user(self, user_id):
+        """Retrieves the user from the database by its id.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the user with user_id does not exist or if the format of the user_id is invalid
+        :return: the user row with id and credit
+        """
+        user = (await self.execute(self.sync.select_user, (to_uuid(user_id, 'User'),))).one()
+        if user is None:
+            raise ValueError(f"User with id {user_id} not found")
+        return user
+
+    async def update_credit_by(self, user_id, delta):
+        """Changes the user's credit like ScyllaConnector.update_credit_by.
+
+        :param user_id: the id of the user
+        :param delta: the number to add to credit, negative to subtract
+        :raises ValueError: if the user does not exist or if the format of the user_id is invalid
+        :raises AssertionError: if the user credit after the change is negative
+        :raises CreditContentionError: if every attempt conflicted with a concurrent update
+        :return: the credit after the change
+        """
+        user = await self.get_user(user_id)
+        credit = user.credit
+        for _ in range(MAX_CREDIT_UPDATE_ATTEMPTS):
+            assert credit + delta >= 0, 'User credit cannot be negative'
+            result = await self.execute(self.sync.update_credit, (credit + delta, user.id, credit))
+            if result.was_applied:
+                return credit + delta
+            row = result.one()
+            if not hasattr(row, 'credit'):
+                raise ValueError(f"User with id {user_id} not found")
+            credit = row.credit
+        raise CreditContentionError(user_id)
+
+    async def add_amount(self, user_id, number):
+        return await self.update_credit_by(user_id, number)
+
+    async def subtract_amount(self, user_id, number):
+        return await self.update_credit_by(user_id, -number)
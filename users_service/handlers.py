@@ -0,0 +1,108 @@
+import os
+from decimal import Decimal, InvalidOperation
+
+from common.bulk import parse_bulk_request
+from common.handlers import HttpError, flatten
+from users_service.connector import CreditContentionError
+
+order_host = os.getenv('ORDER_SERVICE_URL', '127.0.0.1:8080')
+
+
+async def create(connector):
+    """Creates a user with zero initial credit.
+
+    :return: the id of the created user
+    """
+    try:
+        return {"user_id": await connector.create()}
+    except Exception:
+        raise HttpError(404)
+
+
+async def create_many(connector, count, credit):
+    """Creates the given number of users with the given initial credit.
+
+    :return: a JSON list of the ids of the created users
+    """
+    try:
+        credit = parse_bulk_request(count, credit)
+    except ValueError as error:
+        raise HttpError(400, error.args[0])
+    return [str(user_id) for user_id in await flatten(connector.create_many(count, credit))]
+
+
+async def remove(connector, client, user_id):
+    """Removes a user with the given user id, after the order service deleted its orders.
+
+    :return: success if successful, 404 error otherwise
+    """
+    try:
+        reply = await client.delete(f"http://{order_host}/orders/deleteByUser/{user_id}")
+        if not reply.ok:
+            raise ValueError("Couldn't delete user's orders")
+        await connector.remove(user_id)
+        return {"success": True}
+    except ValueError as error:
+        raise HttpError(404, error.args[0])
+
+
+async def find_user(connector, user_id):
+    """Returns the user given the user is
+
+    :param user_id: the id of the user
+    :return: the user object
+    """
+    try:
+        user = await connector.get_user(user_id)
+        return {"user_id": user.id, "credit": user.credit}
+    except ValueError as error:
+        raise HttpError(404, error.args[0])
+
+
+def parse_amount(number):
+    """Parses the amount of a credit change.
+
+    :raises HttpError: 404 if the amount is not a number or is negative
+    :return: the amount as a Decimal
+    """
+    try:
+        amount = Decimal(number)
+        if amount < 0:
+            raise HttpError(404, "no money")
+        return amount
+    except InvalidOperation as error:
+        raise HttpError(404, str(error))
+
+
+async def subtract_amount(connector, user_id, number):
+    """Subtracts the given number from the user's credit.
+
+    :param user_id: the id of the user
+    :param number: the number to subtract from credit
+    :return: the remaining credit if successful, error otherwise
+    """
+    amount = parse_amount(number)
+    try:
+        return {"success": True, "credit": await connector.subtract_amount(user_id, amount)}
+    except AssertionError as error:
+        raise HttpError(400, str(error))
+    except ValueError as error:
+        raise HttpError(404, str(error))
+    except CreditContentionError as error:
+        raise HttpError(503, str(error))
+
+
+async def add_amount(connector, user_id, number):
+    """Adds the given number to the user's credit.
+
+    :param user_id: the id of the user
+    :param number: the number to add to credit
+    :return: the total credit of the user if successful, error otherwise
+    """
+    amount = parse_amount(number)
+    try:
+        return {"success": True, "credit": await connector.add_amount(user_id, amount)}
+    except ValueError as error:
+        raise HttpError(404, str(error))
+    except CreditContentionError as error:
+        raise HttpError(503, str(error))
@@ -0,0 +1,34 @@
+"""Creates users with an initial credit directly in the database of the users service, for seeding benchmarks.
+Postgres rows are written with COPY and ScyllaDB rows with concurrent inserts, BULK_CHUNK_SIZE at a time. The ids
+of the created users are written to standard output, one per line. Inside the users service image, with the
+environment of the service:
+
+    python load_users.py --count 1000000 --credit 100 > user_ids.txt
+"""
+import argparse
+import os
+import sys
+from decimal import Decimal
+from time import perf_counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from users_service.connector import ConnectorFactory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, required=True)
+    parser.add_argument('--credit', type=Decimal, default=Decimal(0))
+    args = parser.parse_args()
+
+    start = perf_counter()
+    created = 0
+    for user_ids in ConnectorFactory().get_connector().create_many(args.count, args.credit):
+        sys.stdout.write(''.join(f"{user_id}\n" for user_id in user_ids))
+        created += len(user_ids)
+        print(f"created {created} users in {perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+import os
+import uuid
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.orm.exc import NoResultFound
+
+from common.bulk import chunk_sizes, copy_rows
+from common.migrations import ensure_schema, init_postgres
+from users_service.postgres_user import Base, PostgresUser
+
+# Connections kept open per worker, and opened on top of those under load. The gunicorn configuration
+# sizes the concurrent requests per worker to match.
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+
+ADD_QUERY = text("UPDATE webshopuser SET credit = credit + :number WHERE id = :user_id RETURNING credit")
+# The EXISTS subquery sees the table as it was before the update, so it tells a missing user apart from a user
+# without enough credit in the same round trip.
+SUBTRACT_QUERY = text("""
+    WITH updated AS (
+        UPDATE webshopuser SET credit = credit - :number
+        WHERE id = :user_id AND credit >= :number
+        RETURNING credit
+    )
+    SELECT (SELECT credit FROM updated) AS credit,
+           EXISTS (SELECT 1 FROM webshopuser WHERE id = :user_id) AS found
+""")
+
+
+class PostgresConnector:
+    def __init__(self, db_user, db_password, db_host, db_port, db_name):
+        """Establishes a connection to the PostgreSQL database, and checks that it has the current schema.
+        """
+        self.engine = create_engine(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}',
+                                    convert_unicode=True, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+                                    pool_timeout=3)
+        self.db_session = scoped_session(sessionmaker(bind=self.engine))
+        Base.query = self.db_session.query_property()
+        Base.metadata.query = self.db_session.query_property()
+        PostgresUser.metadata.query = self.db_session.query_property()
+        ensure_schema(self.engine)
+
+    @staticmethod
+    def init_schema(db_user, db_password, db_host, db_port, db_name):
+        """Applies the migrations the PostgreSQL database does not have yet.
+
+        :return: a description of the changes
+        """
+        applied = init_postgres(f'postgresql://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}')
+        return f"applied Postgres migrations {applied}"
+
+    def create(self):
+        """Creates a user with zero initial credit.
+
+        :return: the id of the created user
+        """
+        session = self.db_session()
+        try:
+            item = PostgresUser(credit=0.0)
+            session.add(item)
+            session.commit()
+            return str(item.id)
+        except Exception:
+            raise Exception
+        finally:
+            session.close()
+
+    def create_many(self, count, credit):
+        """Creates users with the given initial credit, BULK_CHUNK_SIZE at a time with a COPY.
+
+        :param count: the number of users
+        :param credit: the initial credit of every user
+        :return: generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            user_ids = [uuid.uuid4() for _ in range(size)]
+            copy_rows(self.engine, 'webshopuser', ['id', 'credit'], [(user_id, credit) for user_id in user_ids])
+            yield user_ids
+
+    def get_user(self, user_id):
+        """Retrieves the user from the database by its id.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the user with user_id does not exist or if the format of the user_id is invalid
+        :return: the user with id user_id
+        """
+        session = self.db_session()
+        try:
+            return session.query(PostgresUser).filter_by(id=user_id).one()
+        except NoResultFound:
+            raise ValueError(f"User with id {user_id} not found")
+        except DataError:
+            raise ValueError(f"User id {user_id} is not a valid id")
+        finally:
+            session.close()
+
+    def remove(self, user_id):
+        """Removes a user with the given user id.
+
+        :raises ValueError: if there is no such user
+        """
+        session = self.db_session()
+        try:
+            user = session.query(PostgresUser).filter_by(id=user_id).one()
+            session.delete(user)
+            session.commit()
+            return True
+        except Exception:
+            raise Exception
+        finally:
+            session.close()
+
+    def add_amount(self, user_id, number):
+        """Adds the given number to the user's credit.
+
+        :param user_id: the id of the user
+        :param number: the number to add to credit
+        :raises ValueError: if the user does not exist or if the format of the user_id is invalid
+        :return: the total credit
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(ADD_QUERY, user_id=user_id, number=number).first()
+        except DataError:
+            raise ValueError(f"User id {user_id} is not a valid id")
+        if row is None:
+            raise ValueError(f"User with id {user_id} not found")
+        return row.credit
+
+    def subtract_amount(self, user_id, number):
+        """Subtracts the given number from the user's credit.
+
+        :param user_id: the id of the user
+        :param number: the number to subtract from credit
+        :raises ValueError: if the user does not exist or if the format of the user_id is invalid
+        :raises AssertionError: if the user credit after subtraction is negative
+        :return: the remaining credit
+        """
+        try:
+            with self.engine.begin() as conn:
+                row = conn.execute(SUBTRACT_QUERY, user_id=user_id, number=number).first()
+        except DataError:
+            raise ValueError(f"User id {user_id} is not a valid id")
+        if not row.found:
+            raise ValueError(f"User with id {user_id} not found")
+        assert row.credit is not None, 'User credit cannot be negative'
+        return row.credit
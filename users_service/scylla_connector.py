@@ -0,0 +1,127 @@
+import os
+import uuid
+from decimal import Decimal
+
+from cassandra.concurrent import execute_concurrent_with_args
+
+from common.bulk import BULK_CONCURRENCY, chunk_sizes
+from common.ids import to_uuid
+from common.scylla import create_tables, ensure_tables, get_session
+from users_service.connector import CreditContentionError
+from users_service.scylla_user import ScyllaUser
+
+
+MAX_CREDIT_UPDATE_ATTEMPTS = int(os.getenv('CREDIT_UPDATE_ATTEMPTS', '20'))
+
+
+class ScyllaConnector:
+    SERVICE = 'users'
+    TABLES = [ScyllaUser]
+
+    def __init__(self, nodes):
+        """Establishes a connection to the ScyllaDB database and checks that the tables in TABLES match their
+        models, creating or updating them unless SCHEMA_AUTO_MIGRATE is "false".
+        """
+        self.session = get_session(nodes)
+        ensure_tables(self.session, self.SERVICE, self.TABLES)
+
+        self.insert_user = self.session.prepare("INSERT INTO wdm.scylla_user (id, credit) VALUES (?, ?)")
+        self.select_user = self.session.prepare("SELECT id, credit FROM wdm.scylla_user WHERE id = ?")
+        self.select_user.is_idempotent = True
+        self.update_credit = self.session.prepare(
+            "UPDATE wdm.scylla_user SET credit = ? WHERE id = ? IF credit = ?")
+        self.delete_user = self.session.prepare("DELETE FROM wdm.scylla_user WHERE id = ?")
+
+    @classmethod
+    def init_schema(cls, nodes):
+        """Creates the "wdm" keyspace and creates or updates the tables in TABLES.
+
+        :return: a description of the changes
+        """
+        changed = create_tables(get_session(nodes), cls.SERVICE, cls.TABLES)
+        return "created or updated the Scylla tables" if changed else "the Scylla tables are up to date"
+
+    def create(self):
+        """Creates a user with zero initial credit.
+
+        :return: the id of the created user
+        """
+        user_id = uuid.uuid4()
+        self.session.execute(self.insert_user, (user_id, Decimal(0)))
+        return user_id
+
+    def create_many(self, count, credit):
+        """Creates users with the given initial credit, BULK_CHUNK_SIZE at a time with concurrent inserts.
+
+        :param count: the number of users
+        :param credit: the initial credit of every user
+        :return: generator of the lists of the ids created, one per chunk
+        """
+        for size in chunk_sizes(count):
+            user_ids = [uuid.uuid4() for _ in range(size)]
+            execute_concurrent_with_args(self.session, self.insert_user, [(user_id, credit) for user_id in user_ids],
+                                         concurrency=BULK_CONCURRENCY, raise_on_first_error=True)
+            yield user_ids
+
+    def remove(self, user_id):
+        """Removes a user with the given user id.
+
+        :raises ValueError: if there is no such user
+        """
+        user = self.get_user(user_id)
+        self.session.execute(self.delete_user, (user.id,))
+
+    def get_user(self, user_id):
+        """Retrieves the user from the database by its id.
+
+        :param user_id: the id of the user
+        :raises ValueError: if the user with user_id does not exist or if the format of the user_id is invalid
+        :return: the user row with id and credit
+        """
+        user = self.session.execute(self.select_user, (to_uuid(user_id, 'User'),)).one()
+        if user is None:
+            raise ValueError(f"User with id {user_id} not found")
+        return user
+
+    def update_credit_by(self, user_id, delta):
+        """Changes the user's credit with a conditional write on the credit that was read, retried with the
+        credit the write conflicted with.
+
+        :param user_id: the id of the user
+        :param delta: the number to add to credit, negative to subtract
+        :raises ValueError: if the user does not exist or if the format of the user_id is invalid
+        :raises AssertionError: if the user credit after the change is negative
+        :raises CreditContentionError: if every attempt conflicted with a concurrent update
+        :return: the credit after the change
+        """
+        user = self.get_user(user_id)
+        credit = user.credit
+        for _ in range(MAX_CREDIT_UPDATE_ATTEMPTS):
+            assert credit + delta >= 0, 'User credit cannot be negative'
+            result = self.session.execute(self.update_credit, (credit + delta, user.id, credit))
+            if result.was_applied:
+                return credit + delta
+            row = result.one()
+            if not hasattr(row, 'credit'):
+                raise ValueError(f"User with id {user_id} not found")
+            credit = row.credit
+        raise CreditContentionError(user_id)
+
+    def add_amount(self, user_id, number):
+        """Adds the given number to the user's credit.
+
+        :param user_id: the id of the user
+        :param number: the number to add to credit
+        :return: the total credit
+        """
+        return self.update_credit_by(user_id, number)
+
+    def subtract_amount(self, user_id, number):
+        """Subtracts the given number from the user's credit.
+
+        :param user_id: the id of the user
+        :param number: the number to subtract from credit
+        :raises AssertionError: if the user credit after subtraction is negative
+        :return: the remaining credit
+        """
+        return self.update_credit_by(user_id, -number)
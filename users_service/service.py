@@ -1,100 +1,59 @@
-from decimal import *
-from flask import Flask, abort, jsonify
+from flask import Flask, jsonify
 import sys
 import os
-import requests
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
 
+from common.handlers import AwaitableCalls
+from common.http_client import HandlerClient, http_client
+from common.worker import LazyConnector, start_worker
+from common.wsgi import handler
+from users_service import handlers
 from users_service.connector import ConnectorFactory
 
 app = Flask(__name__)
-connector = ConnectorFactory().get_connector()
+connector = LazyConnector(ConnectorFactory().get_connector)
+app.before_first_request(start_worker)
+calls = AwaitableCalls(connector)
+client = HandlerClient(http_client)
 
 
-order_host = os.getenv('ORDER_SERVICE_URL', '127.0.0.1:8080')
+@app.route('/users/metrics', methods=['GET'])
+def metrics():
+    return jsonify({"http_client": http_client.stats()})
 
 
 @app.route('/users/create', methods=['POST'])
+@handler
 def create():
-    """Creates a user with zero initial credit.
+    return handlers.create(calls)
 
-    :return: the id of the created user
-    """
-    try:
-        user_id = connector.create()
-        return jsonify({"user_id": user_id}), 200
-    except:
-        abort(404)
+
+@app.route('/users/create_many/<int:count>/<credit>', methods=['POST'])
+@handler
+def create_many(count, credit):
+    return handlers.create_many(calls, count, credit)
 
 
 @app.route('/users/remove/<user_id>', methods=['DELETE'])
+@handler
 def remove(user_id):
-    """Removes a user with the given user id.
-
-    :return: success if successful, 404 error otherwise
-    """
-    try:
-        res = requests.delete(f"http://{order_host}/orders/deleteByUser/{user_id}")
-        if res.ok:
-            connector.remove(user_id)
-            return jsonify({"success": True}), 200
-        else:
-            raise ValueError("Couldn't delete user's orders")
-    except ValueError as error:
-        abort(404, error.args[0])
+    return handlers.remove(calls, client, user_id)
 
 
 @app.route('/users/find/<user_id>', methods=['GET'])
+@handler
 def find_user(user_id):
-    """Returns the user given the user is
-
-    :param user_id: the id of the user
-    :return: the user object
-    """
-    try:
-        user = connector.get_user(user_id)
-        return jsonify({"user_id": user.id, "credit": user.credit}), 200
-    except ValueError:
-        abort(404, description=str(ValueError.__traceback__))
+    return handlers.find_user(calls, user_id)
 
 
 @app.route('/users/credit/subtract/<user_id>/<number>', methods=['POST'])
+@handler
 def subtract_amount(user_id, number):
-    """Subtracts the given number from the user's credit.
-
-    :param user_id: the id of the user
-    :param number: the number to subtract from credit
-    :return: the remaining credit if successful, error otherwise
-    """
-    try:
-        amount = Decimal(number)
-        if amount < 0:
-            abort(404, description="no money")
-
-        result = connector.subtract_amount(user_id, amount)
-        return jsonify({"success": True, "credit": result}), 200
-    except AssertionError as e:
-        abort(400, description=str(e.__traceback__))
-    except (ValueError, InvalidOperation) as f:
-        abort(404, description=str(f.__traceback__))
+    return handlers.subtract_amount(calls, user_id, number)
 
 
 @app.route('/users/credit/add/<user_id>/<number>', methods=['POST'])
+@handler
 def add_amount(user_id, number):
-    """Adds the given number to the user's credit.
-
-    :param user_id: the id of the user
-    :param number: the number to add to credit
-    :return: the total credit of the user if successful, error otherwise
-    """
-    try:
-        amount = Decimal(number)
-        if amount < 0:
-            abort(404)
-
-        result = connector.add_amount(user_id, amount)
-        return jsonify({"success": True, "credit": result}), 200
-    except (ValueError, InvalidOperation) as e:
-        abort(404, description=str(e.__traceback__))
-
+    return handlers.add_amount(calls, user_id, number)